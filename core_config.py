@@ -136,6 +136,12 @@ CFG: Dict[str, Any] = {
     in ("1", "true", "yes", "on"),
     "orderbook_levels": int(os.getenv("ORDERBOOK_LEVELS", "50")),
     "orderbook_ttl_sec": int(os.getenv("ORDERBOOK_TTL_SEC", "20")),
+    # локальна книга: diff-стрім + снапшот (market_data.local_book)
+    "orderbook_stream": os.getenv("ORDERBOOK_STREAM", "false").lower()
+    in ("1", "true", "yes", "on"),
+    "orderbook_depth_limit": int(os.getenv("ORDERBOOK_DEPTH_LIMIT", "1000")),
+    "orderbook_max_books": int(os.getenv("ORDERBOOK_MAX_BOOKS", "20")),
+    "orderbook_idle_sec": int(os.getenv("ORDERBOOK_IDLE_SEC", "600")),
     "orderbook_bucket_pct": float(os.getenv("ORDERBOOK_BUCKET_PCT", "0.10")),
     "wall_usdt_threshold": float(os.getenv("WALL_USDT_THRESHOLD", "2000000")),
     "wall_near_pct": float(os.getenv("WALL_NEAR_PCT", "1.0")),
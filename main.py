@@ -36,7 +36,7 @@ from datetime import time as dtime
 from zoneinfo import ZoneInfo
 from utils.db_migrate import migrate_if_needed
 migrate_if_needed()
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, constants
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
     Application,
     AIORateLimiter,
@@ -50,11 +50,13 @@ from telegram.ext import (
 import sitecustomize  # noqa: F401  # LLM-guard
 
 from core_config import CFG
-from services.autopost import mark_autopost_sent, run_autopost_once
+from services.autopost import run_autopost_once
 from services.daily_tracker import daily_tracker_job
 from services.kpi import kpi_summary
 from services.winrate_tracker import winrate_job
 from services.autopost_bridge import handle_autopost_message
+from telegram_bot.outbox import close_outboxes
+from scheduler.bar_close import schedule as schedule_bar_close
 
 from telegram_bot.handlers import register_handlers  # ваш catch-all "^panel:"
 from telegram_bot.handlers_addons import register_extra  # /daily_now, /winrate_now, panel:neutral/kpi
@@ -296,95 +298,30 @@ async def on_error(update: object, context) -> None:
 # Jobs
 # ───────────────────────────────────────────────
 async def autopost_scan(context) -> None:
-    """Автопост: збирає сигнали, шле у TG, маркує sent та мостить у trades."""
+    """Автопост: збирає сигнали, шле у TG (через outbox) і мостить у trades."""
     try:
-        # універсально виконуємо run_autopост_once (async або sync)
-        msgs = await _run_maybe_async(run_autopost_once, context.application)
+        # скан за закриттям бару: лише серії, чий бар щойно закрився (scheduler.bar_close)
+        data = getattr(getattr(context, "job", None), "data", None)
+        scope = {"series": data["series"], "closed_at": data["at"]} if isinstance(data, dict) and "series" in data else {}
+        # з application run_autopost_once сам відправляє кожне повідомлення через outbox
+        # (темп, пріоритет, 429) і ставить ts_sent після доставки — тут лише міст у trades
+        msgs = await _run_maybe_async(run_autopost_once, context.application, **scope)
         if not msgs:
             return
 
-        default_chat = CFG.get("CHAT_ID") or CFG.get("TELEGRAM_CHAT_ID")
-        sent = 0
-        seen: set[tuple[int | None, str]] = set()
-
+        opened = 0
         for m in msgs:
-            if isinstance(m, str):
-                text = m
-                chat_id = default_chat
-                parse_mode = constants.ParseMode.HTML
-                btns = None
-            else:
-                text = (m.get("text", "") or "") if isinstance(m, dict) else ""
-                chat_id = (m.get("chat_id") if isinstance(m, dict) else None) or default_chat
-                parse_mode = (m.get("parse_mode") if isinstance(m, dict) else None) or constants.ParseMode.HTML
-                btns = m.get("buttons") if isinstance(m, dict) else None
-
-            if not text or not chat_id:
-                continue
-
-            sig = (int(chat_id) if chat_id is not None else None, text)
-            if sig in seen:
+            if not isinstance(m, dict):
                 continue
-            seen.add(sig)
-
-            reply_markup = None
-            if btns:
-                rows = []
-                for row in btns:
-                    r = []
-                    for b in row:
-                        if b.get("type") == "url":
-                            r.append(
-                                InlineKeyboardButton(
-                                    b.get("text", "Link"), url=b.get("url", "")
-                                )
-                            )
-                        else:
-                            data = (b.get("data") or "")[:64]
-                            r.append(
-                                InlineKeyboardButton(
-                                    b.get("text", "…"), callback_data=data
-                                )
-                            )
-                    if r:
-                        rows.append(r)
-                if rows:
-                    reply_markup = InlineKeyboardMarkup(rows)
-
-            # 1) Надіслати в TG
-            try:
-                await context.bot.send_message(
-                    chat_id=chat_id,
-                    text=text,
-                    parse_mode=parse_mode,
-                    disable_web_page_preview=True,
-                    reply_markup=reply_markup,
-                )
-                sent += 1
-            except Exception as e:
-                log.warning("autopost send fail: %s", e)
-
-            # 2) Позначити «надіслано»
             try:
-                if isinstance(m, dict):
-                    mark_autopost_sent(
-                        symbol=m.get("symbol"),
-                        timeframe=m.get("timeframe"),
-                        rr=m.get("rr"),
-                    )
-            except Exception as e:
-                log.warning("autopost_log mark_sent fail: %s", e)
-
-            # 3) Міст у trades
-            try:
-                if isinstance(m, dict):
-                    tid = handle_autopost_message(m)
-                    if tid:
-                        log.info("[autopост_scan] opened trade id=%s from message", tid)
+                tid = handle_autopost_message(m)
+                if tid:
+                    opened += 1
+                    log.info("[autopост_scan] opened trade id=%s from message", tid)
             except Exception as e:
                 log.warning("autopost_bridge failed: %s", e)
 
-        log.info("autopost scan done (sent=%d)", sent)
+        log.info("autopost scan done (prepared=%d, trades=%d)", len(msgs), opened)
 
     except Exception:
         log.warning("autopost_scan failed", exc_info=True)
@@ -434,6 +371,29 @@ async def signal_sync_job(context) -> None:
         log.warning("signal_sync: %s", e)
 
 
+async def universe_warm_job(context) -> None:
+    """Прогрів кешу 24h-тікерів, щоб перший /top не чекав на завантаження ~2 MB."""
+    try:
+        from market_data.universe import get_universe
+        await asyncio.to_thread(get_universe().refresh)
+    except Exception as e:
+        log.warning("universe warm failed: %s", e)
+
+
+async def market_stream_job(context) -> None:
+    """Старт WebSocket-стріму kline/miniTicker для моніторинг-пар (WS_STREAM_ENABLED=true)."""
+    try:
+        from market_data.candles import stream_timeframes
+        from market_data.stream import start_stream
+        from utils.settings import get_setting
+
+        symbols = (get_setting("monitored_symbols", None) or os.getenv("MONITORED_SYMBOLS", "") or "BTCUSDT").split(",")
+        tfs = (get_setting("analyze_timeframe", None) or CFG.get("analyze_timeframe") or "1h").split(",")
+        start_stream(symbols, stream_timeframes(tfs))  # похідні TF збираються локально з бази
+    except Exception as e:
+        log.warning("market_stream start failed: %s", e)
+
+
 async def alerts_job(context) -> None:
     """Risk alerts job."""
     try:
@@ -442,6 +402,22 @@ async def alerts_job(context) -> None:
         log.warning("risk_alerts failed: %s", e)
 
 
+async def on_shutdown(app) -> None:
+    """post_shutdown: закрити WebSocket-стрім, дослати чергу розсилок і закрити пул Binance REST."""
+    try:
+        from market_data.stream import stop_stream
+        await stop_stream()
+    except Exception as e:
+        log.warning("market_stream stop failed: %s", e)
+    await close_outboxes(app)
+    try:
+        from market_data.binance_client import get_client
+        await get_client().aclose()
+        get_client().close()  # пул синхронного httpx.Client (потоки / старі модулі)
+    except Exception as e:
+        log.warning("binance client close failed: %s", e)
+
+
 # ───────────────────────────────────────────────
 # App bootstrap
 # ───────────────────────────────────────────────
@@ -449,8 +425,13 @@ def build_app():
     if not CFG.get("tg_token"):
         raise RuntimeError("TELEGRAM_BOT_TOKEN is missing in .env")
 
+    # AIORateLimiter — загальний запобіжник для ВСІХ викликів Bot API (хендлери, алерти, планувальники
+    # шлють напряму); max_retries=0: RetryAfter не ретраїться тут, а доходить до outbox, який
+    # ставить розсилки на паузу і повертає повідомлення в чергу (пріоритет/порядок — теж outbox)
     app = (
-        Application.builder().token(CFG["tg_token"]).rate_limiter(AIORateLimiter()).build()
+        Application.builder().token(CFG["tg_token"]).rate_limiter(AIORateLimiter(max_retries=0))
+        .post_shutdown(on_shutdown)  # закрити стрім і дослати чергу розсилок перед зупинкою
+        .build()
     )
 
     # ✨ /kpi + callback
@@ -517,9 +498,23 @@ def build_app():
     app.add_error_handler(on_error)
 
     # ── Планування робіт
-    app.job_queue.run_repeating(
-        autopost_scan, interval=300, first=10, name="autopost_scan"
-    )
+    # автопост: за закриттям свічки (bar_close) або, як раніше, кожні 300с (interval)
+    autopost_trigger = str(os.getenv("AUTOPOST_TRIGGER", "bar_close")).lower()
+    # (якщо серій поки немає — bar_close сам перевіряє знову; якщо планування впало — таймер)
+    autopost_desc = None
+    if autopost_trigger == "bar_close":
+        try:
+            schedule_bar_close(app.job_queue, autopost_scan, name="autopost_scan")
+            autopost_desc = "on bar close"
+        except Exception:
+            log.warning("bar_close scheduling failed — falling back to 300s interval", exc_info=True)
+            for job in app.job_queue.get_jobs_by_name("autopost_scan"):
+                job.schedule_removal()
+    if autopost_desc is None:
+        app.job_queue.run_repeating(
+            autopost_scan, interval=300, first=10, name="autopost_scan"
+        )
+        autopost_desc = "300s"
 
     interval_closer = int(CFG.get("signal_closer_interval_sec", 120))
     interval_pm = int(CFG.get("position_manager_interval_sec", 60))
@@ -553,13 +548,20 @@ def build_app():
             alerts_job, interval=alerts_interval, first=45, name="risk_alerts"
         )
 
+    app.job_queue.run_once(universe_warm_job, when=1, name="universe_warm")
+
+    ws_stream_enabled = str(os.getenv("WS_STREAM_ENABLED", "false")).lower() == "true"
+    if ws_stream_enabled:
+        app.job_queue.run_once(market_stream_job, when=2, name="market_stream")
+
     tz_key = getattr(TZ, "key", "Europe/Kyiv")
     log.info(
         (
-            "[jobqueue] ✅ scheduled: autopost 300s, signal_closer %ss%s; "
+            "[jobqueue] ✅ scheduled: autopost %s, signal_closer %ss%s; "
             "position_manager %ss%s; daily_pnl 23:59; winrate 00:05; "
-            "signal_sync %ss%s; risk_alerts %ss%s (TZ=%s)"
+            "signal_sync %ss%s; risk_alerts %ss%s; ws_stream%s (TZ=%s)"
         ),
+        autopost_desc,
         interval_closer,
         "" if _close_fn else " (off)",
         interval_pm,
@@ -568,6 +570,7 @@ def build_app():
         "" if (sync_signals_once and signal_sync_enabled) else " (off)",
         alerts_interval,
         "" if _alerts_fn else " (off)",
+        "" if ws_stream_enabled else " (off)",
         tz_key,
     )
     return app
@@ -0,0 +1,169 @@
+# market_data/archive_import.py
+from __future__ import annotations
+import csv
+import io
+import logging
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
+
+from market_data.binance import INTERVAL_MAP
+
+log = logging.getLogger("archive_import")
+
+# Імена файлів data.binance.vision: BTCUSDT-1m-2024-01.zip (monthly) / BTCUSDT-1m-2024-01-15.zip (daily)
+_NAME_RE = re.compile(
+    r"^(?P<symbol>[A-Z0-9]+)-(?P<tf>\d+[smhdwM])-(?P<date>\d{4}-\d{2}(?:-\d{2})?)\.(?P<ext>zip|csv)$"
+)
+BATCH_ROWS = 50_000
+
+
+@dataclass(frozen=True)
+class ArchiveFile:
+    path: str
+    symbol: str
+    tf: str
+    period: str
+    size: int
+
+    @property
+    def source(self) -> str:
+        # ключ у журналі імпорту: ім'я файлу (без каталогу) — переносимо між машинами
+        return os.path.basename(self.path)
+
+
+def parse_name(path: str) -> Optional[Tuple[str, str, str]]:
+    m = _NAME_RE.match(os.path.basename(path))
+    if not m or m.group("tf") not in INTERVAL_MAP:
+        return None
+    return m.group("symbol"), m.group("tf"), m.group("date")
+
+
+def discover(root: str, symbols: Optional[Sequence[str]] = None,
+             timeframes: Optional[Sequence[str]] = None) -> List[ArchiveFile]:
+    """Рекурсивно шукає архіви klines; якщо є і .zip, і розпакований .csv — беремо .csv."""
+    want_sym = {s.upper() for s in symbols} if symbols else None
+    want_tf = set(timeframes) if timeframes else None
+    found = {}
+    for dirpath, _dirs, files in os.walk(root):
+        for name in files:
+            meta = parse_name(name)
+            if not meta:
+                continue
+            sym, tf, period = meta
+            if (want_sym and sym not in want_sym) or (want_tf and tf not in want_tf):
+                continue
+            path = os.path.join(dirpath, name)
+            key = (sym, tf, period)
+            if key in found and found[key].path.endswith(".csv"):
+                continue
+            found[key] = ArchiveFile(path, sym, tf, period, os.path.getsize(path))
+    return sorted(found.values(), key=lambda f: (f.symbol, f.tf, f.period))
+
+
+def _ts_sec(raw: str) -> int:
+    v = int(raw)
+    if v >= 10 ** 14:    # мікросекунди (spot-архіви з 2025)
+        return v // 1_000_000
+    if v >= 10 ** 11:    # мілісекунди
+        return v // 1000
+    return v
+
+
+def _open_text(path: str):
+    """Потокове читання: zip розпаковується на льоту, без тимчасових файлів."""
+    if path.endswith(".zip"):
+        zf = zipfile.ZipFile(path)
+        members = [n for n in zf.namelist() if n.endswith(".csv")]
+        if not members:
+            zf.close()
+            raise ValueError(f"{path}: no csv inside")
+        return zf, io.TextIOWrapper(zf.open(members[0]), encoding="utf-8", newline="")
+    fh = open(path, "r", encoding="utf-8", newline="")
+    return None, fh
+
+
+def iter_batches(path: str, batch_rows: int = BATCH_ROWS) -> Iterator[List[tuple]]:
+    """(ts, open, high, low, close, volume) батчами; заголовок (якщо є) пропускається."""
+    zf, fh = _open_text(path)
+    try:
+        batch: List[tuple] = []
+        for row in csv.reader(fh):
+            if not row or not row[0].strip().isdigit():
+                continue  # header / порожні рядки
+            batch.append((_ts_sec(row[0]), float(row[1]), float(row[2]),
+                          float(row[3]), float(row[4]), float(row[5])))
+            if len(batch) >= batch_rows:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        fh.close()
+        if zf is not None:
+            zf.close()
+
+
+def import_file(f: ArchiveFile, db_path: Optional[str] = None, force: bool = False) -> Tuple[str, int]:
+    """
+    Імпорт одного файлу (виконується у воркер-процесі зі своїм з'єднанням до SQLite).
+    Повертає (source, rows); rows = -1 — файл уже імпортовано раніше.
+    """
+    from market_data.candle_store import CandleStore
+    store = CandleStore(db_path) if db_path else CandleStore()
+    if not force and store.is_imported(f.source, f.size):
+        return f.source, -1
+    rows = store.bulk_import(f.symbol, f.tf, iter_batches(f.path), source=f.source, size=f.size)
+    return f.source, rows
+
+
+def run_import(root: str, symbols: Optional[Sequence[str]] = None, timeframes: Optional[Sequence[str]] = None,
+               workers: int = 0, db_path: Optional[str] = None, force: bool = False,
+               progress: Optional[Callable[[str, int, dict], None]] = None) -> dict:
+    """
+    Паралельний імпорт каталогу архівів у candle store.
+    Парсинг CSV іде в кількох процесах; SQLite (WAL) серіалізує записи, кожен файл — одна транзакція.
+    """
+    files = discover(root, symbols, timeframes)
+    stats = {"files": len(files), "imported": 0, "skipped": 0, "failed": 0, "rows": 0}
+    if not files:
+        return stats
+    if db_path is None:
+        # один шлях для всіх воркерів (кандидати резолвимо в батьківському процесі)
+        from market_data.candle_store import get_store
+        db_path = get_store().path
+    workers = workers or min(len(files), os.cpu_count() or 2)
+
+    def _done(source: str, rows: int) -> None:
+        if rows < 0:
+            stats["skipped"] += 1
+        else:
+            stats["imported"] += 1
+            stats["rows"] += rows
+        if progress:
+            progress(source, rows, stats)
+
+    if workers <= 1:
+        for f in files:
+            try:
+                _done(*import_file(f, db_path, force))
+            except Exception as e:
+                stats["failed"] += 1
+                log.warning("[import] %s failed: %s", f.path, e)
+        return stats
+
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        futs = {ex.submit(import_file, f, db_path, force): f for f in files}
+        for fut in as_completed(futs):
+            try:
+                _done(*fut.result())
+            except Exception as e:
+                stats["failed"] += 1
+                log.warning("[import] %s failed: %s", futs[fut].path, e)
+    return stats
+
+
+__all__ = ["ArchiveFile", "discover", "import_file", "iter_batches", "parse_name", "run_import"]
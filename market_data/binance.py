@@ -1,13 +1,11 @@
 # market_data/binance.py
 from __future__ import annotations
 import logging
-import time
-from typing import List, Dict, Any
-import requests
+from typing import List, Dict, Any, Optional
 
-log = logging.getLogger("binance_http")
+from market_data.binance_client import BASE_URL, get_client  # noqa: F401  (BASE_URL — для сумісності)
 
-BASE_URL = "https://api.binance.com"  # spot API
+log = logging.getLogger("binance_http")
 
 # Дозволені таймфрейми (мапа 1:1 з Binance)
 INTERVAL_MAP = {
@@ -16,47 +14,25 @@ INTERVAL_MAP = {
     "1d": "1d", "3d": "3d", "1w": "1w", "1M": "1M",
 }
 
-def _http_get(url: str, params: Dict[str, Any], retries: int = 3, backoff: float = 0.6):
-    """Простий GET з ретраями на 429/5xx."""
-    for i in range(retries):
-        r = requests.get(url, params=params, timeout=15)
-        if r.status_code == 200:
-            return r.json()
-        # ліміти/тимчасові помилки — ретрай
-        if r.status_code in (429, 418) or 500 <= r.status_code < 600:
-            wait = backoff * (2 ** i)
-            log.warning("Binance GET %s failed (%s). Retry in %.2fs", url, r.status_code, wait)
-            time.sleep(wait)
-            continue
-        # інші коди — піднімаємо
-        r.raise_for_status()
-    # якщо всі ретраї вмерли — остання відповідь
-    r.raise_for_status()
+# Тривалість бару в секундах (1M — умовно 30 днів, лише для оцінки «скільки барів пропущено»)
+INTERVAL_SEC = {
+    "1m": 60, "3m": 180, "5m": 300, "15m": 900, "30m": 1800,
+    "1h": 3600, "2h": 7200, "4h": 14400, "6h": 21600, "8h": 28800, "12h": 43200,
+    "1d": 86400, "3d": 259200, "1w": 604800, "1M": 2592000,
+}
 
-def fetch_ohlcv_raw(symbol: str, timeframe: str, limit: int = 500) -> List[Dict[str, Any]]:
-    """
-    Повертає список барів у форматі:
-    [
-      {"ts": <unix_seconds>, "open": float, "high": float, "low": float, "close": float, "volume": float},
-      ...
-    ]
-    """
+_MAX_PER_CALL = 1000  # Binance віддає максимум 1000 klines за запит
+
+def _check_tf(timeframe: str) -> str:
     tf = timeframe.strip()
     if tf not in INTERVAL_MAP:
         raise ValueError(f"Unsupported timeframe: {timeframe}")
+    return tf
 
-    lim = max(1, min(int(limit or 500), 1000))  # Binance максимум 1000
-    url = f"{BASE_URL}/api/v3/klines"
-    params = {
-        "symbol": symbol.upper(),
-        "interval": INTERVAL_MAP[tf],
-        "limit": lim,
-    }
-
-    data = _http_get(url, params)
+def _parse_klines(data: List[list], symbol: str, timeframe: str) -> List[Dict[str, Any]]:
     out: List[Dict[str, Any]] = []
     # Відповідь: [openTime, open, high, low, close, volume, closeTime, ...]
-    for row in data:
+    for row in data or []:
         try:
             out.append({
                 "ts": int(row[0] // 1000),               # ms → s
@@ -69,3 +45,57 @@ def fetch_ohlcv_raw(symbol: str, timeframe: str, limit: int = 500) -> List[Dict[
         except Exception as e:
             log.warning("Bad kline row for %s %s: %s (%s)", symbol, timeframe, row, e)
     return out
+
+def _ms(ts_sec: Optional[int]) -> Optional[int]:
+    return None if ts_sec is None else int(ts_sec) * 1000
+
+def _page_end(page: List[Dict[str, Any]]) -> int:
+    return page[0]["ts"] * 1000 - 1  # endTime для попередньої сторінки (ms)
+
+def fetch_ohlcv_raw(symbol: str, timeframe: str, limit: int = 500,
+                    start_ts: Optional[int] = None, end_ts: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Повертає список барів у форматі:
+    [
+      {"ts": <unix_seconds>, "open": float, "high": float, "low": float, "close": float, "volume": float},
+      ...
+    ]
+    start_ts (unix seconds) — брати бари починаючи з цього відкриття (дельта-дозавантаження);
+    end_ts — останнє відкриття включно (добір дірки [start_ts, end_ts]).
+    limit > 1000 без start_ts — гортаємо назад сторінками по 1000 (endTime).
+    """
+    tf = _check_tf(timeframe)
+    if start_ts is not None or limit <= _MAX_PER_CALL:
+        data = get_client().klines(symbol, INTERVAL_MAP[tf], limit=limit,
+                                   start_time=_ms(start_ts), end_time=_ms(end_ts))
+        return _parse_klines(data, symbol, timeframe)
+    out: List[Dict[str, Any]] = []
+    end: Optional[int] = None
+    while len(out) < limit:
+        n = min(_MAX_PER_CALL, limit - len(out))
+        page = _parse_klines(get_client().klines(symbol, INTERVAL_MAP[tf], limit=n, end_time=end), symbol, timeframe)
+        out = page + out
+        if len(page) < n:
+            break  # історія пари коротша за limit
+        end = _page_end(page)
+    return out
+
+async def afetch_ohlcv_raw(symbol: str, timeframe: str, limit: int = 500,
+                           start_ts: Optional[int] = None, end_ts: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Async-варіант fetch_ohlcv_raw (не блокує event loop)."""
+    tf = _check_tf(timeframe)
+    if start_ts is not None or limit <= _MAX_PER_CALL:
+        data = await get_client().aklines(symbol, INTERVAL_MAP[tf], limit=limit,
+                                          start_time=_ms(start_ts), end_time=_ms(end_ts))
+        return _parse_klines(data, symbol, timeframe)
+    out: List[Dict[str, Any]] = []
+    end: Optional[int] = None
+    while len(out) < limit:
+        n = min(_MAX_PER_CALL, limit - len(out))
+        data = await get_client().aklines(symbol, INTERVAL_MAP[tf], limit=n, end_time=end)
+        page = _parse_klines(data, symbol, timeframe)
+        out = page + out
+        if len(page) < n:
+            break
+        end = _page_end(page)
+    return out
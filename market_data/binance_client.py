@@ -0,0 +1,329 @@
+# market_data/binance_client.py
+from __future__ import annotations
+import asyncio
+import logging
+import os
+import threading
+import time
+import weakref
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from market_data.circuit import CircuitBreaker, CircuitOpen, circuits, get_breaker, get_negative_cache
+from market_data.rate_limiter import get_limiter, request_weight
+
+log = logging.getLogger("binance_http")
+
+BASE_URL = os.getenv("BINANCE_BASE_URL", "https://api.binance.com").rstrip("/")  # spot API
+
+# HTTP/2 вмикаємо лише якщо встановлено h2 (httpx без нього падає на http2=True)
+try:
+    import h2  # noqa: F401
+    _HTTP2 = True
+except Exception:
+    _HTTP2 = False
+
+_TIMEOUT = float(os.getenv("BINANCE_HTTP_TIMEOUT", "15") or 15)
+_POOL_MAX = int(os.getenv("BINANCE_POOL_MAX", "20") or 20)
+_KEEPALIVE_SEC = float(os.getenv("BINANCE_KEEPALIVE_SEC", "60") or 60)
+
+_RETRY_STATUS = (429, 418)
+# Довше за це не чекаємо на бюджет ваги/бан — краще швидко віддати помилку скану
+_MAX_WAIT_SEC = float(os.getenv("BINANCE_MAX_WAIT_SEC", "30") or 30)
+
+
+class RateLimited(RuntimeError):
+    """Бюджет ваги вичерпано / IP під 429-418 довше, ніж _MAX_WAIT_SEC."""
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=_POOL_MAX,
+        max_keepalive_connections=_POOL_MAX,
+        keepalive_expiry=_KEEPALIVE_SEC,
+    )
+
+
+def _retriable(status: int) -> bool:
+    return status in _RETRY_STATUS or 500 <= status < 600
+
+
+def _upstream_failure(status: int) -> bool:
+    # 5xx — біржа деградувала; 4xx (крім 429/418) — відповідь по суті, ендпоінт живий
+    return 500 <= status < 600
+
+
+class BinanceClient:
+    """
+    Єдиний процесний клієнт Binance REST з keep-alive пулом (і HTTP/2, якщо є h2).
+    Синхронні виклики (з потоків / старих модулів) йдуть через спільний httpx.Client,
+    асинхронні — через httpx.AsyncClient, свій для кожного event loop.
+    """
+
+    def __init__(self, base_url: str = BASE_URL, timeout: float = _TIMEOUT) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._sync_client: Optional[httpx.Client] = None
+        # AsyncClient (його пул з'єднань) прив'язаний до loop-а, тому — окремий на кожен loop;
+        # слабкі ключі: клієнт закритого й зібраного loop-а не тримаємо
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = \
+            weakref.WeakKeyDictionary()
+        self._host = urlsplit(self.base_url).netloc or self.base_url
+
+    # ── транспорт ────────────────────────────────────────────────────────────
+    def _sync(self) -> httpx.Client:
+        with self._lock:
+            if self._sync_client is None:
+                self._sync_client = httpx.Client(
+                    base_url=self.base_url, timeout=self.timeout, http2=_HTTP2, limits=_limits(),
+                )
+            return self._sync_client
+
+    def _async(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            cli = self._async_clients.get(loop)
+            if cli is None:
+                # інший loop (напр. asyncio.run у скрипті) не перезатирає клієнт робочого loop-а;
+                # клієнти вже закритих loop-ів відпускаємо — їхні сокети мертві разом із loop-ом
+                for old in [lp for lp in self._async_clients if lp.is_closed()]:
+                    del self._async_clients[old]
+                cli = self._async_clients[loop] = httpx.AsyncClient(
+                    base_url=self.base_url, timeout=self.timeout, http2=_HTTP2, limits=_limits(),
+                )
+            return cli
+
+    # ── circuit breaker / негативний кеш ─────────────────────────────────────
+    def _guard(self, path: str, params: Optional[Dict[str, Any]]) -> Tuple[CircuitBreaker, Optional[tuple]]:
+        """Швидка відмова до будь-якого очікування: той самий запит нещодавно впав або ланцюг відкритий."""
+        sym = (params or {}).get("symbol")
+        # ключ — увесь нормалізований запит: 400 на непідтримуваний interval/limit не блокує
+        # валідні запити того ж символу з іншими параметрами
+        neg_key = (path, tuple(sorted((str(k), str(v)) for k, v in params.items()))) if sym else None
+        if neg_key is not None:
+            err = get_negative_cache().get(neg_key)
+            if err is not None:
+                raise CircuitOpen(f"Binance GET {path} {sym}: recent failure ({err})")
+        br = get_breaker(self._host + path)
+        if not br.allow():
+            raise CircuitOpen(f"Binance GET {path}: circuit open, retry in {br.retry_in():.0f}s")
+        return br, neg_key
+
+    @staticmethod
+    def _failed(br: CircuitBreaker, neg_key: Optional[tuple], err: BaseException, upstream: bool) -> None:
+        if upstream:
+            br.record_failure()
+        else:
+            br.record_success()
+        if neg_key is not None:
+            get_negative_cache().put(neg_key, f"{type(err).__name__}: {str(err)[:120]}")
+
+    def _on_status_error(self, br: CircuitBreaker, neg_key: Optional[tuple], e: httpx.HTTPStatusError) -> bool:
+        """Фінальна не-200 відповідь; True — результат записано в breaker."""
+        status = e.response.status_code
+        if status in _RETRY_STATUS:
+            # 429/418 — обмеження нашого IP, а не збій ендпоінта/символу: breaker і негативний кеш не чіпаємо
+            return False
+        # 5xx уже пораховані в циклі — тут лише негативний кеш (і «ендпоінт живий» для 4xx)
+        if not _upstream_failure(status):
+            self._failed(br, neg_key, e, upstream=False)
+            return True
+        if neg_key is not None:
+            get_negative_cache().put(neg_key, f"HTTP {status}")
+        return True
+
+    def get_json(self, path: str, params: Optional[Dict[str, Any]] = None,
+                 retries: int = 3, backoff: float = 0.6, timeout: Optional[float] = None) -> Any:
+        """
+        GET через limiter ваги + ретраї на 429/418/5xx (блокуючий — лише поза event loop).
+        5xx/timeout рахуються в circuit breaker ендпоінта: коли він відкривається, ретраї
+        обриваються, а наступні виклики падають одразу CircuitOpen без запиту і sleep.
+        """
+        br, neg_key = self._guard(path, params)
+        cli = self._sync()
+        lim, weight = get_limiter(), request_weight(path, params)
+        r = None
+        recorded = False  # чи отримав breaker результат (інакше — звільняємо слот пробного запиту)
+        try:
+            for i in range(retries):
+                pause = lim.reserve(weight, max_wait=_MAX_WAIT_SEC)
+                if pause > _MAX_WAIT_SEC:
+                    raise RateLimited(f"Binance GET {path}: weight budget exhausted ({pause:.0f}s)")
+                if pause > 0:
+                    time.sleep(pause)
+                r = cli.get(path, params=params, timeout=timeout or self.timeout)
+                lim.observe(r.headers, r.status_code)
+                if r.status_code == 200:
+                    data = r.json()
+                    br.record_success()
+                    recorded = True
+                    return data
+                if _retriable(r.status_code):
+                    if _upstream_failure(r.status_code):
+                        br.record_failure()
+                        recorded = True
+                        if br.is_open():
+                            break
+                    # 429/418: паузу вже виставив limiter (Retry-After) — наступний reserve() її витримає
+                    wait = 0.0 if r.status_code in _RETRY_STATUS else backoff * (2 ** i)
+                    log.warning("Binance GET %s failed (%s). Retry in %.2fs", path, r.status_code, wait)
+                    time.sleep(wait)
+                    continue
+                r.raise_for_status()
+            if r is None:
+                raise RuntimeError(f"Binance GET {path}: no response")
+            r.raise_for_status()
+            data = r.json()
+            br.record_success()
+            recorded = True
+            return data
+        except httpx.HTTPStatusError as e:
+            recorded = self._on_status_error(br, neg_key, e) or recorded
+            raise
+        except httpx.TransportError as e:
+            self._failed(br, neg_key, e, upstream=True)
+            recorded = True
+            raise
+        finally:
+            if not recorded:
+                br.release()
+
+    async def aget_json(self, path: str, params: Optional[Dict[str, Any]] = None,
+                        retries: int = 3, backoff: float = 0.6, timeout: Optional[float] = None) -> Any:
+        """Асинхронний GET з тими ж правилами ретраїв і circuit breaker."""
+        br, neg_key = self._guard(path, params)
+        cli = self._async()
+        lim, weight = get_limiter(), request_weight(path, params)
+        r = None
+        recorded = False  # CancelledError / ValueError з r.json() теж мають звільнити half-open слот
+        try:
+            for i in range(retries):
+                pause = lim.reserve(weight, max_wait=_MAX_WAIT_SEC)
+                if pause > _MAX_WAIT_SEC:
+                    raise RateLimited(f"Binance GET {path}: weight budget exhausted ({pause:.0f}s)")
+                if pause > 0:
+                    await asyncio.sleep(pause)
+                r = await cli.get(path, params=params, timeout=timeout or self.timeout)
+                lim.observe(r.headers, r.status_code)
+                if r.status_code == 200:
+                    data = r.json()
+                    br.record_success()
+                    recorded = True
+                    return data
+                if _retriable(r.status_code):
+                    if _upstream_failure(r.status_code):
+                        br.record_failure()
+                        recorded = True
+                        if br.is_open():
+                            break
+                    wait = 0.0 if r.status_code in _RETRY_STATUS else backoff * (2 ** i)
+                    log.warning("Binance GET %s failed (%s). Retry in %.2fs", path, r.status_code, wait)
+                    await asyncio.sleep(wait)
+                    continue
+                r.raise_for_status()
+            if r is None:
+                raise RuntimeError(f"Binance GET {path}: no response")
+            r.raise_for_status()
+            data = r.json()
+            br.record_success()
+            recorded = True
+            return data
+        except httpx.HTTPStatusError as e:
+            recorded = self._on_status_error(br, neg_key, e) or recorded
+            raise
+        except httpx.TransportError as e:
+            self._failed(br, neg_key, e, upstream=True)
+            recorded = True
+            raise
+        finally:
+            if not recorded:
+                br.release()
+
+    # ── endpoints ────────────────────────────────────────────────────────────
+    @staticmethod
+    def _klines_params(symbol: str, interval: str, limit: int,
+                       start_time: Optional[int], end_time: Optional[int]) -> Dict[str, Any]:
+        params: Dict[str, Any] = {
+            "symbol": symbol.upper(),
+            "interval": interval,
+            "limit": max(1, min(int(limit or 500), 1000)),  # Binance максимум 1000
+        }
+        if start_time is not None:
+            params["startTime"] = int(start_time)
+        if end_time is not None:
+            params["endTime"] = int(end_time)
+        return params
+
+    def klines(self, symbol: str, interval: str, limit: int = 500,
+               start_time: Optional[int] = None, end_time: Optional[int] = None) -> List[list]:
+        return self.get_json("/api/v3/klines", self._klines_params(symbol, interval, limit, start_time, end_time))
+
+    async def aklines(self, symbol: str, interval: str, limit: int = 500,
+                      start_time: Optional[int] = None, end_time: Optional[int] = None) -> List[list]:
+        return await self.aget_json("/api/v3/klines", self._klines_params(symbol, interval, limit, start_time, end_time))
+
+    def depth(self, symbol: str, limit: int = 100) -> Dict[str, Any]:
+        return self.get_json("/api/v3/depth", {"symbol": symbol.upper(), "limit": int(limit)})
+
+    async def adepth(self, symbol: str, limit: int = 100) -> Dict[str, Any]:
+        return await self.aget_json("/api/v3/depth", {"symbol": symbol.upper(), "limit": int(limit)})
+
+    def ticker_24h(self, symbol: Optional[str] = None) -> Any:
+        params = {"symbol": symbol.upper()} if symbol else None
+        return self.get_json("/api/v3/ticker/24hr", params, timeout=max(self.timeout, 20.0))
+
+    async def aticker_24h(self, symbol: Optional[str] = None) -> Any:
+        params = {"symbol": symbol.upper()} if symbol else None
+        return await self.aget_json("/api/v3/ticker/24hr", params, timeout=max(self.timeout, 20.0))
+
+    def ticker_price(self, symbol: Optional[str] = None) -> Any:
+        params = {"symbol": symbol.upper()} if symbol else None
+        return self.get_json("/api/v3/ticker/price", params)
+
+    async def aticker_price(self, symbol: Optional[str] = None) -> Any:
+        params = {"symbol": symbol.upper()} if symbol else None
+        return await self.aget_json("/api/v3/ticker/price", params)
+
+    @staticmethod
+    def usage() -> Dict[str, Any]:
+        """Метрика бюджету REQUEST_WEIGHT (див. market_data.rate_limiter)."""
+        return get_limiter().usage()
+
+    @staticmethod
+    def circuits() -> Dict[str, Dict[str, Any]]:
+        """Стан circuit breaker-ів по ендпоінтах (див. market_data.circuit)."""
+        return circuits()
+
+    # ── lifecycle ────────────────────────────────────────────────────────────
+    def close(self) -> None:
+        with self._lock:
+            cli, self._sync_client = self._sync_client, None
+        if cli is not None:
+            cli.close()
+
+    async def aclose(self) -> None:
+        """Закриває AsyncClient поточного loop-а (клієнти інших loop-ів закриваються у своїх)."""
+        with self._lock:
+            cli = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if cli is not None:
+            await cli.aclose()
+
+
+_CLIENT: Optional[BinanceClient] = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def get_client() -> BinanceClient:
+    """Процесний singleton — всі market_data-модулі ходять у Binance через нього."""
+    global _CLIENT
+    if _CLIENT is None:
+        with _CLIENT_LOCK:
+            if _CLIENT is None:
+                _CLIENT = BinanceClient()
+    return _CLIENT
+
+
+__all__ = ["BASE_URL", "BinanceClient", "CircuitOpen", "RateLimited", "get_client"]
@@ -1,32 +1,23 @@
-import requests
 import pandas as pd
 
-BINANCE_BASE = "https://api.binance.com"
+from market_data.binance_client import BASE_URL as BINANCE_BASE, get_client  # noqa: F401
+from market_data.candles import get_series
+from market_data.price_snapshot import get_snapshot
+from market_data.universe import get_universe
 
 def get_ohlcv(symbol: str, interval: str = "1m", limit: int = 150) -> pd.DataFrame:
-    url = f"{BINANCE_BASE}/api/v3/klines"
-    r = requests.get(url, params={"symbol": symbol, "interval": interval, "limit": limit}, timeout=15)
-    r.raise_for_status()
-    raw = r.json()
-    cols = [
-        "open_time","open","high","low","close","volume",
-        "close_time","qav","trades","tbbav","tbqav","ignore"
-    ]
-    df = pd.DataFrame(raw, columns=cols)
-    for c in ["open","high","low","close","volume"]:
-        df[c] = pd.to_numeric(df[c], errors="coerce")
-    df["open_time"] = pd.to_datetime(df["open_time"], unit="ms", utc=True)
-    df = df.rename(columns={"open_time":"timestamp"})
+    # через персистентне сховище свічок (market_data.candles), щоб скрінери не качали повні вікна
+    df = get_series(symbol, interval, limit).to_frame()
+    df["timestamp"] = pd.to_datetime(df["ts"], unit="s", utc=True)
     return df[["timestamp","open","high","low","close","volume"]].copy()
 
 def get_24h_ticker() -> list:
-    url = f"{BINANCE_BASE}/api/v3/ticker/24hr"
-    r = requests.get(url, timeout=20)
-    r.raise_for_status()
-    return r.json()
+    # кешований знімок /ticker/24hr (market_data.universe) — вага 80 раз на TTL
+    return get_universe().table().rows()
 
 def get_latest_price(symbol: str) -> float:
-    url = f"{BINANCE_BASE}/api/v3/ticker/price"
-    r = requests.get(url, params={"symbol": symbol}, timeout=10)
-    r.raise_for_status()
-    return float(r.json()["price"])
+    # спільний знімок усіх цін (market_data.price_snapshot) замість запиту на символ
+    px = get_snapshot().get(symbol)
+    if px is None:
+        return float(get_client().ticker_price(symbol)["price"])
+    return px
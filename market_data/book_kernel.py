@@ -0,0 +1,159 @@
+# market_data/book_kernel.py
+from __future__ import annotations
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def _side(levels: Iterable[Sequence[Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    arr = np.asarray([(float(p), float(q)) for p, q in levels], dtype=np.float64).reshape(-1, 2)
+    arr = arr[arr[:, 1] > 0]
+    order = np.argsort(arr[:, 0], kind="stable")
+    return arr[order, 0], arr[order, 1]
+
+
+class BookKernel:
+    """
+    Незмінний зліпок стакану для аналітики: по кожній стороні — ціни за зростанням,
+    qty, notional (p*q) і префіксні суми notional/qty.
+    Сума в будь-якому ціновому вікні = дві bisect (searchsorted) + різниця префіксів,
+    тому walls/imbalance/depth для багатьох вікон рахуються без циклів по рівнях.
+    """
+
+    __slots__ = ("bid_px", "bid_qty", "bid_usd", "bid_cum", "bid_cum_qty",
+                 "ask_px", "ask_qty", "ask_usd", "ask_cum", "ask_cum_qty")
+
+    def __init__(self, bids: Iterable[Sequence[Any]], asks: Iterable[Sequence[Any]]) -> None:
+        self.bid_px, self.bid_qty = _side(bids)
+        self.ask_px, self.ask_qty = _side(asks)
+        self.bid_usd = self.bid_px * self.bid_qty
+        self.ask_usd = self.ask_px * self.ask_qty
+        # cum[i] = сума перших i рівнів (cum[0] = 0) → сума [i, j) = cum[j] - cum[i]
+        self.bid_cum = np.concatenate(([0.0], np.cumsum(self.bid_usd)))
+        self.ask_cum = np.concatenate(([0.0], np.cumsum(self.ask_usd)))
+        self.bid_cum_qty = np.concatenate(([0.0], np.cumsum(self.bid_qty)))
+        self.ask_cum_qty = np.concatenate(([0.0], np.cumsum(self.ask_qty)))
+
+    @classmethod
+    def from_depth(cls, depth: Dict[str, Any]) -> "BookKernel":
+        return cls(depth.get("bids") or [], depth.get("asks") or [])
+
+    @classmethod
+    def from_maps(cls, bids: Dict[float, float], asks: Dict[float, float]) -> "BookKernel":
+        """З price->qty словників LocalOrderBook без проміжних списків кортежів."""
+        k = cls.__new__(cls)
+        for side, book in (("bid", bids), ("ask", asks)):
+            px = np.fromiter(book.keys(), dtype=np.float64, count=len(book))
+            qty = np.fromiter(book.values(), dtype=np.float64, count=len(book))
+            order = np.argsort(px, kind="stable")
+            px, qty = px[order], qty[order]
+            usd = px * qty
+            setattr(k, f"{side}_px", px)
+            setattr(k, f"{side}_qty", qty)
+            setattr(k, f"{side}_usd", usd)
+            setattr(k, f"{side}_cum", np.concatenate(([0.0], np.cumsum(usd))))
+            setattr(k, f"{side}_cum_qty", np.concatenate(([0.0], np.cumsum(qty))))
+        return k
+
+    def _arrays(self, side: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        if side in ("bid", "bids"):
+            return self.bid_px, self.bid_qty, self.bid_usd, self.bid_cum
+        return self.ask_px, self.ask_qty, self.ask_usd, self.ask_cum
+
+    # ── базові величини ──────────────────────────────────────────────────────
+    def best_bid(self) -> Optional[float]:
+        return float(self.bid_px[-1]) if self.bid_px.size else None
+
+    def best_ask(self) -> Optional[float]:
+        return float(self.ask_px[0]) if self.ask_px.size else None
+
+    def mid(self) -> Optional[float]:
+        bb, ba = self.best_bid(), self.best_ask()
+        return (bb + ba) / 2.0 if bb is not None and ba is not None else None
+
+    def spread_bps(self) -> Optional[float]:
+        bb, ba, mid = self.best_bid(), self.best_ask(), self.mid()
+        return (ba - bb) / mid * 10_000 if mid else None
+
+    # ── вікна ────────────────────────────────────────────────────────────────
+    def notional_between(self, side: str, lo, hi):
+        """Сума notional рівнів з lo <= price <= hi (lo/hi — скаляри або масиви)."""
+        px, _, _, cum = self._arrays(side)
+        i = np.searchsorted(px, lo, side="left")
+        j = np.searchsorted(px, hi, side="right")
+        return cum[j] - cum[np.minimum(i, j)]
+
+    def imbalance(self, price: float, window_pct=0.5, cap: float = 9.99):
+        """bid_usd[price·(1-w), price] / ask_usd[price, price·(1+w)]; window_pct може бути списком."""
+        w = np.asarray(window_pct, dtype=np.float64) / 100.0
+        bid = self.notional_between("bid", price * (1 - w), price)
+        ask = self.notional_between("ask", price, price * (1 + w))
+        out = np.where(ask <= 1e-9, cap, bid / np.where(ask <= 1e-9, 1.0, ask))
+        return float(out) if out.ndim == 0 else out.tolist()
+
+    def depth_to_move(self, side: str, pct) -> Any:
+        """
+        Скільки USD треба «з'їсти», щоб зсунути ціну на pct% від найкращої:
+        ask — купівлею вгору, bid — продажем вниз. pct може бути списком.
+        """
+        p = np.asarray(pct, dtype=np.float64) / 100.0
+        if side in ("ask", "asks"):
+            ref = self.best_ask()
+            res = self.notional_between("ask", ref, ref * (1 + p)) if ref else np.zeros_like(p)
+        else:
+            ref = self.best_bid()
+            res = self.notional_between("bid", ref * (1 - p), ref) if ref else np.zeros_like(p)
+        res = np.asarray(res, dtype=np.float64)
+        return float(res) if res.ndim == 0 else res.tolist()
+
+    # ── стіни ────────────────────────────────────────────────────────────────
+    def _window(self, side: str, lo: float, hi: float) -> Tuple[int, int]:
+        px = self._arrays(side)[0]
+        return int(np.searchsorted(px, lo, side="left")), int(np.searchsorted(px, hi, side="right"))
+
+    def nearest_wall(self, side: str, price: float, min_usd: float, near_pct: float) -> Optional[Dict[str, float]]:
+        """
+        Найближча до price стіна >= min_usd у межах near_pct%: bid — строго нижче price, ask — строго вище.
+        """
+        px, qty, usd, _ = self._arrays(side)
+        if side in ("bid", "bids"):
+            i, j = self._window(side, price * (1 - near_pct / 100.0), price)
+            if j > i and px[j - 1] >= price:
+                j -= 1
+            hits = np.flatnonzero(usd[i:j] >= min_usd)
+            if not hits.size:
+                return None
+            k = i + int(hits[-1])   # ціни зростають → найближча знизу — остання
+        else:
+            i, j = self._window(side, price, price * (1 + near_pct / 100.0))
+            if j > i and px[i] <= price:
+                i += 1
+            hits = np.flatnonzero(usd[i:j] >= min_usd)
+            if not hits.size:
+                return None
+            k = i + int(hits[0])
+        p = float(px[k])
+        return {"price": p, "qty": float(qty[k]), "vol_usd": float(usd[k]), "dist_pct": (p - price) / price * 100.0}
+
+    def closest_level(self, side: str, price: float, win_pct: float, min_usd: float) -> Optional[Dict[str, float]]:
+        """Рівень сторони у ±win_pct% з notional >= min_usd, найближчий до price (з будь-якого боку)."""
+        px, qty, usd, _ = self._arrays(side)
+        i, j = self._window(side, price * (1 - win_pct / 100.0), price * (1 + win_pct / 100.0))
+        hits = np.flatnonzero(usd[i:j] >= min_usd)
+        if not hits.size:
+            return None
+        idx = i + hits
+        k = int(idx[np.argmin(np.abs(px[idx] - price))])
+        return {"price": float(px[k]), "qty": float(qty[k]), "quote": float(usd[k])}
+
+    def levels(self, side: str, n: Optional[int] = None) -> List[Tuple[float, float]]:
+        """[(price, qty)] від найкращої ціни (сумісно з LocalOrderBook.levels)."""
+        px, qty, _, _ = self._arrays(side)
+        if side in ("bid", "bids"):
+            px, qty = px[::-1], qty[::-1]
+        if n is not None:
+            px, qty = px[: int(n)], qty[: int(n)]
+        return list(zip(px.tolist(), qty.tolist()))
+
+
+__all__ = ["BookKernel"]
@@ -0,0 +1,266 @@
+# market_data/candle_store.py
+from __future__ import annotations
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from market_data.binance import INTERVAL_SEC
+from market_data import coverage as cov
+
+log = logging.getLogger("candle_store")
+
+# Окремий файл від bot.db: свічки пишуться часто й багато, не хочемо блокувати основну БД
+def _candidates() -> List[str]:
+    env_path = os.environ.get("CANDLE_DB_PATH", "").strip()
+    cands = []
+    if env_path:
+        cands.append(env_path)
+    cands.append("/data/candles.db")                      # Railway volume
+    cands.append(os.path.join(".", "data", "candles.db"))  # local fallback
+    return list(dict.fromkeys(cands))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS candles(
+  symbol TEXT    NOT NULL,
+  tf     TEXT    NOT NULL,
+  ts     INTEGER NOT NULL,
+  open   REAL, high REAL, low REAL, close REAL, volume REAL,
+  PRIMARY KEY(symbol, tf, ts)
+) WITHOUT ROWID;
+
+-- журнал офлайн-імпорту архівів (market_data.archive_import): файл → скільки рядків записано
+CREATE TABLE IF NOT EXISTS candle_imports(
+  source      TEXT    PRIMARY KEY,
+  size        INTEGER NOT NULL,
+  symbol      TEXT,
+  tf          TEXT,
+  rows        INTEGER,
+  imported_at INTEGER
+);
+
+-- індекс покриття (market_data.coverage): відрізки ts відкриття барів, про які біржа вже відповіла
+CREATE TABLE IF NOT EXISTS candle_coverage(
+  symbol TEXT    NOT NULL,
+  tf     TEXT    NOT NULL,
+  lo     INTEGER NOT NULL,
+  hi     INTEGER NOT NULL,
+  PRIMARY KEY(symbol, tf, lo)
+) WITHOUT ROWID;
+"""
+
+_COLS = ("ts", "open", "high", "low", "close", "volume")
+
+
+class CandleStore:
+    """
+    Персистентне сховище OHLCV по (symbol, timeframe) у SQLite.
+    Один конект на процес (WAL) + lock — безпечно з потоків asyncio.to_thread.
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self._lock = threading.RLock()
+        self._conn = self._open(path)
+        self.path: str = self._conn.execute("PRAGMA database_list").fetchone()[2]
+        self._cov: Dict[Tuple[str, str], cov.Coverage] = {}
+
+    @staticmethod
+    def _open(path: Optional[str]) -> sqlite3.Connection:
+        tried = []
+        for p in ([path] if path else _candidates()):
+            try:
+                os.makedirs(os.path.dirname(p) or ".", exist_ok=True)
+                con = sqlite3.connect(p, timeout=30, check_same_thread=False)
+                con.execute("PRAGMA journal_mode=WAL;")
+                con.execute("PRAGMA synchronous=NORMAL;")
+                con.executescript(_SCHEMA)
+                log.info("[candle_store] using %s", p)
+                return con
+            except Exception as e:
+                log.warning("[candle_store] open failed for %s: %s", p, e)
+                tried.append(p)
+        raise sqlite3.OperationalError("candle store: all candidates failed: " + ", ".join(tried))
+
+    def upsert(self, symbol: str, timeframe: str, bars: Iterable[Dict[str, float]],
+               span: Optional[Tuple[int, int]] = None) -> int:
+        """
+        INSERT OR REPLACE — останній (ще не закритий) бар перезаписується свіжою версією.
+        span=(lo, hi) — діапазон, за який відповіла біржа: позначається покритим цілком
+        (бари, яких там нема, біржа підтвердила як відсутні). Без span покриваються самі бари.
+        """
+        sym = symbol.upper()
+        rows = [
+            (sym, timeframe, int(b["ts"]), float(b["open"]), float(b["high"]),
+             float(b["low"]), float(b["close"]), float(b["volume"]))
+            for b in bars
+        ]
+        if not rows and span is None:
+            return 0
+        with self._lock:
+            if rows:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO candles(symbol,tf,ts,open,high,low,close,volume) "
+                    "VALUES(?,?,?,?,?,?,?,?)",
+                    rows,
+                )
+            if cov.tracked(timeframe):
+                if span is not None:
+                    self._cover(sym, timeframe, [span])
+                else:
+                    self._cover(sym, timeframe, cov.runs([r[2] for r in rows], INTERVAL_SEC[timeframe]))
+            self._conn.commit()
+        return len(rows)
+
+    def bulk_import(self, symbol: str, timeframe: str, batches: Iterable[Sequence[tuple]],
+                    source: str, size: int) -> int:
+        """
+        Масовий запис (ts, open, high, low, close, volume) батчами в ОДНІЙ транзакції разом із
+        записом у candle_imports — файл або імпортовано повністю, або ні (можна перезапускати).
+        """
+        sym = symbol.upper()
+        total = 0
+        first = last = None
+        with self._lock:
+            try:
+                if self._conn.in_transaction:
+                    self._conn.commit()
+                self._conn.execute("BEGIN")
+                for batch in batches:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO candles(symbol,tf,ts,open,high,low,close,volume) "
+                        "VALUES(?,?,?,?,?,?,?,?)",
+                        [(sym, timeframe) + tuple(r) for r in batch],
+                    )
+                    total += len(batch)
+                    if cov.tracked(timeframe) and batch:
+                        # архів — повний запис біржі за свій період: покриваємо від першого до останнього бару
+                        if first is None:
+                            first = int(batch[0][0])
+                        last = int(batch[-1][0])
+                if first is not None:
+                    self._cover(sym, timeframe, [(min(first, last), max(first, last))])
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO candle_imports(source,size,symbol,tf,rows,imported_at) "
+                    "VALUES(?,?,?,?,?,?)",
+                    (source, int(size), sym, timeframe, total, int(time.time())),
+                )
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                self._cov.pop((sym, timeframe), None)  # перечитаємо з диску
+                raise
+        return total
+
+    # ── покриття ─────────────────────────────────────────────────────────────
+    def _coverage(self, sym: str, timeframe: str) -> cov.Coverage:
+        """Індекс покриття серії (ліниво з candle_coverage; для старих БД — з наявних ts)."""
+        key = (sym, timeframe)
+        c = self._cov.get(key)
+        if c is not None:
+            return c
+        step = INTERVAL_SEC[timeframe]
+        rows = self._conn.execute(
+            "SELECT lo, hi FROM candle_coverage WHERE symbol=? AND tf=? ORDER BY lo", key,
+        ).fetchall()
+        if rows:
+            c = cov.Coverage(step, rows)
+        else:
+            ts = np.fromiter(
+                (r[0] for r in self._conn.execute(
+                    "SELECT ts FROM candles WHERE symbol=? AND tf=? ORDER BY ts", key)),
+                dtype=np.int64,
+            )
+            self._cov[key] = cov.Coverage(step)
+            self._cover(sym, timeframe, cov.runs(ts, step))
+            return self._cov[key]
+        self._cov[key] = c
+        return c
+
+    def _cover(self, sym: str, timeframe: str, spans: Iterable[Tuple[int, int]]) -> None:
+        """Додає відрізки в індекс (у транзакції виклику); незакриті бари покритими не вважаються."""
+        c = self._coverage(sym, timeframe)
+        closed_hi = cov.last_closed_open(timeframe, time.time())
+        for lo, hi in spans:
+            hi = min(int(hi), closed_hi)
+            if hi < lo:
+                continue
+            (mlo, mhi), hole = c.add(lo, hi)
+            if hole:
+                log.info("[candle_store] gap before %s %s ts=%s", sym, timeframe, mlo)
+            # злиті відрізки лежать усередині [mlo, mhi] — замінюємо їх одним
+            self._conn.execute(
+                "DELETE FROM candle_coverage WHERE symbol=? AND tf=? AND lo BETWEEN ? AND ?",
+                (sym, timeframe, mlo, mhi),
+            )
+            self._conn.execute(
+                "INSERT INTO candle_coverage(symbol,tf,lo,hi) VALUES(?,?,?,?)",
+                (sym, timeframe, mlo, mhi),
+            )
+
+    def gaps(self, symbol: str, timeframe: str, lo: int, hi: int) -> List[Tuple[int, int]]:
+        """Непокриті відрізки [lo, hi] серії (ts відкриття барів) — з пам'яті, без SELECT по свічках."""
+        with self._lock:
+            return self._coverage(symbol.upper(), timeframe).gaps(lo, hi)
+
+    def covered_last(self, symbol: str, timeframe: str) -> Optional[int]:
+        """Кінець останнього покритого відрізку — ts останнього відомого закритого бару (або None)."""
+        with self._lock:
+            return self._coverage(symbol.upper(), timeframe).last()
+
+    def is_imported(self, source: str, size: int) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size FROM candle_imports WHERE source=?", (source,),
+            ).fetchone()
+        return bool(row) and int(row[0]) == int(size)
+
+    def load_rows(self, symbol: str, timeframe: str, limit: int) -> List[tuple]:
+        """Останні limit барів кортежами (ts, open, high, low, close, volume), ts зростає."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT ts,open,high,low,close,volume FROM candles "
+                "WHERE symbol=? AND tf=? ORDER BY ts DESC LIMIT ?",
+                (symbol.upper(), timeframe, int(limit)),
+            ).fetchall()
+        rows.reverse()
+        return rows
+
+    def load(self, symbol: str, timeframe: str, limit: int) -> List[Dict[str, float]]:
+        """Останні limit барів у зростаючому порядку ts."""
+        return [dict(zip(_COLS, r)) for r in self.load_rows(symbol, timeframe, limit)]
+
+    def last_ts(self, symbol: str, timeframe: str) -> Optional[int]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MAX(ts) FROM candles WHERE symbol=? AND tf=?",
+                (symbol.upper(), timeframe),
+            ).fetchone()
+        return int(row[0]) if row and row[0] is not None else None
+
+    def count(self, symbol: str, timeframe: str) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM candles WHERE symbol=? AND tf=?",
+                (symbol.upper(), timeframe),
+            ).fetchone()
+        return int(row[0] or 0)
+
+
+_STORE: Optional[CandleStore] = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_store() -> CandleStore:
+    global _STORE
+    if _STORE is None:
+        with _STORE_LOCK:
+            if _STORE is None:
+                _STORE = CandleStore()
+    return _STORE
+
+
+__all__ = ["CandleStore", "get_store"]
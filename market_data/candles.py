@@ -1,26 +1,247 @@
 from __future__ import annotations
+import logging
 import time, threading
-from typing import List, Dict
+from concurrent.futures import Future
+from typing import Callable, List, Dict, Optional, Tuple
 
 # твій існуючий реальний провайдер
-from market_data.binance import fetch_ohlcv_raw  # очікується функція (symbol, timeframe, limit)->list[dict]
+from market_data.binance import fetch_ohlcv_raw, INTERVAL_SEC  # очікується функція (symbol, timeframe, limit)->list[dict]
+from market_data.candle_store import get_store
+from market_data.series import CandleSeries
+from market_data import resample as rs
+from market_data import coverage as cov
 
-# простий процесний кеш
+log = logging.getLogger("candles")
+
+# процесний кеш: (SYMBOL, tf) -> {"ts", "limit", "series"}; менші limit віддаємо зрізом найдовшого вікна
 _CACHE: Dict[tuple, dict] = {}
 _LOCK = threading.Lock()
+# single-flight: (SYMBOL, tf) -> (limit, Future) — поточне завантаження, на яке чекають інші виклики
+_INFLIGHT: Dict[tuple, Tuple[int, Future]] = {}
+
 TTL_SEC = 30  # однакові дані протягом 30с в усіх місцях (autopost,/ai,Analyze ALL)
+_MAX_DELTA = 1000  # Binance віддає максимум 1000 барів за запит
 
-def get_ohlcv(symbol: str, timeframe: str, limit: int = 200) -> List[dict]:
-    key = (symbol.upper(), timeframe, int(limit))
+# «живі» серії з WebSocket-стріму (market_data.stream): (SYMBOL, tf) -> {"ts": recv_time, "bar": forming bar}
+_LIVE: Dict[tuple, dict] = {}
+LIVE_MAX_AGE_SEC = 30  # якщо стрім мовчить довше — повертаємось до REST-дозавантаження
+
+# локальний ресемплінг (market_data.resample): похідна серія -> її база та інкрементальний агрегатор
+_BASE_OF: Dict[tuple, tuple] = {}
+_RESAMPLERS: Dict[tuple, rs.Resampler] = {}
+# серії, для яких Binance віддав менше барів, ніж просили (нова пара) — не перекачуємо щоразу
+_SHORT_HISTORY: set = set()
+# слухачі барів стріму (напр. services.indicator_state): fn(symbol, tf, bar, closed)
+_BAR_LISTENERS: List[Callable[[str, str, dict, bool], None]] = []
+
+def add_bar_listener(fn: Callable[[str, str, dict, bool], None]) -> None:
+    if fn not in _BAR_LISTENERS:
+        _BAR_LISTENERS.append(fn)
+
+def _sync_store(symbol: str, timeframe: str, limit: int) -> List[tuple]:
+    """
+    Дозавантажує у персистентне сховище лише непокриті відрізки вікна останніх limit барів
+    (індекс покриття CandleStore) і повертає їх кортежами (ts, open, high, low, close, volume).
+    Звичайний випадок — одна дірка «поточний формований бар»; після простою — лише пропущені
+    діапазони, згруповані в запити по ≤1000 барів, а не все вікно заново.
+    """
+    if not cov.tracked(timeframe):
+        return _sync_store_delta(symbol, timeframe, limit)
+    store = get_store()
+    sym = symbol.upper()
+    step = INTERVAL_SEC[timeframe]
+    lo, hi = cov.window(timeframe, limit, time.time())
+    gaps = store.gaps(sym, timeframe, lo, hi)
+    if len(gaps) > 1 or (gaps and gaps[0][0] < hi):
+        log.debug("[candles] %s %s: filling %d gap(s) %s", sym, timeframe, len(gaps), gaps[:5])
+    for a, b in cov.plan_requests(gaps, step, _MAX_DELTA):
+        bars = fetch_ohlcv_raw(sym, timeframe, (b - a) // step + 1, start_ts=a, end_ts=b)
+        # весь [a, b] — відповідь біржі: бари, яких нема (до лістингу/простій біржі), більше не просимо
+        store.upsert(sym, timeframe, bars, span=(a, b))
+    return store.load_rows(sym, timeframe, limit)
+
+def _sync_store_delta(symbol: str, timeframe: str, limit: int) -> List[tuple]:
+    """
+    3d/1M (без індексу покриття): дельта від last_ts або повне вікно, якщо серії ще нема,
+    вона закоротка або відстала більш ніж на 1000 барів.
+    """
+    store = get_store()
+    sym = symbol.upper()
+    last = store.last_ts(sym, timeframe)
+    tf_sec = INTERVAL_SEC.get(timeframe, 60)
+    missing = ((int(time.time()) - last) // tf_sec + 1) if last is not None else None
+    short = store.count(sym, timeframe) < limit and (sym, timeframe) not in _SHORT_HISTORY
+    if missing is None or missing >= _MAX_DELTA or short:
+        bars = fetch_ohlcv_raw(sym, timeframe, limit)  # >1000 — сторінками
+        if len(bars) < limit:
+            _SHORT_HISTORY.add((sym, timeframe))
+    else:
+        # останній збережений бар міг бути ще незакритим — перезапитуємо починаючи з нього
+        bars = fetch_ohlcv_raw(sym, timeframe, int(missing) + 1, start_ts=last)
+    store.upsert(sym, timeframe, bars)
+    return store.load_rows(sym, timeframe, limit)
+
+def _is_live(key: tuple, now: float) -> bool:
+    live = _LIVE.get(_BASE_OF.get(key, key))
+    return bool(live) and (now - live["ts"] <= LIVE_MAX_AGE_SEC)
+
+def is_live(symbol: str, timeframe: str) -> bool:
+    """Серію зараз живить WebSocket-стрім (бари приходять не пізніше LIVE_MAX_AGE_SEC)."""
+    return _is_live((symbol.upper(), timeframe), time.time())
+
+def on_stream_bar(symbol: str, timeframe: str, bar: dict, closed: bool) -> None:
+    """
+    Хук для WebSocket-стріму: закритий бар пишемо у сховище, формований тримаємо в пам'яті
+    і одразу дописуємо у закешовану серію (in place, без REST).
+    """
+    key = (symbol.upper(), timeframe)
+    hole = False
+    if closed:
+        try:
+            store = get_store()
+            prev = store.covered_last(key[0], timeframe) if cov.tracked(timeframe) else None
+            # бар не продовжує покриття → між ними дірка (пропущені події, простій стріму)
+            hole = prev is not None and int(bar["ts"]) > prev + INTERVAL_SEC[timeframe]
+            store.upsert(key[0], timeframe, [bar])
+        except Exception as e:
+            log.warning("[candles] stream upsert failed for %s %s: %s", key[0], timeframe, e)
     now = time.time()
     with _LOCK:
-        hit = _CACHE.get(key)
-        if hit and (now - hit["ts"] <= TTL_SEC) and hit["data"]:
-            return hit["data"]
-    data = fetch_ohlcv_raw(symbol, timeframe, limit)  # твоя оригінальна реалізація
+        _LIVE[key] = {"ts": now, "bar": bar}
+        if hole:
+            # закешоване вікно вже з діркою — наступне читання пройде через _sync_store і доп'є її
+            log.info("[candles] gap in %s %s before ts=%s", key[0], timeframe, bar["ts"])
+            _CACHE.pop(key, None)
+        else:
+            hit = _CACHE.get(key)
+            if hit and len(hit["series"]):
+                hit["series"].append_bar(bar)
+                hit["ts"] = now
+            # похідні TF з цієї бази — інкрементально, без перерахунку всього вікна
+            for dkey, base in _BASE_OF.items():
+                if base != key:
+                    continue
+                r, dhit = _RESAMPLERS.get(dkey), _CACHE.get(dkey)
+                if r is not None and dhit and dhit["series"] is r.series:
+                    r.update(bar)
+                    dhit["ts"] = now
+    for fn in _BAR_LISTENERS:
+        try:
+            fn(key[0], timeframe, bar, closed)
+        except Exception as e:
+            log.warning("[candles] bar listener %s failed: %s", getattr(fn, "__name__", fn), e)
+
+def drop_live(symbol: str, timeframe: str) -> None:
     with _LOCK:
-        _CACHE[key] = {"ts": now, "data": data or []}
-    return data or []
+        _LIVE.pop((symbol.upper(), timeframe), None)
+
+def _load_resampled(symbol: str, timeframe: str, base_tf: str, limit: int) -> CandleSeries:
+    key = (symbol.upper(), timeframe)
+    base = get_series(symbol, base_tf, rs.base_bars_needed(base_tf, timeframe, limit))
+    r = rs.Resampler.from_base(base, base_tf, timeframe, capacity=limit)
+    with _LOCK:
+        _BASE_OF[key] = (key[0], base_tf)
+        _RESAMPLERS[key] = r
+    return r.series
+
+def stream_timeframes(timeframes) -> List[str]:
+    """Які TF реально треба стрімити: похідні від бази (CANDLE_RESAMPLE_BASES) замінюються базою."""
+    out = []
+    for tf in timeframes:
+        tf = tf.strip()
+        base = rs.pick_base(tf, 200) if tf else None
+        out.append(base or tf)
+    return sorted({t for t in out if t})
+
+def _load(symbol: str, timeframe: str, limit: int) -> CandleSeries:
+    key = (symbol.upper(), timeframe)
+    base_tf = rs.pick_base(timeframe, limit)
+    if base_tf:
+        try:
+            return _load_resampled(symbol, timeframe, base_tf, limit)
+        except Exception as e:
+            log.warning("[candles] resample %s %s<-%s failed: %s", symbol, timeframe, base_tf, e)
+    if _is_live(key, time.time()):
+        # стрім тримає сховище актуальним → читаємо з диску + формований бар із пам'яті
+        try:
+            store = get_store()
+            holes = False
+            if cov.tracked(timeframe):
+                lo, hi = cov.window(timeframe, limit, time.time())
+                holes = bool(store.gaps(key[0], timeframe, lo, hi - INTERVAL_SEC[timeframe]))
+            # дірка у вікні (розрив стріму) — читаємо через _sync_store, який її доп'є
+            rows = [] if holes else store.load_rows(key[0], timeframe, limit)
+            if rows:
+                series = CandleSeries.from_rows(rows, capacity=limit)
+                series.append_bar(_LIVE[key]["bar"])
+                return series
+        except Exception as e:
+            log.warning("[candles] live load failed for %s %s: %s", symbol, timeframe, e)
+    try:
+        return CandleSeries.from_rows(_sync_store(symbol, timeframe, limit), capacity=limit)
+    except Exception as e:
+        # сховище недоступне — не валимо аналіз, йдемо напряму в Binance
+        log.warning("[candles] store sync failed for %s %s: %s", symbol, timeframe, e)
+        return CandleSeries.from_bars(fetch_ohlcv_raw(symbol, timeframe, limit), capacity=limit)
+
+def resync(symbol: str, timeframe: str, limit: int = 200) -> int:
+    """Примусове REST-дозавантаження серії (після розриву стріму) + скидання кешу вікон."""
+    rows = _sync_store(symbol, timeframe, limit)
+    with _LOCK:
+        _CACHE.pop((symbol.upper(), timeframe), None)
+    return len(rows)
+
+def _cached(key: tuple, limit: int, now: float) -> Optional[CandleSeries]:
+    hit = _CACHE.get(key)
+    if hit and len(hit["series"]) and hit["limit"] >= limit and (now - hit["ts"] <= TTL_SEC or _is_live(key, now)):
+        return hit["series"].tail(limit)
+    return None
+
+def get_series(symbol: str, timeframe: str, limit: int = 200) -> CandleSeries:
+    """
+    Колонкова OHLCV-серія (numpy view без копіювання) з кешу/сховища.
+    Single-flight: при одночасному промаху (autopost, /ai, Analyze ALL) у Binance йде один запит,
+    решта чекає той самий Future і отримує зріз його результату.
+    """
+    key = (symbol.upper(), timeframe)
+    limit = int(limit)
+    now = time.time()
+    with _LOCK:
+        series = _cached(key, limit, now)
+        if series is not None:
+            return series
+        flight = _INFLIGHT.get(key)
+        if flight and flight[0] >= limit:
+            fut, leader = flight[1], False
+        else:
+            fut, leader = Future(), True
+            _INFLIGHT[key] = (limit, fut)
+    if not leader:
+        res = fut.result()
+        with _LOCK:  # стрім дописує в цю ж серію під _LOCK — межі вікна читаємо узгоджено
+            return res.tail(limit)
+    try:
+        series = _load(symbol, timeframe, limit)
+        with _LOCK:
+            hit = _CACHE.get(key)
+            # не затираємо довше вікно, яке паралельно поклав інший лідер
+            if not hit or hit["limit"] <= limit or now - hit["ts"] > TTL_SEC:
+                _CACHE[key] = {"ts": now, "limit": limit, "series": series}
+            # як і кеш-хіт: зафіксоване вікно, а не сам об'єкт кешу, в який пише стрім/ресемплер
+            view = series.tail(limit)
+        fut.set_result(series)
+        return view
+    except BaseException as e:
+        fut.set_exception(e)
+        raise
+    finally:
+        with _LOCK:
+            if _INFLIGHT.get(key, (0, None))[1] is fut:
+                _INFLIGHT.pop(key, None)
+
+def get_ohlcv(symbol: str, timeframe: str, limit: int = 200) -> List[dict]:
+    """Legacy list[dict] поверх get_series (нові споживачі — get_series напряму)."""
+    return get_series(symbol, timeframe, limit).to_bars()
 
 def snapshot_ts() -> int:
     """Єдиний штамп «ран-даних» для всіх розрахунків поточного батчу."""
@@ -0,0 +1,175 @@
+# market_data/circuit.py
+from __future__ import annotations
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+log = logging.getLogger("binance_circuit")
+
+# Скільки поспіль збоїв (5xx / timeout / обрив) відкривають ланцюг ендпоінта
+CB_FAIL_THRESHOLD = int(os.getenv("BINANCE_CB_FAILS", "5") or 5)
+# Скільки ланцюг відкритий до пробного запиту (half-open)
+CB_RESET_SEC = float(os.getenv("BINANCE_CB_RESET_SEC", "30") or 30)
+# Скільки пам'ятаємо невдалий (endpoint, symbol) — повтор у межах скану одразу падає
+NEG_CACHE_TTL_SEC = float(os.getenv("BINANCE_NEG_TTL_SEC", "15") or 15)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpen(RuntimeError):
+    """Запит не відправлено: ланцюг ендпоінта відкритий або (endpoint, symbol) у негативному кеші."""
+
+
+class CircuitBreaker:
+    """
+    closed → (N збоїв поспіль) → open → (reset_sec) → half_open: пропускаємо ОДИН пробний запит;
+    успіх закриває ланцюг, збій — знову відкриває на reset_sec.
+    Поки ланцюг відкритий, виклики падають одразу (CircuitOpen) — без ретраїв і sleep.
+    """
+
+    def __init__(self, name: str, fail_threshold: int = CB_FAIL_THRESHOLD, reset_sec: float = CB_RESET_SEC) -> None:
+        self.name = name
+        self.fail_threshold = max(1, int(fail_threshold))
+        self.reset_sec = float(reset_sec)
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe = False   # пробний запит half_open уже в польоті
+        # метрики
+        self.trips = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.reset_sec:
+                    self.rejected += 1
+                    return False
+                self.state = HALF_OPEN
+                self._probe = False
+            if self._probe:
+                self.rejected += 1
+                return False
+            self._probe = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != CLOSED:
+                log.info("[circuit] %s closed", self.name)
+            self.state = CLOSED
+            self.failures = 0
+            self._probe = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.fail_threshold):
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self._probe = False
+                self.trips += 1
+                log.warning("[circuit] %s open for %.0fs after %d failure(s)", self.name, self.reset_sec, self.failures)
+
+    def release(self) -> None:
+        """Пробний запит так і не пішов (напр. RateLimited) — звільняємо слот half_open."""
+        with self._lock:
+            self._probe = False
+
+    def is_open(self) -> bool:
+        return self.state == OPEN
+
+    def retry_in(self) -> float:
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self.reset_sec - (time.monotonic() - self.opened_at))
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"state": self.state, "failures": self.failures, "trips": self.trips, "rejected": self.rejected}
+
+
+class NegativeCache:
+    """Короткочасна пам'ять про невдалі запити: key -> (expires_at, error)."""
+
+    def __init__(self, ttl_sec: float = NEG_CACHE_TTL_SEC, max_items: int = 4096) -> None:
+        self.ttl_sec = float(ttl_sec)
+        self.max_items = int(max_items)
+        self._lock = threading.Lock()
+        self._items: Dict[Hashable, Tuple[float, str]] = {}
+        self.hits = 0
+
+    def get(self, key: Hashable) -> Optional[str]:
+        if not self._items:
+            return None
+        with self._lock:
+            hit = self._items.get(key)
+            if hit is None:
+                return None
+            if hit[0] <= time.monotonic():
+                self._items.pop(key, None)
+                return None
+            self.hits += 1
+            return hit[1]
+
+    def put(self, key: Hashable, error: str, ttl_sec: Optional[float] = None) -> None:
+        ttl = self.ttl_sec if ttl_sec is None else float(ttl_sec)
+        if ttl <= 0:
+            return
+        with self._lock:
+            if len(self._items) >= self.max_items:
+                now = time.monotonic()
+                self._items = {k: v for k, v in self._items.items() if v[0] > now}
+                if len(self._items) >= self.max_items:
+                    self._items.pop(next(iter(self._items)))
+            self._items[key] = (time.monotonic() + ttl, error)
+
+    def discard(self, key: Hashable) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+_BREAKERS: Dict[str, CircuitBreaker] = {}
+_BREAKERS_LOCK = threading.Lock()
+_NEGATIVE: Optional[NegativeCache] = None
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    b = _BREAKERS.get(name)
+    if b is None:
+        with _BREAKERS_LOCK:
+            b = _BREAKERS.get(name)
+            if b is None:
+                b = _BREAKERS[name] = CircuitBreaker(name)
+    return b
+
+
+def get_negative_cache() -> NegativeCache:
+    global _NEGATIVE
+    if _NEGATIVE is None:
+        with _BREAKERS_LOCK:
+            if _NEGATIVE is None:
+                _NEGATIVE = NegativeCache()
+    return _NEGATIVE
+
+
+def circuits() -> Dict[str, Dict[str, Any]]:
+    """Стан усіх ланцюгів (для /ping і логів)."""
+    with _BREAKERS_LOCK:
+        items = list(_BREAKERS.items())
+    return {name: b.snapshot() for name, b in items}
+
+
+__all__ = [
+    "CB_FAIL_THRESHOLD", "CB_RESET_SEC", "NEG_CACHE_TTL_SEC", "CircuitBreaker", "CircuitOpen",
+    "NegativeCache", "circuits", "get_breaker", "get_negative_cache",
+]
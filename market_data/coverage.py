@@ -0,0 +1,136 @@
+# market_data/coverage.py
+from __future__ import annotations
+import bisect
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from market_data.binance import INTERVAL_SEC
+from market_data.resample import bucket_ts
+
+# 3d/1M у Binance вирівняні не по сітці епохи (1M — календарний) — покриття для них не ведемо
+UNTRACKED_TF = ("3d", "1M")
+
+Interval = Tuple[int, int]
+
+
+def tracked(timeframe: str) -> bool:
+    return timeframe in INTERVAL_SEC and timeframe not in UNTRACKED_TF
+
+
+def last_closed_open(timeframe: str, now: float) -> int:
+    """ts відкриття останнього ЗАКРИТОГО бару на момент now."""
+    return int(bucket_ts(int(now), timeframe)) - INTERVAL_SEC[timeframe]
+
+
+def window(timeframe: str, limit: int, now: float) -> Interval:
+    """[lo, hi] — відкриття останніх limit барів, включно з поточним (формованим)."""
+    step = INTERVAL_SEC[timeframe]
+    hi = int(bucket_ts(int(now), timeframe))
+    return hi - (int(limit) - 1) * step, hi
+
+
+def runs(ts: Iterable[int], step: int) -> List[Interval]:
+    """Відсортовані ts → безперервні відрізки [lo, hi] (розрив — крок != step)."""
+    arr = np.unique(np.asarray(list(ts) if not isinstance(ts, np.ndarray) else ts, dtype=np.int64))
+    if not arr.size:
+        return []
+    cut = np.flatnonzero(np.diff(arr) != step) + 1
+    starts = np.concatenate(([0], cut))
+    ends = np.concatenate((cut - 1, [arr.size - 1]))
+    return [(int(arr[s]), int(arr[e])) for s, e in zip(starts, ends)]
+
+
+def plan_requests(gaps: List[Interval], step: int, max_bars: int = 1000) -> List[Interval]:
+    """
+    Групує дірки у запити klines (startTime..endTime) не довші за max_bars барів:
+    кілька дрібних дірок поруч — один запит замість N.
+    """
+    out: List[Interval] = []
+    for lo, hi in gaps:
+        while lo <= hi:
+            if out and (lo - out[-1][0]) // step < max_bars:
+                # дотягуємо попередній запит: покритий проміжок між дірками біржа просто повторить
+                start = out[-1][0]
+                seg_hi = min(hi, start + (max_bars - 1) * step)
+                out[-1] = (start, seg_hi)
+            else:
+                seg_hi = min(hi, lo + (max_bars - 1) * step)
+                out.append((lo, seg_hi))
+            lo = seg_hi + step
+    return out
+
+
+class Coverage:
+    """
+    Індекс покриття однієї серії: відсортовані неперетинні відрізки [lo, hi] ts відкриття барів,
+    про які ми вже знаємо відповідь біржі (бари є у сховищі або біржа підтвердила, що їх нема).
+    Сусідні відрізки (hi + step == lo) зливаються, тож дірка = проміжок між відрізками.
+    add/gaps — bisect по lo, без сканування таблиці свічок.
+    """
+
+    __slots__ = ("step", "los", "his")
+
+    def __init__(self, step: int, intervals: Iterable[Interval] = ()) -> None:
+        self.step = int(step)
+        self.los: List[int] = []
+        self.his: List[int] = []
+        for lo, hi in sorted(intervals):
+            self.add(lo, hi)
+
+    def __len__(self) -> int:
+        return len(self.los)
+
+    def intervals(self) -> List[Interval]:
+        return list(zip(self.los, self.his))
+
+    def add(self, lo: int, hi: int) -> Tuple[Interval, bool]:
+        """
+        Додає [lo, hi] і повертає (злитий відрізок, hole): hole=True — новий відрізок
+        не торкається попереднього, тобто перед ним утворилась дірка.
+        """
+        lo, hi, step = int(lo), int(hi), self.step
+        if hi < lo:
+            raise ValueError(f"bad interval [{lo}, {hi}]")
+        i = bisect.bisect_left(self.his, lo - step)        # перший, що може торкатись зліва
+        j = bisect.bisect_right(self.los, hi + step)        # за останнім, що торкається справа
+        merged = j > i
+        if merged:
+            lo = min(lo, self.los[i])
+            hi = max(hi, self.his[j - 1])
+        self.los[i:j] = [lo]
+        self.his[i:j] = [hi]
+        return (lo, hi), (not merged and i > 0)
+
+    def covers(self, ts: int) -> bool:
+        i = bisect.bisect_right(self.los, int(ts)) - 1
+        return i >= 0 and self.his[i] >= ts
+
+    def last(self) -> Optional[int]:
+        return self.his[-1] if self.his else None
+
+    def gaps(self, lo: int, hi: int) -> List[Interval]:
+        """Непокриті відрізки в межах [lo, hi]."""
+        lo, hi, step = int(lo), int(hi), self.step
+        out: List[Interval] = []
+        if hi < lo:
+            return out
+        i = max(0, bisect.bisect_right(self.los, lo) - 1)
+        cur = lo
+        for k in range(i, len(self.los)):
+            a, b = self.los[k], self.his[k]
+            if a > hi:
+                break
+            if b < cur:
+                continue
+            if a > cur:
+                out.append((cur, a - step))
+            cur = b + step
+            if cur > hi:
+                return out
+        if cur <= hi:
+            out.append((cur, hi))
+        return out
+
+
+__all__ = ["Coverage", "UNTRACKED_TF", "last_closed_open", "plan_requests", "runs", "tracked", "window"]
@@ -0,0 +1,291 @@
+# market_data/local_book.py
+from __future__ import annotations
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import websockets  # optional: без нього — лише REST-снапшоти
+except Exception:  # pragma: no cover
+    websockets = None  # type: ignore[assignment]
+
+from core_config import CFG
+from market_data.book_kernel import BookKernel
+from market_data.binance_client import get_client
+from market_data.stream import WS_BASE_URL
+
+log = logging.getLogger("local_book")
+
+_READY_WAIT_SEC = 3.0     # скільки чекаємо першої синхронізації стріму, далі — REST-снапшот
+_BACKOFF_CAP = 60.0
+
+
+class BookGap(Exception):
+    """Розрив послідовності diff-оновлень — книгу треба перезібрати зі снапшоту."""
+
+
+class LocalOrderBook:
+    """
+    Локальна копія стакану: price -> qty по кожній стороні + lastUpdateId.
+    Снапшот /api/v3/depth + diff-події <sym>@depth (U..u) за правилами Binance:
+    події з u <= lastUpdateId відкидаємо, перша має покривати lastUpdateId+1,
+    далі кожна починається рівно з попереднього u+1 — інакше BookGap.
+    """
+
+    def __init__(self, symbol: str) -> None:
+        self.symbol = symbol.upper()
+        self.bids: Dict[float, float] = {}
+        self.asks: Dict[float, float] = {}
+        self.last_update_id = 0
+        self.synced = False
+        self.updated_ts = 0.0
+        self.last_access = time.time()
+        self.source = "none"  # "stream" | "rest"
+        self._first_diff = True
+        self._version = 0
+        self._kernel: Optional[Tuple[int, BookKernel]] = None
+
+    # ── запис ────────────────────────────────────────────────────────────────
+    def apply_snapshot(self, snap: Dict[str, Any], source: str = "rest") -> None:
+        self.bids = {float(p): float(q) for p, q in snap.get("bids", []) if float(q) > 0}
+        self.asks = {float(p): float(q) for p, q in snap.get("asks", []) if float(q) > 0}
+        self.last_update_id = int(snap.get("lastUpdateId") or 0)
+        self._first_diff = True
+        self.synced = True
+        self.source = source
+        self.updated_ts = time.time()
+        self._version += 1
+
+    @staticmethod
+    def _apply_side(side: Dict[float, float], levels: List[List[str]]) -> None:
+        for p, q in levels:
+            price, qty = float(p), float(q)
+            if qty == 0.0:
+                side.pop(price, None)
+            else:
+                side[price] = qty
+
+    def apply_diff(self, ev: Dict[str, Any]) -> None:
+        first, last = int(ev["U"]), int(ev["u"])
+        if last <= self.last_update_id:
+            return  # вже врахована снапшотом
+        if self._first_diff:
+            if first > self.last_update_id + 1:
+                raise BookGap(f"{self.symbol}: first diff U={first} > lastUpdateId+1={self.last_update_id + 1}")
+        elif first != self.last_update_id + 1:
+            raise BookGap(f"{self.symbol}: diff U={first}, expected {self.last_update_id + 1}")
+        self._apply_side(self.bids, ev.get("b", []))
+        self._apply_side(self.asks, ev.get("a", []))
+        self.last_update_id = last
+        self._first_diff = False
+        self.updated_ts = time.time()
+        self._version += 1
+
+    def reset(self) -> None:
+        self.synced = False
+        self._first_diff = True
+
+    # ── читання ──────────────────────────────────────────────────────────────
+    def levels(self, side: str, n: Optional[int] = None) -> List[Tuple[float, float]]:
+        """[(price, qty)] від найкращої ціни: bids — спадання, asks — зростання."""
+        return self.kernel().levels(side, n)
+
+    def kernel(self) -> BookKernel:
+        """Numpy-зліпок для аналітики (перебудовується лише якщо книга змінилась)."""
+        cached = self._kernel
+        if cached is None or cached[0] != self._version:
+            cached = self._kernel = (self._version, BookKernel.from_maps(self.bids, self.asks))
+        return cached[1]
+
+    def best(self) -> Tuple[Optional[float], Optional[float]]:
+        k = self.kernel()
+        return k.best_bid(), k.best_ask()
+
+    def to_depth(self, limit: Optional[int] = None) -> Dict[str, Any]:
+        """Формат відповіді /api/v3/depth — для існуючих споживачів (_best_walls, stats)."""
+        return {
+            "lastUpdateId": self.last_update_id,
+            "bids": [[p, q] for p, q in self.levels("bids", limit)],
+            "asks": [[p, q] for p, q in self.levels("asks", limit)],
+        }
+
+
+class BookManager:
+    """
+    Книги по символах, які зараз цікавлять бота (autopost-кандидати).
+    З websockets: на символ — diff-стрім + один снапшот на (пере)синхронізацію;
+    книги без звернень довше orderbook_idle_sec закриваються, максимум orderbook_max_books (LRU).
+    Без стріму: REST-снапшот на orderbook_ttl_sec, один на символ для всіх метрик (single-flight).
+    """
+
+    def __init__(self) -> None:
+        self.books: "OrderedDict[str, LocalOrderBook]" = OrderedDict()
+        self._ready: Dict[str, asyncio.Event] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @staticmethod
+    def depth_limit() -> int:
+        return int(CFG.get("orderbook_depth_limit", 1000))
+
+    @staticmethod
+    def stream_enabled() -> bool:
+        return websockets is not None and bool(CFG.get("orderbook_stream", False))
+
+    def _bind_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # задачі/події попереднього loop-а мертві (напр. asyncio.run у скриптах)
+            self._tasks.clear()
+            self._ready.clear()
+            self._inflight.clear()
+            self._loop = loop
+
+    # ── REST-снапшот ─────────────────────────────────────────────────────────
+    async def _snapshot(self, sym: str) -> Dict[str, Any]:
+        return await get_client().adepth(sym, limit=self.depth_limit())
+
+    async def _rest_book(self, sym: str) -> Optional[LocalOrderBook]:
+        book = self.books.get(sym)
+        ttl = float(CFG.get("orderbook_ttl_sec", 20))
+        if book is not None and book.synced and time.time() - book.updated_ts <= ttl:
+            self.books.move_to_end(sym)
+            return book
+        fut = self._inflight.get(sym)
+        if fut is not None and not fut.done():
+            return await asyncio.shield(fut)
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[sym] = fut
+        result: Optional[LocalOrderBook] = None
+        try:
+            snap = await self._snapshot(sym)
+            result = self.books.get(sym) or LocalOrderBook(sym)
+            # стрім міг синхронізуватись, поки ми чекали — його книга свіжіша
+            if not (result.synced and result.source == "stream"):
+                result.apply_snapshot(snap, source="rest")
+                self.books[sym] = result
+                self.books.move_to_end(sym)
+                self._evict()  # REST-книги теж у межах orderbook_max_books
+            return result
+        except Exception as e:
+            log.warning("[book] snapshot %s failed: %s", sym, e)
+            return None
+        finally:
+            if not fut.done():
+                fut.set_result(result)
+            if self._inflight.get(sym) is fut:
+                self._inflight.pop(sym, None)
+
+    # ── стрім ────────────────────────────────────────────────────────────────
+    def _evict(self) -> None:
+        max_books = int(CFG.get("orderbook_max_books", 20))
+        while len(self.books) > max_books:
+            sym, _ = self.books.popitem(last=False)
+            task = self._tasks.pop(sym, None)
+            if task is not None:
+                task.cancel()
+            self._ready.pop(sym, None)
+
+    async def _run(self, sym: str) -> None:
+        url = f"{WS_BASE_URL}/ws/{sym.lower()}@depth@100ms"
+        idle = float(CFG.get("orderbook_idle_sec", 600))
+        backoff = 1.0
+        book = self.books[sym]
+        ready = self._ready[sym]
+        try:
+            while self.books.get(sym) is book and time.time() - book.last_access <= idle:
+                try:
+                    async with websockets.connect(url, ping_interval=20, ping_timeout=20, max_size=2 ** 22) as ws:
+                        book.reset()
+                        ready.clear()
+                        # буферизуємо diff-и, поки летить снапшот
+                        snap_task = asyncio.create_task(self._snapshot(sym))
+                        buffered: List[Dict[str, Any]] = []
+                        while not snap_task.done():
+                            try:
+                                buffered.append(json.loads(await asyncio.wait_for(ws.recv(), timeout=0.5)))
+                            except asyncio.TimeoutError:
+                                pass
+                        book.apply_snapshot(snap_task.result(), source="stream")
+                        for ev in buffered:
+                            book.apply_diff(ev)
+                        ready.set()
+                        backoff = 1.0
+                        async for raw in ws:
+                            book.apply_diff(json.loads(raw))
+                            if time.time() - book.last_access > idle:
+                                break
+                except asyncio.CancelledError:
+                    raise
+                except BookGap as e:
+                    # той самий бекоф: символ, що постійно рветься, не має палити вагу снапшотами (50)
+                    log.info("[book] resync %s: %s; retry in %.0fs", sym, e, backoff)
+                    book.reset()
+                    await asyncio.sleep(backoff)
+                    backoff = min(_BACKOFF_CAP, backoff * 2)
+                except Exception as e:
+                    log.warning("[book] %s stream failed: %s; retry in %.0fs", sym, e, backoff)
+                    book.reset()
+                    await asyncio.sleep(backoff)
+                    backoff = min(_BACKOFF_CAP, backoff * 2)
+        finally:
+            book.reset()
+            ready.clear()
+            if self._tasks.get(sym) is asyncio.current_task():
+                self._tasks.pop(sym, None)
+
+    # ── API ──────────────────────────────────────────────────────────────────
+    async def get_book(self, symbol: str) -> Optional[LocalOrderBook]:
+        """Актуальна книга символу (стрім → REST-фолбек); None — якщо стакан недоступний."""
+        self._bind_loop()
+        sym = symbol.upper().replace(":USDT", "USDT")
+        if not self.stream_enabled():
+            book = await self._rest_book(sym)
+            if book is not None:
+                book.last_access = time.time()
+            return book
+        book = self.books.get(sym)
+        if book is None:
+            book = self.books[sym] = LocalOrderBook(sym)
+        self.books.move_to_end(sym)
+        book.last_access = time.time()
+        if sym not in self._tasks:
+            self._ready[sym] = asyncio.Event()
+            self._tasks[sym] = asyncio.get_running_loop().create_task(self._run(sym), name=f"book:{sym}")
+            self._evict()
+        ready = self._ready.get(sym)
+        if book.synced and book.source == "stream":
+            return book
+        if ready is not None:
+            try:
+                await asyncio.wait_for(ready.wait(), timeout=_READY_WAIT_SEC)
+                return book
+            except asyncio.TimeoutError:
+                pass
+        return await self._rest_book(sym)
+
+    def stop(self) -> None:
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+
+
+_MANAGER: Optional[BookManager] = None
+
+
+def get_manager() -> BookManager:
+    global _MANAGER
+    if _MANAGER is None:
+        _MANAGER = BookManager()
+    return _MANAGER
+
+
+async def get_book(symbol: str) -> Optional[LocalOrderBook]:
+    return await get_manager().get_book(symbol)
+
+
+__all__ = ["BookGap", "BookManager", "LocalOrderBook", "get_book", "get_manager"]
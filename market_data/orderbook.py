@@ -1,32 +1,24 @@
 # market_data/orderbook.py
 from __future__ import annotations
-import requests, time
-from typing import Dict
+from typing import Dict, Optional
 
-BINANCE_BASE = "https://api.binance.com"
+from market_data.binance_client import BASE_URL as BINANCE_BASE, get_client  # noqa: F401
 
 def _get(path: str, params: dict | None = None, retries: int = 2, timeout: int = 10):
-    url = f"{BINANCE_BASE}{path}"
-    last = None
-    for i in range(retries + 1):
-        try:
-            r = requests.get(url, params=params, timeout=timeout)
-            if r.status_code == 429:
-                time.sleep(0.5 + 0.5*i)
-                continue
-            r.raise_for_status()
-            return r.json()
-        except Exception as e:
-            last = e
-            time.sleep(0.3 + 0.3*i)
-    raise RuntimeError(f"orderbook fetch failed: {last}")
+    try:
+        # ретраї на 429/5xx — всередині спільного клієнта (пул з'єднань)
+        return get_client().get_json(path, params, retries=retries + 1, timeout=timeout)
+    except Exception as e:
+        raise RuntimeError(f"orderbook fetch failed: {e}")
 
-def get_orderbook_stats(symbol: str, limit: int = 50) -> Dict[str, float]:
+def _norm(symbol: str) -> str:
     symbol = (symbol or "").upper().strip()
     if symbol.endswith(":USDT"):
         symbol = symbol.replace(":USDT", "USDT")
-    ob = _get("/api/v3/depth", {"symbol": symbol, "limit": min(max(int(limit), 5), 1000)})
+    return symbol
 
+def stats_from_depth(ob: Dict, limit: int = 50) -> Dict[str, float]:
+    """Mid/spread/imbalance/«стінки» з depth-відповіді або LocalOrderBook.to_depth()."""
     def _best(lst, side: str):
         if not lst: return (float("nan"), float("nan"))
         # [price, qty] як строки
@@ -58,3 +50,23 @@ def get_orderbook_stats(symbol: str, limit: int = 50) -> Dict[str, float]:
         "nearest_bid_wall": nb,
         "nearest_ask_wall": na,
     }
+
+def get_orderbook_stats(symbol: str, limit: int = 50) -> Dict[str, float]:
+    ob = _get("/api/v3/depth", {"symbol": _norm(symbol), "limit": min(max(int(limit), 5), 1000)})
+    return stats_from_depth(ob, limit)
+
+async def aget_orderbook(symbol: str, limit: int = 1000) -> Optional[Dict]:
+    """Стакан з локальної книги (market_data.local_book) у форматі depth: {"bids":[[p,q],...],"asks":...}."""
+    from market_data.local_book import get_book
+    book = await get_book(_norm(symbol))
+    return book.to_depth(limit) if book is not None else None
+
+async def aget_book_kernel(symbol: str):
+    """Numpy-зліпок локальної книги (market_data.book_kernel.BookKernel) або None."""
+    from market_data.local_book import get_book
+    book = await get_book(_norm(symbol))
+    return book.kernel() if book is not None else None
+
+async def aget_orderbook_stats(symbol: str, limit: int = 50) -> Dict[str, float]:
+    ob = await aget_orderbook(symbol, limit)
+    return stats_from_depth(ob or {}, limit)
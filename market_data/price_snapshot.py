@@ -0,0 +1,127 @@
+# market_data/price_snapshot.py
+from __future__ import annotations
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+from market_data.binance_client import get_client
+
+log = logging.getLogger("price_snapshot")
+
+# Скільки тримаємо знімок усіх цін (менше за інтервал position_manager/signal_closer)
+PRICE_SNAPSHOT_TTL_SEC = float(os.getenv("PRICE_SNAPSHOT_TTL_SEC", "5") or 5)
+# Якщо оновлення падає — застарілий знімок віддаємо не довше за це (далі None: SL/TP по старій ціні гірші)
+PRICE_SNAPSHOT_MAX_STALE_SEC = float(os.getenv("PRICE_SNAPSHOT_MAX_STALE_SEC", "60") or 60)
+
+# Історичні місця, де міг жити зовнішній get_price(symbol) — перевіряємо ОДИН раз
+_LEGACY_PROVIDERS = (
+    "services.market",
+    "services.price_provider",
+    "services.binance_price",
+    "services.binance",
+    "services.prices",
+)
+
+
+def _norm(symbol: str) -> str:
+    return (symbol or "").upper().replace(":USDT", "USDT").replace("/", "")
+
+
+class PriceSnapshot:
+    """
+    Ціни всіх пар одним запитом /api/v3/ticker/price (вага 4 замість 2×N) з TTL.
+    Оновлення — single-flight: поки один потік качає знімок, інші чекають на lock і беруть готовий.
+    """
+
+    def __init__(self, ttl_sec: float = PRICE_SNAPSHOT_TTL_SEC,
+                 max_stale_sec: float = PRICE_SNAPSHOT_MAX_STALE_SEC) -> None:
+        self.ttl_sec = float(ttl_sec)
+        self.max_stale_sec = float(max_stale_sec)
+        self._lock = threading.Lock()
+        self._prices: Dict[str, float] = {}
+        self._ts = 0.0
+
+    def _fresh(self) -> bool:
+        return bool(self._prices) and (time.time() - self._ts) <= self.ttl_sec
+
+    def refresh(self, force: bool = False) -> Dict[str, float]:
+        if not force and self._fresh():
+            return self._prices
+        with self._lock:
+            if not force and self._fresh():
+                return self._prices
+            rows = get_client().ticker_price()
+            prices: Dict[str, float] = {}
+            for r in rows or []:
+                try:
+                    prices[str(r["symbol"]).upper()] = float(r["price"])
+                except Exception:
+                    continue
+            self._prices, self._ts = prices, time.time()
+            return prices
+
+    def get(self, symbol: str) -> Optional[float]:
+        sym = _norm(symbol)
+        try:
+            return self.refresh().get(sym)
+        except Exception as e:
+            log.warning("[prices] snapshot refresh failed: %s", e)
+            if time.time() - self._ts > self.max_stale_sec:
+                return None  # знімок надто старий — краще «ціни немає», ніж вигадана
+            return self._prices.get(sym)  # трохи застарілий знімок краще, ніж нічого
+
+    def get_many(self, symbols: Iterable[str]) -> Dict[str, Optional[float]]:
+        return {s: self.get(s) for s in symbols}
+
+
+_SNAPSHOT: Optional[PriceSnapshot] = None
+_PROVIDER: Optional[Callable[[str], Optional[float]]] = None
+_INIT_LOCK = threading.RLock()
+
+
+def get_snapshot() -> PriceSnapshot:
+    global _SNAPSHOT
+    if _SNAPSHOT is None:
+        with _INIT_LOCK:
+            if _SNAPSHOT is None:
+                _SNAPSHOT = PriceSnapshot()
+    return _SNAPSHOT
+
+
+def _resolve_provider() -> Callable[[str], Optional[float]]:
+    for path in _LEGACY_PROVIDERS:
+        try:
+            mod = __import__(path, fromlist=["get_price"])
+        except Exception:
+            continue
+        fn = getattr(mod, "get_price", None)
+        if callable(fn):
+            log.info("[prices] using legacy provider %s.get_price", path)
+            return lambda s, _fn=fn: float(_fn(s))
+    return get_snapshot().get
+
+
+def get_price(symbol: str) -> Optional[float]:
+    """Поточна ціна: WebSocket-стрім → провайдер (визначається один раз на процес)."""
+    global _PROVIDER
+    try:
+        from market_data.stream import get_last_price
+        px = get_last_price(_norm(symbol))
+        if px is not None:
+            return px
+    except Exception:
+        pass
+    if _PROVIDER is None:
+        with _INIT_LOCK:
+            if _PROVIDER is None:
+                _PROVIDER = _resolve_provider()
+    try:
+        return _PROVIDER(symbol)
+    except Exception as e:
+        log.debug("[prices] get_price %s failed: %s", symbol, e)
+        return None
+
+
+__all__ = ["PRICE_SNAPSHOT_MAX_STALE_SEC", "PRICE_SNAPSHOT_TTL_SEC", "PriceSnapshot", "get_price", "get_snapshot"]
@@ -0,0 +1,155 @@
+# market_data/rate_limiter.py
+from __future__ import annotations
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Mapping, Optional
+
+log = logging.getLogger("binance_limiter")
+
+# Spot REQUEST_WEIGHT: 6000/хв на IP. Лишаємо запас під інші процеси/ручні запити.
+_LIMIT_1M = int(os.getenv("BINANCE_WEIGHT_LIMIT", "6000") or 6000)
+_SAFETY = float(os.getenv("BINANCE_WEIGHT_SAFETY", "0.8") or 0.8)
+# Burst: скільки ваги можна витратити "разом" (решта — рівномірно протягом хвилини)
+_BURST = int(os.getenv("BINANCE_WEIGHT_BURST", "0") or 0)
+
+_HDR_USED = "x-mbx-used-weight-1m"
+
+
+def _depth_weight(limit: int) -> int:
+    if limit <= 100:
+        return 5
+    if limit <= 500:
+        return 25
+    if limit <= 1000:
+        return 50
+    return 250
+
+
+def request_weight(path: str, params: Optional[Mapping[str, Any]] = None) -> int:
+    """Вага запиту за документацією Binance spot (для невідомих шляхів — 2)."""
+    p = params or {}
+    if path.endswith("/klines"):
+        return 2
+    if path.endswith("/depth"):
+        return _depth_weight(int(p.get("limit") or 100))
+    if path.endswith("/ticker/24hr"):
+        return 2 if p.get("symbol") else 80
+    if path.endswith("/ticker/price"):
+        return 2 if p.get("symbol") else 4
+    if path.endswith("/exchangeInfo"):
+        return 20
+    return 2
+
+
+class WeightLimiter:
+    """
+    Token bucket по вазі запитів. Токени поповнюються рівномірно (budget/60 за секунду).
+    reserve() списує вагу одразу (можна піти в «борг») і повертає, скільки чекати —
+    так черга справедлива і для потоків, і для корутин, а очікування — поза lock-ом.
+    Серверний X-MBX-USED-WEIGHT-1M підрізає локальний бюджет, якщо інші клієнти з того ж IP
+    теж витрачають вагу; 429/418 + Retry-After блокують усі запити до вказаного часу.
+    """
+
+    def __init__(self, limit_1m: int = _LIMIT_1M, safety: float = _SAFETY, burst: int = _BURST) -> None:
+        self.budget = max(1, int(limit_1m * safety))
+        self.capacity = float(burst or self.budget)
+        self.rate = self.budget / 60.0
+        self._lock = threading.Lock()
+        self._tokens = self.capacity
+        self._ts = time.monotonic()
+        self._blocked_until = 0.0
+        # метрики
+        self.server_used = 0
+        self.server_used_ts = 0.0
+        self.requests = 0
+        self.waits = 0
+        self.wait_sec_total = 0.0
+        self.bans = 0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._ts) * self.rate)
+        self._ts = now
+
+    def reserve(self, weight: int, max_wait: Optional[float] = None) -> float:
+        """
+        Списати weight; повертає паузу (сек) перед відправкою запиту.
+        Якщо пауза > max_wait — нічого не списуємо (виклик має відмовитись від запиту).
+        """
+        w = max(1, int(weight))
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= w
+            wait = 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+            wait = max(wait, self._blocked_until - now)
+            if max_wait is not None and wait > max_wait:
+                self._tokens += w
+                return wait
+            self.requests += 1
+            if wait > 0:
+                self.waits += 1
+                self.wait_sec_total += wait
+        return wait
+
+    def observe(self, headers: Mapping[str, str], status: int = 200) -> None:
+        """Синхронізація з сервером за заголовками відповіді."""
+        used = headers.get(_HDR_USED) or headers.get(_HDR_USED.upper())
+        with self._lock:
+            now = time.monotonic()
+            if used is not None:
+                try:
+                    u = int(used)
+                except ValueError:
+                    u = None
+                if u is not None:
+                    self.server_used, self.server_used_ts = u, time.time()
+                    self._refill(now)
+                    # локальний бюджет не може бути більшим за те, що реально лишилось на IP
+                    self._tokens = min(self._tokens, float(self.budget - u))
+            if status in (429, 418):
+                try:
+                    retry_after = float(headers.get("retry-after") or 0)
+                except ValueError:
+                    retry_after = 0.0
+                # 418 = IP вже забанено; без Retry-After чекаємо до кінця хвилинного вікна
+                pause = retry_after or 60.0
+                self._blocked_until = max(self._blocked_until, now + pause)
+                self._tokens = min(self._tokens, 0.0)
+                self.bans += 1
+                log.warning("[limiter] Binance %s: pausing all requests for %.0fs", status, pause)
+
+    def usage(self) -> Dict[str, Any]:
+        """Поточне використання бюджету (для /ping і логів)."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            fresh = (time.time() - self.server_used_ts) < 60
+            return {
+                "budget_1m": self.budget,
+                "tokens": round(self._tokens, 1),
+                "server_used_1m": self.server_used if fresh else None,
+                "utilization": round(1.0 - max(self._tokens, 0.0) / self.capacity, 3),
+                "blocked_for_sec": round(max(0.0, self._blocked_until - now), 1),
+                "requests": self.requests,
+                "throttled": self.waits,
+                "throttled_sec": round(self.wait_sec_total, 1),
+                "bans": self.bans,
+            }
+
+
+_LIMITER: Optional[WeightLimiter] = None
+_LIMITER_LOCK = threading.Lock()
+
+
+def get_limiter() -> WeightLimiter:
+    global _LIMITER
+    if _LIMITER is None:
+        with _LIMITER_LOCK:
+            if _LIMITER is None:
+                _LIMITER = WeightLimiter()
+    return _LIMITER
+
+
+__all__ = ["WeightLimiter", "get_limiter", "request_weight"]
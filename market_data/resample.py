@@ -0,0 +1,161 @@
+# market_data/resample.py
+from __future__ import annotations
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from market_data.binance import INTERVAL_SEC
+from market_data.series import CandleSeries
+
+# Базові TF, з яких будуємо старші (порожньо — ресемплінг вимкнено, кожен TF качається з Binance).
+# Напр. "1m,1h": 5m/15m/30m — з 1m, 4h/1d — з 1h.
+RESAMPLE_BASES: List[str] = [
+    tf.strip() for tf in os.getenv("CANDLE_RESAMPLE_BASES", "").split(",") if tf.strip() in INTERVAL_SEC
+]
+# Стеля барів бази на одне вікно (більше — дешевше взяти TF з Binance напряму)
+RESAMPLE_MAX_BASE_BARS = int(os.getenv("CANDLE_RESAMPLE_MAX_BASE", "5000") or 5000)
+
+_DAY = 86400
+_WEEK_OFFSET = 4 * _DAY  # тижневі свічки Binance відкриваються в понеділок 00:00 UTC (1970-01-05)
+
+
+def _offset(timeframe: str) -> int:
+    return _WEEK_OFFSET if timeframe == "1w" else 0
+
+
+def bucket_ts(ts, timeframe: str):
+    """Час відкриття бару timeframe, якому належить ts (працює і для int, і для np.ndarray)."""
+    t, off = INTERVAL_SEC[timeframe], _offset(timeframe)
+    return (ts - off) // t * t + off
+
+
+def can_resample(base_tf: str, target_tf: str) -> bool:
+    # 3d/1M у Binance вирівняні інакше (1M — календарний) — їх завжди беремо з біржі
+    if base_tf not in INTERVAL_SEC or target_tf not in INTERVAL_SEC or target_tf in ("3d", "1M"):
+        return False
+    b, t = INTERVAL_SEC[base_tf], INTERVAL_SEC[target_tf]
+    return t > b and t % b == 0
+
+
+def pick_base(target_tf: str, limit: int) -> Optional[str]:
+    """Найстарший налаштований базовий TF, з якого можна зібрати limit барів target_tf."""
+    best: Optional[str] = None
+    for base in RESAMPLE_BASES:
+        if not can_resample(base, target_tf):
+            continue
+        need = (int(limit) + 1) * (INTERVAL_SEC[target_tf] // INTERVAL_SEC[base])
+        if need > RESAMPLE_MAX_BASE_BARS:
+            continue
+        if best is None or INTERVAL_SEC[base] > INTERVAL_SEC[best]:
+            best = base
+    return best
+
+
+def base_bars_needed(base_tf: str, target_tf: str, limit: int) -> int:
+    # +1 бакет — на випадок неповного першого (його відкидаємо)
+    return (int(limit) + 1) * (INTERVAL_SEC[target_tf] // INTERVAL_SEC[base_tf])
+
+
+class Resampler:
+    """
+    Інкрементальна агрегація base_tf → target_tf.
+    Стан поточного бакета = закриті базові бари (open/high/low/volume) + останній базовий бар,
+    який ще може оновлюватись (формований бар зі стріму приходить багато разів з тим самим ts).
+    Цільова серія оновлюється in place: той самий ts — заміна формованого бару, новий — append.
+    """
+
+    def __init__(self, base_tf: str, target_tf: str, capacity: int = 1000) -> None:
+        if not can_resample(base_tf, target_tf):
+            raise ValueError(f"Cannot resample {base_tf} -> {target_tf}")
+        self.base_tf = base_tf
+        self.target_tf = target_tf
+        self.series = CandleSeries(capacity)
+        self._bucket: Optional[int] = None
+        self._agg: Optional[Dict[str, float]] = None   # закрита частина бакета
+        self._cur: Optional[Dict[str, float]] = None   # останній (можливо формований) базовий бар
+
+    @classmethod
+    def from_base(cls, base: CandleSeries, base_tf: str, target_tf: str, capacity: int = 1000) -> "Resampler":
+        """Векторна початкова збірка з готової базової серії + стан для подальших update()."""
+        r = cls(base_tf, target_tf, capacity)
+        n = len(base)
+        if not n:
+            return r
+        cols = base.arrays()
+        b = bucket_ts(cols["ts"], target_tf)
+        starts = np.flatnonzero(np.r_[True, b[1:] != b[:-1]])
+        # перший бакет без свого початку (обрізана історія) — неповний, відкидаємо
+        if len(starts) > 1 and cols["ts"][0] != b[0]:
+            starts = starts[1:]
+        lo = int(starts[0])
+        rel = starts - lo
+        ends = np.r_[starts[1:], n] - 1
+        out_ts = b[starts]
+        out = {
+            "open": cols["open"][starts],
+            "high": np.maximum.reduceat(cols["high"][lo:], rel),
+            "low": np.minimum.reduceat(cols["low"][lo:], rel),
+            "close": cols["close"][ends],
+            "volume": np.add.reduceat(cols["volume"][lo:], rel),
+        }
+        k = max(0, len(starts) - r.series.capacity)
+        for i in range(k, len(starts)):
+            r.series.append(int(out_ts[i]), float(out["open"][i]), float(out["high"][i]),
+                            float(out["low"][i]), float(out["close"][i]), float(out["volume"][i]))
+        # стан останнього бакета: усі базові бари крім останнього — «закриті»
+        s_last = int(starts[-1])
+        r._bucket = int(out_ts[-1])
+        r._cur = {f: (int(cols[f][-1]) if f == "ts" else float(cols[f][-1])) for f in cols}
+        if s_last < n - 1:
+            seg = slice(s_last, n - 1)
+            r._agg = {
+                "open": float(cols["open"][s_last]),
+                "high": float(cols["high"][seg].max()),
+                "low": float(cols["low"][seg].min()),
+                "volume": float(cols["volume"][seg].sum()),
+            }
+        return r
+
+    def _fold(self, bar: Dict[str, float]) -> None:
+        if self._agg is None:
+            self._agg = {"open": bar["open"], "high": bar["high"], "low": bar["low"], "volume": bar["volume"]}
+        else:
+            a = self._agg
+            a["high"] = max(a["high"], bar["high"])
+            a["low"] = min(a["low"], bar["low"])
+            a["volume"] += bar["volume"]
+
+    def update(self, bar: Dict[str, float]) -> Optional[Dict[str, float]]:
+        """Новий/оновлений базовий бар → актуальний (можливо неповний) цільовий бар."""
+        ts = int(bar["ts"])
+        if self._cur is not None and ts < int(self._cur["ts"]):
+            return None  # запізнілий бар
+        b = int(bucket_ts(ts, self.target_tf))
+        if self._cur is not None and ts != int(self._cur["ts"]):
+            if b == self._bucket:
+                self._fold(self._cur)   # попередній базовий бар закрився всередині бакета
+            else:
+                self._agg = None        # почався новий цільовий бар
+        self._bucket, self._cur = b, dict(bar)
+        a = self._agg
+        out = {
+            "ts": b,
+            "open": a["open"] if a else bar["open"],
+            "high": max(a["high"], bar["high"]) if a else bar["high"],
+            "low": min(a["low"], bar["low"]) if a else bar["low"],
+            "close": bar["close"],
+            "volume": (a["volume"] if a else 0.0) + bar["volume"],
+        }
+        self.series.append_bar(out)
+        return out
+
+
+def resample(base: CandleSeries, base_tf: str, target_tf: str, limit: Optional[int] = None) -> CandleSeries:
+    """Одноразовий ресемплінг серії (останній бар може бути неповним — як і формований бар Binance)."""
+    return Resampler.from_base(base, base_tf, target_tf, capacity=limit or max(len(base), 1)).series
+
+
+__all__ = [
+    "RESAMPLE_BASES", "Resampler", "base_bars_needed", "bucket_ts", "can_resample", "pick_base", "resample",
+]
@@ -0,0 +1,151 @@
+# market_data/series.py
+from __future__ import annotations
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+FIELDS = ("ts", "open", "high", "low", "close", "volume")
+_PRICE_FIELDS = FIELDS[1:]
+
+
+class CandleSeries:
+    """
+    Колонкове OHLCV-вікно по (symbol, tf): ts — int64, решта — float64.
+    Буфер має 2×capacity місця: нові бари дописуються в кінець, а коли місце скінчилось —
+    останні capacity барів копіюються в НОВИЙ буфер (амортизовано O(1) на бар).
+    Тому будь-яке вікно завжди суцільне → view без копіювання, а раніше видані view
+    лишаються валідними (старий буфер не перезаписується; in-place змінюється лише
+    формований останній бар з тим самим ts).
+    """
+
+    __slots__ = ("capacity", "_buf", "_start", "_end")
+
+    def __init__(self, capacity: int = 1000) -> None:
+        self.capacity = max(1, int(capacity))
+        self._buf = self._alloc(2 * self.capacity)
+        self._start = 0
+        self._end = 0
+
+    @staticmethod
+    def _alloc(n: int) -> Dict[str, np.ndarray]:
+        buf = {"ts": np.empty(n, dtype=np.int64)}
+        for f in _PRICE_FIELDS:
+            buf[f] = np.empty(n, dtype=np.float64)
+        return buf
+
+    # ── побудова ─────────────────────────────────────────────────────────────
+    @classmethod
+    def from_rows(cls, rows: Sequence[Sequence[float]], capacity: Optional[int] = None) -> "CandleSeries":
+        """rows — кортежі (ts, open, high, low, close, volume) у зростаючому порядку ts."""
+        s = cls(capacity or max(len(rows), 1))
+        if rows:
+            arr = np.asarray(rows, dtype=np.float64)[-s.capacity:]
+            n = arr.shape[0]
+            s._buf["ts"][:n] = arr[:, 0].astype(np.int64)
+            for i, f in enumerate(_PRICE_FIELDS, start=1):
+                s._buf[f][:n] = arr[:, i]
+            s._end = n
+        return s
+
+    @classmethod
+    def from_bars(cls, bars: Sequence[Dict[str, float]], capacity: Optional[int] = None) -> "CandleSeries":
+        return cls.from_rows([tuple(b[f] for f in FIELDS) for b in bars], capacity)
+
+    # ── запис ────────────────────────────────────────────────────────────────
+    def _compact(self) -> None:
+        keep = min(len(self), self.capacity - 1)
+        new = self._alloc(2 * self.capacity)
+        lo = self._end - keep
+        for f in FIELDS:
+            new[f][:keep] = self._buf[f][lo:self._end]
+        self._buf, self._start, self._end = new, 0, keep
+
+    def append(self, ts: int, open_: float, high: float, low: float, close: float, volume: float) -> None:
+        """Додає бар; якщо ts збігається з останнім — оновлює формований бар на місці."""
+        ts = int(ts)
+        n = len(self)
+        if n and self._buf["ts"][self._end - 1] == ts:
+            i = self._end - 1
+        elif n and self._buf["ts"][self._end - 1] > ts:
+            return  # запізнілий/старий бар — ігноруємо
+        else:
+            if self._end >= 2 * self.capacity:
+                self._compact()
+            i = self._end
+            self._end += 1
+            if self._end - self._start > self.capacity:
+                self._start += 1
+        b = self._buf
+        b["ts"][i] = ts
+        b["open"][i], b["high"][i], b["low"][i], b["close"][i], b["volume"][i] = open_, high, low, close, volume
+
+    def append_bar(self, bar: Dict[str, float]) -> None:
+        self.append(bar["ts"], bar["open"], bar["high"], bar["low"], bar["close"], bar["volume"])
+
+    def extend(self, bars: Iterable[Dict[str, float]]) -> None:
+        for b in bars:
+            self.append_bar(b)
+
+    # ── читання (zero-copy) ──────────────────────────────────────────────────
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    def _col(self, field: str, n: Optional[int] = None) -> np.ndarray:
+        lo = self._start if n is None else max(self._start, self._end - int(n))
+        v = self._buf[field][lo:self._end]
+        v.flags.writeable = False  # view на спільний кеш — захист від випадкового запису
+        return v
+
+    @property
+    def ts(self) -> np.ndarray: return self._col("ts")
+    @property
+    def open(self) -> np.ndarray: return self._col("open")
+    @property
+    def high(self) -> np.ndarray: return self._col("high")
+    @property
+    def low(self) -> np.ndarray: return self._col("low")
+    @property
+    def close(self) -> np.ndarray: return self._col("close")
+    @property
+    def volume(self) -> np.ndarray: return self._col("volume")
+
+    def last_ts(self) -> Optional[int]:
+        return int(self._buf["ts"][self._end - 1]) if len(self) else None
+
+    def arrays(self, n: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Останні n барів як dict read-only numpy view (без копіювання)."""
+        return {f: self._col(f, n) for f in FIELDS}
+
+    def to_frame(self, n: Optional[int] = None):
+        """pandas DataFrame поверх колонок (ts, open, high, low, close, volume)."""
+        import pandas as pd
+        cols = self.arrays(n)
+        # копія тут дешева (memcpy колонок) і відв'язує DataFrame від змін формованого бару
+        return pd.DataFrame({f: cols[f].copy() for f in FIELDS})
+
+    def to_bars(self, n: Optional[int] = None) -> List[Dict[str, float]]:
+        """Сумісність зі старим API list[dict] (алокує dict на бар — лише для legacy-викликів)."""
+        cols = self.arrays(n)
+        ts = cols["ts"].tolist()
+        o, h, l, c, v = (cols[f].tolist() for f in _PRICE_FIELDS)
+        return [
+            {"ts": ts[i], "open": o[i], "high": h[i], "low": l[i], "close": c[i], "volume": v[i]}
+            for i in range(len(ts))
+        ]
+
+    def tail(self, n: int) -> "CandleSeries":
+        """
+        Легке вікно на останні n барів над тим самим буфером (для зрізів кешу).
+        Завжди новий об'єкт з власними межами — навіть коли n >= len: сам кешований
+        CandleSeries далі отримує бари зі стріму, а вікно лишається зафіксованим.
+        """
+        k = max(0, min(int(n), len(self)))
+        view = CandleSeries.__new__(CandleSeries)
+        view.capacity = max(1, k)
+        view._buf = self._buf
+        view._end = self._end
+        view._start = self._end - k
+        return view
+
+
+__all__ = ["CandleSeries", "FIELDS"]
@@ -0,0 +1,193 @@
+# market_data/stream.py
+from __future__ import annotations
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import websockets  # optional: без нього стрім просто не стартує
+except Exception:  # pragma: no cover
+    websockets = None  # type: ignore[assignment]
+
+from market_data import candles
+from market_data.binance import INTERVAL_MAP
+
+log = logging.getLogger("market_stream")
+
+WS_BASE_URL = os.getenv("BINANCE_WS_URL", "wss://stream.binance.com:9443").rstrip("/")
+_BACKOFF_START = 1.0
+_BACKOFF_CAP = 60.0
+
+
+def _bar_from_kline(k: dict) -> Dict[str, float]:
+    return {
+        "ts": int(k["t"]) // 1000,
+        "open": float(k["o"]),
+        "high": float(k["h"]),
+        "low": float(k["l"]),
+        "close": float(k["c"]),
+        "volume": float(k["v"]),
+    }
+
+
+class MarketStream:
+    """
+    Підписка на combined-стріми Binance (kline_<tf> + miniTicker) для моніторинг-пар.
+    Закриті бари → candle store, формований бар і остання ціна → пам'ять.
+    На кожне (пере)підключення робимо REST-resync серій, щоб закрити діру за час розриву.
+    """
+
+    def __init__(self, symbols: Iterable[str], timeframes: Iterable[str],
+                 base_url: str = WS_BASE_URL, resync_limit: int = 200) -> None:
+        self.symbols = sorted({s.strip().upper() for s in symbols if s and s.strip()})
+        self.timeframes = sorted({tf.strip() for tf in timeframes if tf and tf.strip() in INTERVAL_MAP})
+        self.base_url = base_url.rstrip("/")
+        self.resync_limit = int(resync_limit)
+        self._prices: Dict[str, Tuple[float, float]] = {}  # SYMBOL -> (price, recv_ts)
+        self._stop = asyncio.Event()
+        self.connected = False
+        self.reconnects = 0
+        self.last_msg_ts = 0.0
+
+    # ── streams ──────────────────────────────────────────────────────────────
+    def streams(self) -> List[str]:
+        out: List[str] = []
+        for s in self.symbols:
+            low = s.lower()
+            out += [f"{low}@kline_{tf}" for tf in self.timeframes]
+            out.append(f"{low}@miniTicker")
+        return out
+
+    def url(self) -> str:
+        return f"{self.base_url}/stream?streams=" + "/".join(self.streams())
+
+    # ── message handling ─────────────────────────────────────────────────────
+    def handle_message(self, raw: str | bytes) -> None:
+        try:
+            msg = json.loads(raw)
+        except Exception:
+            return
+        data = msg.get("data", msg) if isinstance(msg, dict) else None
+        if not isinstance(data, dict):
+            return
+        self.last_msg_ts = time.time()
+        ev = data.get("e")
+        if ev == "kline":
+            k = data.get("k") or {}
+            try:
+                candles.on_stream_bar(str(k["s"]), str(k["i"]), _bar_from_kline(k), bool(k.get("x")))
+            except Exception as e:
+                log.debug("[stream] bad kline %s: %s", k, e)
+        elif ev == "24hrMiniTicker":
+            try:
+                self._prices[str(data["s"]).upper()] = (float(data["c"]), self.last_msg_ts)
+            except Exception:
+                pass
+
+    def last_price(self, symbol: str, max_age_sec: float = 5.0) -> Optional[float]:
+        hit = self._prices.get(symbol.upper())
+        if not hit or (time.time() - hit[1]) > max_age_sec:
+            return None
+        return hit[0]
+
+    # ── lifecycle ────────────────────────────────────────────────────────────
+    async def _resync(self) -> None:
+        """REST-дозавантаження дельти по всіх серіях (після розриву могли пропустити закриття)."""
+        for s in self.symbols:
+            for tf in self.timeframes:
+                candles.drop_live(s, tf)
+                try:
+                    await asyncio.to_thread(candles.resync, s, tf, self.resync_limit)
+                except Exception as e:
+                    log.warning("[stream] resync %s %s failed: %s", s, tf, e)
+
+    async def run(self) -> None:
+        if websockets is None:
+            log.warning("[stream] websockets is not installed — streaming disabled")
+            return
+        if not self.symbols or not self.timeframes:
+            log.info("[stream] nothing to subscribe")
+            return
+        backoff = _BACKOFF_START
+        while not self._stop.is_set():
+            try:
+                async with websockets.connect(self.url(), ping_interval=20, ping_timeout=20,
+                                              max_size=2 ** 22) as ws:
+                    self.connected = True
+                    log.info("[stream] connected: %d streams", len(self.streams()))
+                    await self._resync()
+                    backoff = _BACKOFF_START
+                    async for raw in ws:
+                        self.handle_message(raw)
+                        if self._stop.is_set():
+                            break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning("[stream] connection lost: %s; reconnect in %.0fs", e, backoff)
+            finally:
+                self.connected = False
+                for s in self.symbols:
+                    for tf in self.timeframes:
+                        candles.drop_live(s, tf)
+            if self._stop.is_set():
+                break
+            self.reconnects += 1
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=backoff)
+            except asyncio.TimeoutError:
+                pass
+            backoff = min(_BACKOFF_CAP, backoff * 2)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+_STREAM: Optional[MarketStream] = None
+_TASK: Optional[asyncio.Task] = None  # тримаємо посилання, щоб задачу не зібрав GC
+
+
+def get_stream() -> Optional[MarketStream]:
+    return _STREAM
+
+
+def get_last_price(symbol: str, max_age_sec: float = 5.0) -> Optional[float]:
+    """Остання ціна з miniTicker (None — якщо стрім вимкнено або дані застарілі)."""
+    st = _STREAM
+    return st.last_price(symbol, max_age_sec) if st is not None else None
+
+
+def start_stream(symbols: Iterable[str], timeframes: Iterable[str],
+                 base_url: str = WS_BASE_URL) -> asyncio.Task:
+    """Запускає стрім як фонову задачу поточного event loop (повторний виклик — рестарт)."""
+    global _STREAM, _TASK
+    if _STREAM is not None:
+        _STREAM.stop()
+    if _TASK is not None and not _TASK.done():
+        _TASK.cancel()  # старе з'єднання не чекає наступного повідомлення, щоб помітити stop
+    _STREAM = MarketStream(symbols, timeframes, base_url=base_url)
+    _TASK = asyncio.get_running_loop().create_task(_STREAM.run(), name="market_stream")
+    return _TASK
+
+
+async def stop_stream(timeout: float = 5.0) -> None:
+    """Зупиняє стрім: скасовує задачу і чекає, поки закриється сокет (для post_shutdown)."""
+    global _STREAM, _TASK
+    stream, task = _STREAM, _TASK
+    _STREAM, _TASK = None, None
+    if stream is not None:
+        stream.stop()
+    if task is None or task.done():
+        return
+    task.cancel()
+    done, _ = await asyncio.wait({task}, timeout=timeout)
+    if not done:
+        log.warning("[stream] task did not stop in %.0fs", timeout)
+    elif not task.cancelled() and task.exception() is not None:
+        log.warning("[stream] task failed on stop: %s", task.exception())
+
+
+__all__ = ["MarketStream", "get_stream", "get_last_price", "start_stream", "stop_stream"]
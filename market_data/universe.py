@@ -0,0 +1,172 @@
+# market_data/universe.py
+from __future__ import annotations
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from market_data.binance_client import get_client
+
+log = logging.getLogger("universe")
+
+# Свіжість 24h-знімка; після TTL віддаємо старий і оновлюємо у фоні (stale-while-revalidate)
+UNIVERSE_TTL_SEC = float(os.getenv("UNIVERSE_TTL_SEC", "60") or 60)
+# Старіший за це знімок вже не віддаємо — чекаємо синхронного оновлення
+UNIVERSE_MAX_STALE_SEC = float(os.getenv("UNIVERSE_MAX_STALE_SEC", "900") or 900)
+
+_EXCLUDE_SUFFIXES = ("UPUSDT", "DOWNUSDT", "BULLUSDT", "BEARUSDT", "HEDGEUSDT")
+_EXCLUDE_PREFIXES = ("LD", )
+_STABLE_STABLE = {"BUSDUSDT","USDCUSDT","TUSDUSDT","FDUSDUSDT","EURUSDT","TRYUSDT"}
+
+def _is_spot_usdt_symbol(sym: str) -> bool:
+    if not sym.endswith("USDT"): return False
+    if sym in _STABLE_STABLE: return False
+    if any(sym.endswith(suf) for suf in _EXCLUDE_SUFFIXES): return False
+    if any(sym.startswith(pfx) for pfx in _EXCLUDE_PREFIXES): return False
+    return True
+
+
+def _f(v) -> float:
+    try:
+        return float(v)
+    except Exception:
+        return float("nan")
+
+
+class UniverseTable:
+    """
+    Колонковий зліпок /ticker/24hr: symbol / lastPrice / priceChangePercent / quoteVolume
+    + маска «спотова USDT-пара» і заздалегідь відсортовані індекси (quoteVolume↓, change%↓).
+    """
+
+    __slots__ = ("ts", "symbols", "last_price", "change_pct", "quote_volume", "usdt", "order", "_index")
+
+    def __init__(self, payload: List[Dict], ts: Optional[float] = None) -> None:
+        self.ts = ts or time.time()
+        n = len(payload)
+        self.symbols = np.array([str(it.get("symbol", "")) for it in payload], dtype=object)
+        self.last_price = np.fromiter((_f(it.get("lastPrice")) for it in payload), dtype=np.float64, count=n)
+        self.change_pct = np.fromiter((_f(it.get("priceChangePercent")) for it in payload), dtype=np.float64, count=n)
+        self.quote_volume = np.fromiter((_f(it.get("quoteVolume")) for it in payload), dtype=np.float64, count=n)
+        self.usdt = np.fromiter((_is_spot_usdt_symbol(s) for s in self.symbols), dtype=bool, count=n)
+        ok = ~(np.isnan(self.last_price) | np.isnan(self.change_pct) | np.isnan(self.quote_volume))
+        self.usdt &= ok
+        # стабільне сортування за спаданням (NaN — в кінець)
+        self.order = {
+            "quote_volume": np.argsort(-np.nan_to_num(self.quote_volume, nan=-np.inf), kind="stable"),
+            "change": np.argsort(-np.nan_to_num(self.change_pct, nan=-np.inf), kind="stable"),
+        }
+        self._index: Optional[Dict[str, int]] = None
+
+    def __len__(self) -> int:
+        return int(self.symbols.size)
+
+    def _row(self, i: int) -> Dict:
+        return {
+            "symbol": self.symbols[i],
+            "lastPrice": float(self.last_price[i]),
+            "priceChangePercent": float(self.change_pct[i]),
+            "quoteVolume": float(self.quote_volume[i]),
+        }
+
+    def top(self, n: Optional[int] = None, by: str = "quote_volume", usdt_only: bool = True,
+            min_quote_volume: float = 0.0) -> List[Dict]:
+        idx = self.order[by]
+        mask = self.usdt[idx] if usdt_only else np.ones(idx.size, dtype=bool)
+        if min_quote_volume > 0:
+            mask &= self.quote_volume[idx] >= min_quote_volume
+        idx = idx[mask]
+        if n is not None:
+            idx = idx[: max(1, int(n))]
+        return [self._row(int(i)) for i in idx]
+
+    def rows(self, usdt_only: bool = False) -> List[Dict]:
+        """У вихідному порядку біржі (сумісно з get_all_usdt_24h / get_24h_ticker)."""
+        idx = np.flatnonzero(self.usdt) if usdt_only else np.arange(len(self))
+        return [self._row(int(i)) for i in idx]
+
+    def get(self, symbol: str) -> Optional[Dict]:
+        if self._index is None:
+            self._index = {s: i for i, s in enumerate(self.symbols)}
+        i = self._index.get(symbol.upper())
+        return self._row(i) if i is not None else None
+
+
+class Universe:
+    """
+    Спільний кеш 24h-тікерів для /top, рангу і скрінерів: вага 80 — раз на TTL, а не на кожен клік.
+    Після TTL читачі одразу отримують попередній знімок, а оновлення йде у фоновому потоці.
+    """
+
+    def __init__(self, ttl_sec: float = UNIVERSE_TTL_SEC, max_stale_sec: float = UNIVERSE_MAX_STALE_SEC) -> None:
+        self.ttl_sec = float(ttl_sec)
+        self.max_stale_sec = float(max_stale_sec)
+        self._table: Optional[UniverseTable] = None
+        self._lock = threading.Lock()          # одне завантаження за раз (single-flight)
+        self._bg_lock = threading.Lock()       # не більше одного фонового потоку
+        self._bg: Optional[threading.Thread] = None
+
+    def _fresh(self) -> Optional[UniverseTable]:
+        t = self._table
+        return t if t is not None and time.time() - t.ts <= self.ttl_sec else None
+
+    def _load(self) -> UniverseTable:
+        # викликати під self._lock
+        t0 = time.time()
+        table = UniverseTable(get_client().ticker_24h() or [])
+        self._table = table
+        log.debug("[universe] refreshed %d tickers in %.2fs", len(table), time.time() - t0)
+        return table
+
+    def refresh(self, force: bool = True) -> UniverseTable:
+        with self._lock:
+            # поки чекали lock, інший потік міг уже завантажити свіжий знімок — не качаємо вдруге
+            t = None if force else self._fresh()
+            return t if t is not None else self._load()
+
+    def _refresh_bg(self) -> None:
+        try:
+            self.refresh(force=False)
+        except Exception as e:
+            log.warning("[universe] background refresh failed: %s", e)
+
+    def _revalidate(self) -> None:
+        with self._bg_lock:
+            if self._bg is not None and self._bg.is_alive():
+                return
+            self._bg = threading.Thread(target=self._refresh_bg, name="universe-refresh", daemon=True)
+            self._bg.start()
+
+    def table(self) -> UniverseTable:
+        t = self._table
+        if t is not None:
+            age = time.time() - t.ts
+            if age <= self.ttl_sec:
+                return t
+            if age <= self.max_stale_sec:
+                self._revalidate()
+                return t
+        # немає знімка або він надто старий: качає один потік, решта чекають на lock і беруть готовий
+        return self.refresh(force=False)
+
+    def top(self, n: Optional[int] = None, by: str = "quote_volume", **kw) -> List[Dict]:
+        return self.table().top(n, by=by, **kw)
+
+
+_UNIVERSE: Optional[Universe] = None
+_UNIVERSE_LOCK = threading.Lock()
+
+
+def get_universe() -> Universe:
+    global _UNIVERSE
+    if _UNIVERSE is None:
+        with _UNIVERSE_LOCK:
+            if _UNIVERSE is None:
+                _UNIVERSE = Universe()
+    return _UNIVERSE
+
+
+__all__ = ["Universe", "UniverseTable", "get_universe", "UNIVERSE_TTL_SEC"]
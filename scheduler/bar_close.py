@@ -0,0 +1,110 @@
+# scheduler/bar_close.py
+from __future__ import annotations
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from market_data.binance import INTERVAL_SEC
+from market_data.resample import bucket_ts
+
+log = logging.getLogger("bar_close")
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Автопост за закриттям свічки замість фіксованого таймера: для кожної серії (symbol, tf) у роботі
+# рахуємо час закриття поточного бару, спимо рівно до найближчого і скануємо лише ті серії,
+# чий бар щойно закрився (усі символи з однією межею — одним проходом). 1h-сетап більше не
+# пересканується 12 разів за бар, а 5m-сигнал виходить за секунди після закриття, не за хвилини.
+# ───────────────────────────────────────────────────────────────────────────────
+
+# затримка після межі: біржа фіналізує kline і відкриває новий бар (інакше REST віддасть старий)
+CLOSE_DELAY_SEC = float(os.getenv("AUTOPOST_CLOSE_DELAY_SEC", "3"))
+# як часто перевіряти налаштування, поки серій немає або планування впало
+RETRY_SEC = float(os.getenv("AUTOPOST_RESCHEDULE_RETRY_SEC", "60"))
+
+Series = Dict[str, List[str]]  # tf -> symbols
+
+
+def next_close(timeframe: str, now: float) -> int:
+    """Час (epoch, с) закриття бару timeframe, що формується в момент now (= відкриття наступного)."""
+    if timeframe == "1M":
+        # місячні свічки Binance — календарні (1-ше число 00:00 UTC)
+        d = datetime.fromtimestamp(int(now), tz=timezone.utc)
+        y, m = (d.year + 1, 1) if d.month == 12 else (d.year, d.month + 1)
+        return int(datetime(y, m, 1, tzinfo=timezone.utc).timestamp())
+    return int(bucket_ts(int(now), timeframe)) + INTERVAL_SEC[timeframe]
+
+
+def series_in_use() -> Series:
+    """Серії автопосту: monitored_symbols × analyze_timeframe (через кому — кілька TF)."""
+    from services.autopost_sources import _params
+    prm = _params()
+    out: Series = {}
+    for tf in prm["timeframes"]:
+        if tf not in INTERVAL_SEC:
+            log.warning("[bar_close] unsupported timeframe %r skipped", tf)
+            continue
+        out.setdefault(tf, list(prm["symbols"]))
+    return out
+
+
+def plan(series: Series, now: float) -> Optional[Tuple[int, Series]]:
+    """(найближча межа, серії, що на ній закриваються) або None, якщо серій немає."""
+    closes: Dict[int, Series] = {}
+    for tf, syms in series.items():
+        if syms:
+            closes.setdefault(next_close(tf, now), {})[tf] = list(syms)
+    if not closes:
+        return None
+    at = min(closes)
+    return at, closes[at]
+
+
+def schedule(job_queue, callback: Callable[[object], Awaitable[None]], name: str = "autopost_bar_close",
+             now: Optional[float] = None) -> Optional[int]:
+    """
+    Ставить одноразову задачу PTB JobQueue на найближче закриття (+CLOSE_DELAY_SEC).
+    callback(context) бачить context.job.data = {"at": межа, "series": {tf: [symbols]}};
+    після кожного спрацювання наступна межа планується заново (зміни налаштувань підхоплюються).
+    Якщо серій немає — ланцюжок не рветься: повторна спроба через RETRY_SEC (повертає None).
+    """
+    now = time.time() if now is None else now
+    nxt = plan(series_in_use(), now)
+    if nxt is None:
+        log.warning("[bar_close] no series to watch — autopost idle, recheck in %.0fs", RETRY_SEC)
+        job_queue.run_once(_retry, when=RETRY_SEC, name=name,
+                           data={"at": int(now), "callback": callback, "name": name})
+        return None
+    at, group = nxt
+    when = datetime.fromtimestamp(at + CLOSE_DELAY_SEC, tz=timezone.utc)
+    job_queue.run_once(_fire, when=when, name=name,
+                       data={"at": at, "series": group, "callback": callback, "name": name})
+    log.debug("[bar_close] next %s at %s: %s", name, when.isoformat(), {tf: len(s) for tf, s in group.items()})
+    return at
+
+
+def _reschedule(job_queue, data: dict) -> None:
+    try:
+        schedule(job_queue, data["callback"], data["name"], now=max(time.time(), data["at"] + 1))
+    except Exception:
+        # ланцюжок не має обірватись: пробуємо знову за хвилину
+        log.warning("[bar_close] reschedule failed, retry in %.0fs", RETRY_SEC, exc_info=True)
+        job_queue.run_once(_retry, when=RETRY_SEC, name=data["name"], data=data)
+
+
+async def _retry(context) -> None:
+    _reschedule(context.job_queue, context.job.data)
+
+
+async def _fire(context) -> None:
+    data = context.job.data
+    # наступну межу ставимо до скану: довгий скан не зсуває розклад і не пропускає закриття
+    _reschedule(context.job_queue, data)
+    lag = time.time() - data["at"]
+    log.info("[bar_close] %s closed (+%.1fs): %s", datetime.fromtimestamp(data["at"], tz=timezone.utc).strftime("%H:%M"),
+             lag, ", ".join(f"{tf}×{len(s)}" for tf, s in data["series"].items()))
+    await data["callback"](context)
+
+
+__all__ = ["CLOSE_DELAY_SEC", "RETRY_SEC", "next_close", "plan", "schedule", "series_in_use"]
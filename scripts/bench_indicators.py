@@ -0,0 +1,119 @@
+# scripts/bench_indicators.py
+from __future__ import annotations
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+
+from services import ta_kernels
+from services.indicator_engine import compute
+
+# Набір як у скрінерів/аналізатора: рекурсивні (EMA/RMA) + ковзні вікна
+CASES = [
+    ("ema", {"period": 50}),
+    ("ema", {"period": 200}),
+    ("rsi", {"period": 14}),
+    ("rsi", {"period": 14, "smoothing": "ema"}),
+    ("atr", {"period": 14}),
+    ("adx", {"period": 14}),
+    ("adx", {"period": 14, "smoothing": "sma"}),
+    ("macd", {}),
+    ("stochrsi", {}),
+    ("bb", {"period": 20}),
+    ("cci", {"period": 20}),
+    ("mfi", {"period": 14}),
+    ("vwap", {"period": 20}),
+]
+
+
+def _bars(rows: int, n: int, seed: int) -> dict:
+    """Синтетичні свічки (випадкове блукання); у панелі — різна довжина історій (NaN-паддінг зліва)."""
+    rng = np.random.default_rng(seed)
+    c = 100.0 * np.exp(np.cumsum(rng.normal(0, 0.01, (rows, n)), axis=-1))
+    o = np.concatenate([c[:, :1], c[:, :-1]], axis=-1)
+    spread = np.abs(rng.normal(0, 0.004, (rows, n))) * c
+    bars = {"open": o, "high": np.maximum(o, c) + spread, "low": np.minimum(o, c) - spread,
+            "close": c, "volume": rng.uniform(1e3, 1e5, (rows, n))}
+    if rows > 1:
+        for i, k in enumerate(rng.integers(0, n // 2, rows)):
+            for a in bars.values():
+                a[i, :k] = np.nan
+    return bars if rows > 1 else {f: a[0] for f, a in bars.items()}
+
+
+def _run(bars: dict) -> dict:
+    out = {}
+    for name, params in CASES:
+        res = compute(name, bars, **params)
+        for field, arr in (res.items() if isinstance(res, dict) else [("", res)]):
+            out[f"{name}{params}{'.' + field if field else ''}"] = arr
+    return out
+
+
+def _time(bars: dict, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        _run(bars)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def _max_rel_err(a: dict, b: dict) -> float:
+    """Макс. |a-b| відносно масштабу ряду (біля нуля MACD/%B поелементна відносна похибка безглузда)."""
+    err = 0.0
+    for key, x in a.items():
+        y = b[key]
+        if not np.array_equal(np.isnan(x), np.isnan(y)):
+            return float("inf")
+        ok = ~np.isnan(x)
+        if ok.any():
+            err = max(err, float(np.max(np.abs(x[ok] - y[ok])) / max(float(np.max(np.abs(x[ok]))), 1e-12)))
+    return err
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Бенчмарк і паритет бекендів індикаторних ядер (numpy vs numba)")
+    ap.add_argument("--symbols", type=int, default=300, help="Рядків у панелі (symbols × bars)")
+    ap.add_argument("--bars", type=int, default=200, help="Барів на символ у панелі")
+    ap.add_argument("--long", type=int, default=200_000, help="Довжина одиночного ряду")
+    ap.add_argument("--repeat", type=int, default=5, help="Повторів (береться найкращий час)")
+    ap.add_argument("--tol", type=float, default=1e-9, help="Допуск відносної похибки між бекендами")
+    args = ap.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(name)s: %(message)s")
+    datasets = {f"panel {args.symbols}x{args.bars}": _bars(args.symbols, args.bars, 1),
+                f"series {args.long}": _bars(1, args.long, 2)}
+
+    backends = ["numpy"]
+    if ta_kernels.use_backend("numba") == "numba":
+        ta_kernels.warmup()
+        backends.append("numba")
+    else:
+        print("numba не встановлена — лише numpy")
+
+    results = {}
+    for be in backends:
+        ta_kernels.use_backend(be)
+        for label, bars in datasets.items():
+            results[be, label] = _run(bars)
+            print(f"{be:6s} {label:22s} {_time(bars, args.repeat):9.1f}ms")
+
+    rc = 0
+    for label in datasets:
+        for be in backends[1:]:
+            err = _max_rel_err(results["numpy", label], results[be, label])
+            ok = err <= args.tol
+            rc |= not ok
+            print(f"parity {be} vs numpy {label:22s} max rel err {err:.2e} {'OK' if ok else 'FAIL'}")
+    ta_kernels.use_backend(os.getenv("TA_BACKEND", "auto"))
+    return rc
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,43 @@
+# scripts/import_binance_archive.py
+from __future__ import annotations
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from market_data.archive_import import run_import
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        description="Офлайн-імпорт klines-архівів data.binance.vision (*.zip / *.csv) у candle store"
+    )
+    ap.add_argument("path", help="Каталог з архівами (обходиться рекурсивно)")
+    ap.add_argument("--symbols", help="BTCUSDT,ETHUSDT (за замовчуванням — усі знайдені)")
+    ap.add_argument("--tf", dest="timeframes", help="1m,1h (за замовчуванням — усі знайдені)")
+    ap.add_argument("--workers", type=int, default=0, help="Кількість процесів (0 = за кількістю CPU)")
+    ap.add_argument("--db", dest="db_path", help="Шлях до candles.db (за замовчуванням — CANDLE_DB_PATH)")
+    ap.add_argument("--force", action="store_true", help="Імпортувати повторно вже імпортовані файли")
+    args = ap.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(name)s: %(message)s")
+    split = lambda s: [x.strip() for x in s.split(",") if x.strip()] if s else None
+
+    def _progress(source: str, rows: int, stats: dict):
+        done = stats["imported"] + stats["skipped"] + stats["failed"]
+        note = "skip (already imported)" if rows < 0 else f"{rows} rows"
+        print(f"[{done}/{stats['files']}] {source}: {note}")
+
+    t0 = time.time()
+    stats = run_import(args.path, symbols=split(args.symbols), timeframes=split(args.timeframes),
+                       workers=args.workers, db_path=args.db_path, force=args.force, progress=_progress)
+    print(f"files={stats['files']} imported={stats['imported']} skipped={stats['skipped']} "
+          f"failed={stats['failed']} rows={stats['rows']} in {time.time() - t0:.1f}s")
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
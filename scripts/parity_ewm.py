@@ -0,0 +1,147 @@
+# scripts/parity_ewm.py
+from __future__ import annotations
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+
+from services import ta_kernels
+from services.indicator_engine import _ema as engine_ema
+
+# Паритет векторизованого EMA (чанки замкненої форми / numba) з класичним циклом,
+# яким analyzer_core._ema рахував до переходу на ta_kernels. Код виходу 1 — розбіжність.
+
+PERIODS = (2, 3, 9, 14, 20, 50, 200, 1000)
+
+
+def loop_ewm(a: np.ndarray, alpha: float) -> np.ndarray:
+    """Еталон: out[0] = a[0]; out[i] = alpha*a[i] + (1-alpha)*out[i-1] (колишній analyzer_core._ema)."""
+    out = np.empty_like(a, dtype=float)
+    if a.size:
+        out[0] = a[0]
+    for i in range(1, len(a)):
+        out[i] = alpha * a[i] + (1 - alpha) * out[i - 1]
+    return out
+
+
+def loop_ema(a: np.ndarray, period: int) -> np.ndarray:
+    if period <= 1 or a.size == 0:
+        return a.astype(float)
+    return loop_ewm(a, 2.0 / (period + 1.0))
+
+
+def loop_rows(a: np.ndarray, alpha: float) -> np.ndarray:
+    """Еталон ewm_rows: провідні NaN рядка пропускаються, далі — той самий цикл."""
+    x = np.atleast_2d(a)
+    out = np.full(x.shape, np.nan)
+    for r, row in enumerate(x):
+        ok = np.flatnonzero(~np.isnan(row))
+        if ok.size:
+            out[r, ok[0]:] = loop_ewm(row[ok[0]:], alpha)
+    return out.reshape(np.shape(a))
+
+
+def _walk(rng, n: int, scale: float = 100.0) -> np.ndarray:
+    return scale * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+
+
+def _series_cases(rng, long: int):
+    """(назва, ряд): звичайні, на межах чанків _weights, великі/малі ціни, NaN та inf."""
+    cases = [("walk 500", _walk(rng, 500)), ("btc-scale", _walk(rng, 5000, 1e5)),
+             ("tiny", _walk(rng, 5000, 1e-6)), ("single", np.array([42.0])), ("empty", np.empty(0))]
+    for period in PERIODS:
+        k = ta_kernels._weights(ta_kernels.ema_alpha(period)).size
+        for n in (k - 1, k, k + 1, 2 * k + 1, 3 * k + 7):
+            if 0 < n <= long:
+                cases.append((f"p{period} chunk {n} (k={k})", _walk(rng, n)))
+    x = _walk(rng, 1000)
+    x[[400, 401]] = np.nan
+    cases.append(("nan mid", x))
+    x = _walk(rng, 1000)
+    x[:30] = np.nan
+    cases.append(("nan start", x))
+    x = _walk(rng, 1000)
+    x[600] = np.inf
+    cases.append(("inf mid", x))
+    return cases
+
+
+def _err(a: np.ndarray, b: np.ndarray) -> float:
+    """Макс. відносна похибка; розбіжність NaN/inf-маски — нескінченна."""
+    if a.shape != b.shape:
+        return float("inf")
+    fa, fb = np.isfinite(a), np.isfinite(b)
+    if not np.array_equal(fa, fb) or not np.array_equal(a[~fa], b[~fb], equal_nan=True):
+        return float("inf")
+    if not fa.any():
+        return 0.0
+    return float(np.max(np.abs(a[fa] - b[fa]) / np.maximum(np.abs(b[fa]), 1e-300)))
+
+
+def check(tol: float, long: int, seed: int) -> int:
+    rng = np.random.default_rng(seed)
+    worst, fails = 0.0, 0
+    series = _series_cases(rng, long)
+
+    def report(name: str, err: float) -> None:
+        nonlocal worst, fails
+        worst = max(worst, err)
+        if err > tol:
+            fails += 1
+            print(f"  FAIL {name}: max rel err {err:.2e}")
+
+    for label, x in series:
+        for period in PERIODS:
+            alpha = ta_kernels.ema_alpha(period)
+            ref = loop_ewm(x, alpha)
+            report(f"ewm {label} p{period}", _err(ta_kernels.ewm(x, alpha), ref))
+            report(f"ema {label} p{period}", _err(ta_kernels.ema(x, period), loop_ema(x, period)))
+            report(f"ewm_rows {label} p{period}", _err(ta_kernels.ewm_rows(x, alpha), loop_rows(x, alpha)))
+            report(f"engine _ema {label} p{period}", _err(engine_ema(x, period), loop_rows(x, alpha)))
+
+    # панель: різна довжина історій (провідні NaN), рядок з inf, повністю порожній рядок
+    rows, n = 64, 3000
+    panel = np.vstack([_walk(rng, n) for _ in range(rows)])
+    for i, k in enumerate(rng.integers(0, n // 2, rows)):
+        panel[i, :k] = np.nan
+    panel[3, 2000] = np.inf
+    panel[5, :] = np.nan
+    panel[7, 1500:1510] = np.nan
+    for period in PERIODS:
+        alpha = ta_kernels.ema_alpha(period)
+        report(f"ewm_rows panel {rows}x{n} p{period}", _err(ta_kernels.ewm_rows(panel, alpha), loop_rows(panel, alpha)))
+
+    # дуже повільна EMA на довгому ряді — кілька чанків _MAX_CHUNK
+    x = _walk(rng, long)
+    for alpha in (1e-4, 1e-5):
+        report(f"ewm long {long} alpha={alpha:g}", _err(ta_kernels.ewm(x, alpha), loop_ewm(x, alpha)))
+
+    print(f"{ta_kernels.backend():6s} max rel err {worst:.2e} — {'OK' if not fails else f'{fails} FAIL'}")
+    return int(fails > 0)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Паритет ta_kernels.ewm/ewm_rows/ema з класичним циклом EMA")
+    ap.add_argument("--tol", type=float, default=1e-9, help="Допуск відносної похибки")
+    ap.add_argument("--long", type=int, default=300_000, help="Довжина довгого ряду (кілька чанків)")
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    backends = ["numpy"]
+    if ta_kernels.use_backend("numba") == "numba":
+        backends.append("numba")
+    else:
+        print("numba не встановлена — лише numpy")
+    rc = 0
+    for be in backends:
+        ta_kernels.use_backend(be)
+        rc |= check(args.tol, args.long, args.seed)
+    ta_kernels.use_backend(os.getenv("TA_BACKEND", "auto"))
+    return rc
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+# scripts/stream_harness.py
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# Окрема тимчасова база свічок — харнес не чіпає робочу data/candles.db
+os.environ.setdefault("CANDLE_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="stream_harness_"), "candles.db"))
+
+import websockets
+
+from market_data import candles, stream
+from market_data.candle_store import get_store
+
+# Локальний фейковий WS-сервер у форматі combined-стрімів Binance: прогін MarketStream без мережі.
+# Перевіряє: kline/miniTicker → сховище/пам'ять, розрив → reconnect + resync, stop_stream → задача
+# скасована й сокет закритий. Код виходу 1 — щось не так.
+
+SYMBOL, TF = "BTCUSDT", "1m"
+
+
+def _kline(ts: int, close: float, closed: bool) -> str:
+    k = {"t": ts * 1000, "s": SYMBOL, "i": TF, "o": close, "h": close + 1, "l": close - 1,
+         "c": close, "v": 10.0, "x": closed}
+    return json.dumps({"stream": f"{SYMBOL.lower()}@kline_{TF}", "data": {"e": "kline", "s": SYMBOL, "k": k}})
+
+
+def _ticker(price: float) -> str:
+    return json.dumps({"stream": f"{SYMBOL.lower()}@miniTicker",
+                       "data": {"e": "24hrMiniTicker", "s": SYMBOL, "c": str(price)}})
+
+
+class FakeBinance:
+    """Перше з'єднання: закритий бар + тікер, потім обрив; далі — формований бар і тримаємо сокет."""
+
+    def __init__(self) -> None:
+        self.connections = 0
+        self.open = 0
+        self.paths = []
+        self.base_ts = (int(time.time()) // 60 - 5) * 60
+
+    async def handler(self, ws) -> None:
+        self.connections += 1
+        self.open += 1
+        self.paths.append(ws.request.path)
+        try:
+            if self.connections == 1:
+                await ws.send(_kline(self.base_ts, 100.0, closed=True))
+                await ws.send(_ticker(100.5))
+                await ws.send("not json")  # сміття не має валити стрім
+                await asyncio.sleep(0.1)
+                return  # обрив → клієнт має перепідключитись
+            await ws.send(_kline(self.base_ts + 60, 101.0, closed=True))
+            await ws.send(_kline(self.base_ts + 120, 102.0, closed=False))
+            await ws.send(_ticker(102.5))
+            await ws.wait_closed()
+        finally:
+            self.open -= 1
+
+
+async def _wait(cond, timeout: float) -> bool:
+    t0 = time.monotonic()
+    while time.monotonic() - t0 < timeout:
+        if cond():
+            return True
+        await asyncio.sleep(0.02)
+    return cond()
+
+
+async def run(timeout: float) -> int:
+    fake = FakeBinance()
+    resyncs = []
+    # REST-resync — поза харнесом (мережа); рахуємо виклики замість завантаження
+    candles.resync = lambda s, tf, limit=200: resyncs.append((s, tf)) or 0
+    stream._BACKOFF_START = 0.05
+
+    failures = []
+
+    def check(name: str, ok: bool) -> None:
+        print(f"{'OK  ' if ok else 'FAIL'} {name}")
+        if not ok:
+            failures.append(name)
+
+    async with websockets.serve(fake.handler, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        task = stream.start_stream([SYMBOL], [TF], base_url=f"ws://127.0.0.1:{port}")
+        st = stream.get_stream()
+
+        check("reconnected after drop", await _wait(lambda: fake.connections >= 2 and st.connected, timeout))
+        check("subscribed to kline + miniTicker",
+              fake.paths[0] == f"/stream?streams={SYMBOL.lower()}@kline_{TF}/{SYMBOL.lower()}@miniTicker")
+        check("resync on every connect", await _wait(lambda: len(resyncs) >= 2, timeout))
+        check("last price from miniTicker", await _wait(lambda: stream.get_last_price(SYMBOL) == 102.5, timeout))
+        check("series is live", await _wait(lambda: candles.is_live(SYMBOL, TF), timeout))
+        stored = [int(r[0]) for r in get_store().load_rows(SYMBOL, TF, 10)]
+        check("closed bars stored, forming bar is not",
+              fake.base_ts in stored and fake.base_ts + 60 in stored and fake.base_ts + 120 not in stored)
+
+        await stream.stop_stream()
+        check("stop_stream awaited the task", task.done())
+        check("stream globals cleared", stream.get_stream() is None and stream._TASK is None)
+        check("server saw the socket closed", await _wait(lambda: fake.open == 0, timeout))
+        check("no longer live after stop", not candles.is_live(SYMBOL, TF))
+
+    print("stream harness:", "OK" if not failures else f"{len(failures)} FAIL")
+    return int(bool(failures))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Прогін MarketStream проти локального фейкового WS-сервера")
+    ap.add_argument("--timeout", type=float, default=5.0, help="Очікування кожної перевірки, с")
+    ap.add_argument("-v", "--verbose", action="store_true")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format="%(levelname)s %(name)s: %(message)s")
+    return asyncio.run(run(args.timeout))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
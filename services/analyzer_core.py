@@ -1,11 +1,15 @@
 # services/analyzer_core.py
 from __future__ import annotations
 import math
-from typing import Dict, Any, Optional, List
+import threading
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
 
 import numpy as np
 import pandas as pd
 
+from services.indicator_engine import from_arrays
+
 try:
     # ми не імпортуємо тут get_setting, аби модуль не тягнув залежності від utils.*
     # але приймаємо cfg з autopost; якщо cfg немає — використаємо дефолти нижче.
@@ -15,107 +19,6 @@ except Exception:
         return str(default) if default is not None else ""
 
 
-# ───────────────────────────────────────────────────────────────────────────────
-# low-level indicators (без зовнішніх пакетів)
-# ───────────────────────────────────────────────────────────────────────────────
-
-def _ema(a: np.ndarray, period: int) -> np.ndarray:
-    if period <= 1 or a.size == 0:
-        return a.astype(float)
-    alpha = 2.0 / (period + 1.0)
-    out = np.empty_like(a, dtype=float)
-    out[0] = a[0]
-    for i in range(1, len(a)):
-        out[i] = alpha * a[i] + (1 - alpha) * out[i - 1]
-    return out
-
-
-def _true_range(h: np.ndarray, l: np.ndarray, c: np.ndarray) -> np.ndarray:
-    prev_c = np.concatenate(([c[0]], c[:-1]))
-    tr1 = h - l
-    tr2 = np.abs(h - prev_c)
-    tr3 = np.abs(l - prev_c)
-    return np.maximum.reduce([tr1, tr2, tr3])
-
-
-def _atr(h: np.ndarray, l: np.ndarray, c: np.ndarray, period: int = 14) -> np.ndarray:
-    tr = _true_range(h, l, c)
-    return _ema(tr, period)
-
-
-def _rsi(c: np.ndarray, period: int = 14) -> np.ndarray:
-    if len(c) < period + 1:
-        return np.full_like(c, np.nan, dtype=float)
-    delta = np.diff(c, prepend=c[0])
-    gains = np.where(delta > 0, delta, 0.0)
-    losses = np.where(delta < 0, -delta, 0.0)
-    avg_gain = _ema(gains, period)
-    avg_loss = _ema(losses, period)
-    rs = np.divide(avg_gain, avg_loss, out=np.zeros_like(avg_gain), where=avg_loss > 0)
-    rsi = 100.0 - (100.0 / (1.0 + rs))
-    return rsi
-
-
-def _adx(h: np.ndarray, l: np.ndarray, c: np.ndarray, period: int = 14) -> np.ndarray:
-    if len(c) < period + 2:
-        return np.full_like(c, np.nan, dtype=float)
-
-    up_move = h[1:] - h[:-1]
-    down_move = l[:-1] - l[1:]
-    plus_dm = np.where((up_move > down_move) & (up_move > 0), up_move, 0.0)
-    minus_dm = np.where((down_move > up_move) & (down_move > 0), down_move, 0.0)
-
-    tr = _true_range(h, l, c)
-    atr = _ema(tr, period)
-
-    # prepend 0 to match lengths
-    plus_di = 100.0 * _ema(np.concatenate(([0.0], plus_dm)), period) / np.where(atr == 0, np.nan, atr)
-    minus_di = 100.0 * _ema(np.concatenate(([0.0], minus_dm)), period) / np.where(atr == 0, np.nan, atr)
-
-    dx = 100.0 * np.abs(plus_di - minus_di) / np.where((plus_di + minus_di) == 0, np.nan, (plus_di + minus_di))
-    adx = _ema(dx, period)
-    return adx
-
-
-def _bollinger_bandwidth(c: np.ndarray, period: int = 20, n_std: float = 2.0) -> np.ndarray:
-    if len(c) < period:
-        return np.full_like(c, np.nan, dtype=float)
-    s = pd.Series(c)
-    ma = s.rolling(window=period, min_periods=period).mean()
-    std = s.rolling(window=period, min_periods=period).std()
-    upper = ma + n_std * std
-    lower = ma - n_std * std
-    mid = ma
-    bw = (upper - lower) / np.where(mid.to_numpy(dtype=float) == 0, np.nan, mid.to_numpy(dtype=float))
-    return bw.to_numpy(dtype=float)
-
-
-def _vwap(h: np.ndarray, l: np.ndarray, c: np.ndarray, v: np.ndarray) -> np.ndarray:
-    typical = (h + l + c) / 3.0
-    cum_pv = np.cumsum(typical * v)
-    cum_v = np.cumsum(v)
-    vwap = np.divide(cum_pv, cum_v, out=np.full_like(c, np.nan, dtype=float), where=cum_v != 0)
-    return vwap
-
-
-def _relative_volume(v: np.ndarray, lookback: int = 20) -> np.ndarray:
-    if len(v) < lookback:
-        return np.full_like(v, np.nan, dtype=float)
-    s = pd.Series(v)
-    ma = s.rolling(window=lookback, min_periods=lookback).mean().to_numpy(dtype=float)
-    rel = np.divide(v, ma, out=np.full_like(v, np.nan, dtype=float), where=ma != 0)
-    return rel
-
-
-def _slope_norm(x: np.ndarray, period: int = 10) -> np.ndarray:
-    """Проста нормована «нахил» EMA/ціни: (x[t]-x[t-period])/(period*price)."""
-    if len(x) <= period:
-        return np.full_like(x, np.nan, dtype=float)
-    num = x - np.concatenate((np.full(period, x[0]), x[:-period]))
-    denom = period * np.maximum(np.abs(x), 1e-12)
-    return num / denom
-
-
 # ───────────────────────────────────────────────────────────────────────────────
 # public API
 # ───────────────────────────────────────────────────────────────────────────────
@@ -141,10 +44,139 @@ def _cfg_str(cfg: Optional[Dict[str, Any]], key: str, default: str) -> str:
     return get_setting(key.lower(), default) or default
 
 
-def compute_indicators(df: pd.DataFrame, cfg: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+# ───────────────────────────────────────────────────────────────────────────────
+# Ліниві індикатори: кожне поле рахується лише при першому зверненні
+# ───────────────────────────────────────────────────────────────────────────────
+
+# ряд → (індикатор рушія, параметри, поле результату). Варіант smoothing="ema" — історичні формули
+# гейта (ATR/RSI/ADX на EMA 2/(N+1), VWAP від початку вікна), на них відкалібровані пороги
+_SERIES: Dict[str, Tuple[str, Dict[str, Any], Optional[str]]] = {
+    "ema50": ("ema", {"period": 50}, None),
+    "ema200": ("ema", {"period": 200}, None),
+    "atr": ("atr", {"period": 14, "smoothing": "ema"}, None),
+    "rsi": ("rsi", {"period": 14, "smoothing": "ema"}, None),
+    "adx": ("adx", {"period": 14, "smoothing": "ema"}, None),
+    "bbw": ("bb", {"period": 20, "mult": 2.0}, "width"),
+    "vwap": ("vwap", {}, None),
+    "rel_vol": ("rel_volume", {"period": 20}, None),
+    "ema50_slope": ("ema_slope", {"period": 50, "lag": 10}, None),
+}
+
+# відносна вартість ряду (мкс на 300 барів, numpy-бекенд) — для порядку критеріїв гейта
+_COST: Dict[str, float] = {
+    "ema50": 40, "ema200": 40, "atr": 60, "rsi": 135, "adx": 215,
+    "bbw": 175, "vwap": 40, "rel_vol": 65, "ema50_slope": 75,
+}
+
+
+def _last(x: np.ndarray) -> Optional[float]:
+    v = float(x[-1])
+    return None if math.isnan(v) else v
+
+
+def _scalar(v: float) -> Optional[float]:
+    return None if math.isnan(v) else float(v)
+
+
+def _atr_pct(s, c: np.ndarray) -> Optional[float]:
+    atr = float(s["atr"][-1])
+    return float(atr / c[-1]) if c[-1] != 0 and not math.isnan(atr) else None
+
+
+# поле compute_indicators → (ряди, які воно читає, обчислення зі значенням на останньому барі)
+_FIELDS: Dict[str, Tuple[Tuple[str, ...], Callable[[Any, np.ndarray], Optional[float]]]] = {
+    "ema50": (("ema50",), lambda s, c: _last(s["ema50"])),
+    "ema200": (("ema200",), lambda s, c: _last(s["ema200"])),
+    "atr_entry": (("atr",), lambda s, c: _last(s["atr"])),
+    "atr_pct": (("atr",), _atr_pct),
+    "rsi": (("rsi",), lambda s, c: _last(s["rsi"])),
+    "adx": (("adx",), lambda s, c: _last(s["adx"])),
+    "bbw": (("bbw",), lambda s, c: _last(s["bbw"])),
+    "rel_vol": (("rel_vol",), lambda s, c: _last(s["rel_vol"])),
+    "vwap": (("vwap",), lambda s, c: _last(s["vwap"])),
+    "vwap_dist": (("vwap",), lambda s, c: _scalar(abs(c[-1] - s["vwap"][-1]) / max(abs(c[-1]), 1e-12))),
+    "ema50_slope": (("ema50_slope",), lambda s, c: _last(s["ema50_slope"])),
+    "price_rel_ema50": (("ema50",), lambda s, c: _scalar(c[-1] - s["ema50"][-1])),
+    "price_rel_ema200": (("ema200",), lambda s, c: _scalar(c[-1] - s["ema200"][-1])),
+}
+
+
+class _LazySeries(Mapping):
+    """Ряди індикаторів знімка (IndicatorFrame): рахуються при першому зверненні."""
+
+    __slots__ = ("_fr", "_done")
+
+    def __init__(self, fr) -> None:
+        self._fr = fr
+        self._done: Dict[str, np.ndarray] = {}
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        arr = self._done.get(name)
+        if arr is None:
+            ind, params, field = _SERIES[name]
+            res = self._fr.get(ind, **params)
+            arr = self._done[name] = res[field] if field is not None else res
+        return arr
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(_SERIES)
+
+    def __len__(self) -> int:
+        return len(_SERIES)
+
+    def computed(self, name: str) -> bool:
+        return name in self._done
+
+
+class LazyIndicators(Mapping):
     """
-    Очікуємо df з колонками: ['open','high','low','close','volume'].
-    Повертаємо dict з базовими метриками для останнього бару та «сирими» рядам за потреби.
+    Той самий dict, що повертає compute_indicators, але кожне поле (і ряд під ним) рахується
+    лише коли його прочитали. evaluate_gate читає поля в порядку вартості і зупиняється,
+    щойно мінімальний бал недосяжний — решта індикаторів так і не рахується.
+    """
+
+    __slots__ = ("_c", "_vals", "series")
+
+    def __init__(self, fr, close: np.ndarray) -> None:
+        self._c = close
+        self._vals: Dict[str, Any] = {"ok": True}
+        self.series = _LazySeries(fr)
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._vals:
+            return self._vals[key]
+        if key == "_series":
+            return self.series
+        _deps, fn = _FIELDS[key]
+        val = self._vals[key] = fn(self.series, self._c)
+        return val
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(("ok", *_FIELDS, "_series"))
+
+    def __len__(self) -> int:
+        return len(_FIELDS) + 2
+
+    def cost(self, fields: Sequence[str]) -> float:
+        """Скільки ще коштує прочитати поля (ряди, які вже пораховані, — безкоштовні)."""
+        need = {d for f in fields if f not in self._vals for d in _FIELDS[f][0]}
+        return float(sum(_COST[d] for d in need if not self.series.computed(d)))
+
+    def peek(self, key: str) -> Any:
+        """Значення поля, якщо воно не потребує нових розрахунків; інакше None."""
+        return self[key] if key in self._vals or not self.cost((key,)) else None
+
+    def materialize(self) -> Dict[str, Any]:
+        out = {k: self[k] for k in ("ok", *_FIELDS)}
+        # допоміжні ряди (можуть стати у пригоді)
+        out["_series"] = {name: self.series[name] for name in _SERIES}
+        return out
+
+
+def lazy_indicators(df: pd.DataFrame, cfg: Optional[Dict[str, Any]] = None):
+    """
+    Як compute_indicators, але без розрахунків наперед: LazyIndicators (або dict з ok=False).
+    Для evaluate_gate(..., min_pass=N) — рахується лише те, що знадобилось критеріям.
     """
     if df is None or df.empty:
         return {"ok": False, "reason": "empty_df"}
@@ -160,201 +192,194 @@ def compute_indicators(df: pd.DataFrame, cfg: Optional[Dict[str, Any]] = None) -
     l = df[cols["low"]].to_numpy(dtype=float)
     c = df[cols["close"]].to_numpy(dtype=float)
     v = df[cols.get("volume", next((x for x in df.columns if x.lower() == "volume"), None) or df.columns[-1])].to_numpy(dtype=float)
+    ts = df[cols["ts"]].to_numpy() if "ts" in cols else None
 
-    ema50 = _ema(c, 50)
-    ema200 = _ema(c, 200)
-    atr = _atr(h, l, c, 14)
-    rsi = _rsi(c, 14)
-    adx = _adx(h, l, c, 14)
-    bbw = _bollinger_bandwidth(c, 20, 2.0)
-    vwap = _vwap(h, l, c, v)
-    rel_vol = _relative_volume(v, 20)
-
-    ema50_slope = _slope_norm(ema50, 10)
-    price_above_ema50 = c - ema50
-    price_above_ema200 = c - ema200
-    vwap_dist_abs = np.abs(c - vwap) / np.maximum(np.abs(c), 1e-12)
-
-    out = {
-        "ok": True,
-        "ema50": float(ema50[-1]) if not math.isnan(ema50[-1]) else None,
-        "ema200": float(ema200[-1]) if not math.isnan(ema200[-1]) else None,
-        "atr_entry": float(atr[-1]) if not math.isnan(atr[-1]) else None,
-        "atr_pct": float(atr[-1] / c[-1]) if c[-1] != 0 and not math.isnan(atr[-1]) else None,
-        "rsi": float(rsi[-1]) if not math.isnan(rsi[-1]) else None,
-        "adx": float(adx[-1]) if not math.isnan(adx[-1]) else None,
-        "bbw": float(bbw[-1]) if not math.isnan(bbw[-1]) else None,
-        "rel_vol": float(rel_vol[-1]) if not math.isnan(rel_vol[-1]) else None,
-        "vwap": float(vwap[-1]) if not math.isnan(vwap[-1]) else None,
-        "vwap_dist": float(vwap_dist_abs[-1]) if not math.isnan(vwap_dist_abs[-1]) else None,
-        "ema50_slope": float(ema50_slope[-1]) if not math.isnan(ema50_slope[-1]) else None,
-        "price_rel_ema50": float(price_above_ema50[-1]) if not math.isnan(price_above_ema50[-1]) else None,
-        "price_rel_ema200": float(price_above_ema200[-1]) if not math.isnan(price_above_ema200[-1]) else None,
-        # допоміжні ряди (можуть стати у пригоді)
-        "_series": {
-            "ema50": ema50,
-            "ema200": ema200,
-            "atr": atr,
-            "rsi": rsi,
-            "adx": adx,
-            "bbw": bbw,
-            "vwap": vwap,
-            "rel_vol": rel_vol,
-        },
-    }
-    return out
+    # канонічний рушій (services.indicator_engine): знімок з тими ж барами — той самий кеш
+    attrs = getattr(df, "attrs", None) or {}
+    fr = from_arrays(h, l, c, v, ts=ts, symbol=attrs.get("symbol"), tf=attrs.get("tf"))
+    return LazyIndicators(fr, fr.bars["close"])
 
 
-def evaluate_gate(ind: Dict[str, Any], direction: str, cfg: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+def compute_indicators(df: pd.DataFrame, cfg: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """
-    Рахуємо 12/12 «проходок». Повертаємо:
-      {
-        "score": int, "total": 12,
-        "reasons": [список тегів, чому не пройшло],
-        "indicators": ind  # echo для телеметрії
-      }
+    Очікуємо df з колонками: ['open','high','low','close','volume'].
+    Повертаємо dict з базовими метриками для останнього бару та «сирими» рядам за потреби.
     """
-    total = 12
-    reasons: List[str] = []
-    passed = 0
+    ind = lazy_indicators(df, cfg)
+    return ind.materialize() if isinstance(ind, LazyIndicators) else ind
 
-    if not ind.get("ok", False):
-        return {"score": 0, "total": total, "reasons": [ind.get("reason", "ind_failed")], "indicators": ind}
 
-    dir_long = str(direction or "LONG").upper() == "LONG"
+# ───────────────────────────────────────────────────────────────────────────────
+# Гейт: критерії з залежностями, порядок за вартістю/селективністю, short-circuit
+# ───────────────────────────────────────────────────────────────────────────────
 
-    # Конфіги (верхній регістр — як у плані; fallback до .env через get_setting)
-    ATR_MIN = _cfg_num(cfg, "ATR_MIN", 0.004)
-    RSI_LONG_MIN = _cfg_num(cfg, "RSI_LONG_MIN", 50.0)
-    RSI_SHORT_MAX = _cfg_num(cfg, "RSI_SHORT_MAX", 50.0)
-    ADX_MIN = _cfg_num(cfg, "ADX_MIN", 18.0)
-    BBW_MIN = _cfg_num(cfg, "BBW_MIN", 0.015)
-    VOL_REL_MIN = _cfg_num(cfg, "VOL_REL_MIN", 1.2)
-    VWAP_DIST_MIN = _cfg_num(cfg, "VWAP_DIST_MIN", 0.0015)
-    TREND_FILTER = _cfg_str(cfg, "TREND_FILTER", "ema50_over_ema200")
-
-    ema50 = ind.get("ema50")
-    ema200 = ind.get("ema200")
-    atr_pct = ind.get("atr_pct")
-    rsi = ind.get("rsi")
-    adx = ind.get("adx")
-    bbw = ind.get("bbw")
-    rel_vol = ind.get("rel_vol")
-    vwap_dist = ind.get("vwap_dist")
-    ema50_slope = ind.get("ema50_slope")
-    pr_ema50 = ind.get("price_rel_ema50")
-    pr_ema200 = ind.get("price_rel_ema200")
+class _Thresholds:
+    """Пороги гейта: cfg → get_setting; читаються лише для критеріїв, які справді оцінюються."""
 
-    # 1) Тренд (EMA50 vs EMA200)
-    trend_ok = None
-    if ema50 is not None and ema200 is not None:
-        if TREND_FILTER == "ema50_over_ema200":
-            trend_ok = (ema50 > ema200) if dir_long else (ema50 < ema200)
-    if trend_ok:
-        passed += 1
-    else:
-        reasons.append("weak_trend")
+    __slots__ = ("cfg", "_cache")
 
-    # 2) Мін. волатильність (ATR / Close)
-    if atr_pct is not None and atr_pct >= ATR_MIN:
-        passed += 1
-    else:
-        reasons.append("low_atr")
+    def __init__(self, cfg: Optional[Dict[str, Any]]) -> None:
+        self.cfg = cfg
+        self._cache: Dict[str, Any] = {}
 
-    # 3) RSI по напрямку
-    if rsi is not None and ((dir_long and rsi >= RSI_LONG_MIN) or ((not dir_long) and rsi <= RSI_SHORT_MAX)):
-        passed += 1
-    else:
-        reasons.append("rsi_fail")
+    def num(self, key: str, default: float) -> float:
+        if key not in self._cache:
+            self._cache[key] = _cfg_num(self.cfg, key, default)
+        return self._cache[key]
 
-    # 4) ADX
-    if adx is not None and adx >= ADX_MIN:
-        passed += 1
-    else:
-        reasons.append("low_adx")
+    def str(self, key: str, default: str) -> str:
+        if key not in self._cache:
+            self._cache[key] = _cfg_str(self.cfg, key, default)
+        return self._cache[key]
 
-    # 5) Bollinger BW
-    if bbw is not None and bbw >= BBW_MIN:
-        passed += 1
-    else:
-        reasons.append("narrow_bands")
 
-    # 6) Відносний обсяг
-    if rel_vol is not None and rel_vol >= VOL_REL_MIN:
-        passed += 1
-    else:
-        reasons.append("low_volume")
+def _trend_ok(ind, long: bool, th: _Thresholds) -> Optional[bool]:
+    ema50, ema200 = ind.get("ema50"), ind.get("ema200")
+    if ema50 is None or ema200 is None or th.str("TREND_FILTER", "ema50_over_ema200") != "ema50_over_ema200":
+        return None
+    return (ema50 > ema200) if long else (ema50 < ema200)
 
-    # 7) Відстань до VWAP (у плані MIN — не менше)
-    if vwap_dist is not None and vwap_dist >= VWAP_DIST_MIN:
-        passed += 1
-    else:
-        reasons.append("vwap_too_close")
 
-    # 8) Нахил EMA50 (у бік напряму)
-    if ema50_slope is not None and ((dir_long and ema50_slope > 0) or ((not dir_long) and ema50_slope < 0)):
-        passed += 1
-    else:
-        reasons.append("ema50_flat")
+def _directional(v: Optional[float], long: bool) -> bool:
+    return v is not None and ((long and v > 0) or ((not long) and v < 0))
 
-    # 9) Ціна відносно EMA50 (у бік напряму)
-    if pr_ema50 is not None and ((dir_long and pr_ema50 > 0) or ((not dir_long) and pr_ema50 < 0)):
-        passed += 1
-    else:
-        reasons.append("price_vs_ema50")
 
-    # 10) Ціна відносно EMA200 (у бік напряму)
-    if pr_ema200 is not None and ((dir_long and pr_ema200 > 0) or ((not dir_long) and pr_ema200 < 0)):
-        passed += 1
-    else:
-        reasons.append("price_vs_ema200")
+def _rsi_ok(ind, long: bool, th: _Thresholds) -> bool:
+    rsi = ind.get("rsi")
+    if rsi is None:
+        return False
+    return rsi >= th.num("RSI_LONG_MIN", 50.0) if long else rsi <= th.num("RSI_SHORT_MAX", 50.0)
 
-    # 11) Локальна структура (простий breakout/breakdown)
+
+def _breakout_ok(ind, long: bool, th: _Thresholds) -> bool:
+    # Нема сирого close у ind -> критерій нейтральний (не валимо оцінку), якщо є хоч 5 барів EMA50
     try:
-        c_series = ind["_series"]["ema50"]  # беремо довжину з наявного ряду
-        n = min(20, len(c_series))
+        return min(20, len(ind["_series"]["ema50"])) >= 5
     except Exception:
-        n = 0
-    breakout_ok = False
-    if n >= 5:
-        # оцінимо за close: (останнє > max за n-1) для LONG, або < min для SHORT
-        # якщо нема close у ind, витягнемо з price_rel_ema50 та ema50 як приблизну проксі
-        breakout_ok = True  # за замовчуванням
-    # Нема сирого close у ind -> пропускаємо критерій як нейтральний (не валимо оцінку)
-    # Щоб зробити критерій активним, треба передавати df в autopost (що ми і робимо).
-    if breakout_ok:
-        passed += 1
-    else:
-        reasons.append("no_breakout")
-
-    # 12) Додатковий фільтр стабільності тренду: |ema50 - ema200| / price >= eps
+        return False
+
+
+def _sep_ok(ind, long: bool, th: _Thresholds) -> bool:
+    # Додатковий фільтр стабільності тренду: |ema50 - ema200| / price >= eps
+    ema50, ema200 = ind.get("ema50"), ind.get("ema200")
     try:
         price = ind["_series"]["ema50"][-1]  # проксі
     except Exception:
         price = (ema50 or 0.0) if ema50 else 1.0
-    sep = None
-    if ema50 is not None and ema200 is not None and price:
-        sep = abs(ema50 - ema200) / abs(price)
-    if sep is not None and sep >= 1e-4:
-        passed += 1
-    else:
-        reasons.append("weak_sep")
+    return ema50 is not None and ema200 is not None and bool(price) and abs(ema50 - ema200) / abs(price) >= 1e-4
+
 
+# (тег відмови, поля ind, перевірка) — порядок тут = порядок reasons у відповіді
+_CRITERIA: List[Tuple[str, Tuple[str, ...], Callable[[Any, bool, _Thresholds], Any]]] = [
+    # 1) Тренд (EMA50 vs EMA200)
+    ("weak_trend", ("ema50", "ema200"), _trend_ok),
+    # 2) Мін. волатильність (ATR / Close)
+    ("low_atr", ("atr_pct",), lambda i, lg, th: i.get("atr_pct") is not None and i["atr_pct"] >= th.num("ATR_MIN", 0.004)),
+    # 3) RSI по напрямку
+    ("rsi_fail", ("rsi",), _rsi_ok),
+    # 4) ADX
+    ("low_adx", ("adx",), lambda i, lg, th: i.get("adx") is not None and i["adx"] >= th.num("ADX_MIN", 18.0)),
+    # 5) Bollinger BW
+    ("narrow_bands", ("bbw",), lambda i, lg, th: i.get("bbw") is not None and i["bbw"] >= th.num("BBW_MIN", 0.015)),
+    # 6) Відносний обсяг
+    ("low_volume", ("rel_vol",), lambda i, lg, th: i.get("rel_vol") is not None and i["rel_vol"] >= th.num("VOL_REL_MIN", 1.2)),
+    # 7) Відстань до VWAP (у плані MIN — не менше)
+    ("vwap_too_close", ("vwap_dist",),
+     lambda i, lg, th: i.get("vwap_dist") is not None and i["vwap_dist"] >= th.num("VWAP_DIST_MIN", 0.0015)),
+    # 8) Нахил EMA50 (у бік напряму)
+    ("ema50_flat", ("ema50_slope",), lambda i, lg, th: _directional(i.get("ema50_slope"), lg)),
+    # 9) Ціна відносно EMA50 (у бік напряму)
+    ("price_vs_ema50", ("price_rel_ema50",), lambda i, lg, th: _directional(i.get("price_rel_ema50"), lg)),
+    # 10) Ціна відносно EMA200 (у бік напряму)
+    ("price_vs_ema200", ("price_rel_ema200",), lambda i, lg, th: _directional(i.get("price_rel_ema200"), lg)),
+    # 11) Локальна структура (простий breakout/breakdown)
+    ("no_breakout", ("ema50",), _breakout_ok),
+    # 12) Розрив EMA50/EMA200
+    ("weak_sep", ("ema50", "ema200"), _sep_ok),
+]
+
+# селективність: скільки разів критерій оцінювали / скільки разів він відсіяв (вікно ~2*_STATS_WINDOW)
+_STATS_WINDOW = 1000
+_GATE_STATS: Dict[str, List[int]] = {reason: [0, 0] for reason, _, _ in _CRITERIA}
+_STATS_LOCK = threading.Lock()
+
+
+def _note(reason: str, ok: bool) -> None:
+    with _STATS_LOCK:
+        st = _GATE_STATS[reason]
+        st[0] += 1
+        st[1] += 0 if ok else 1
+        if st[0] >= 2 * _STATS_WINDOW:
+            # старіння: свіжий ринок важить більше за вчорашній
+            st[0] //= 2
+            st[1] //= 2
+
+
+def _fail_rate(reason: str) -> float:
+    seen, failed = _GATE_STATS[reason]
+    return (failed + 1.0) / (seen + 2.0)
+
+
+def gate_stats() -> Dict[str, Dict[str, float]]:
+    """Телеметрія гейта: по критерію — оцінено / відсіяно / частка відсіву."""
+    with _STATS_LOCK:
+        return {r: {"seen": s, "failed": f, "fail_rate": _fail_rate(r)} for r, (s, f) in _GATE_STATS.items()}
+
+
+def evaluate_gate(ind: Dict[str, Any], direction: str, cfg: Optional[Dict[str, Any]] = None,
+                  min_pass: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Рахуємо 12/12 «проходок». Повертаємо:
+      {
+        "score": int, "total": 12,
+        "reasons": [список тегів, чому не пройшло],
+        "indicators": ind  # echo для телеметрії
+      }
+    Критерії оцінюються в порядку «дешевий і часто відсіює — першим» (вартість рядів, яких ще
+    немає в ind, / частка відсіву). З min_pass оцінка зупиняється, щойно score + решта < min_pass:
+    тоді score < min_pass (як і при повній оцінці), а reasons — лише з оцінених критеріїв.
+    Для LazyIndicators непотрібні індикатори так і не рахуються.
+    """
+    total = len(_CRITERIA)
+
+    if not ind.get("ok", False):
+        return {"score": 0, "total": total, "reasons": [ind.get("reason", "ind_failed")], "indicators": ind}
+
+    dir_long = str(direction or "LONG").upper() == "LONG"
+    th = _Thresholds(cfg)
+    lazy = isinstance(ind, LazyIndicators)
+
+    def _rank(i: int) -> Tuple[float, float, int]:
+        reason, fields, _check = _CRITERIA[i]
+        rate = _fail_rate(reason)
+        return ((ind.cost(fields) if lazy else 0.0) / rate, -rate, i)
+
+    pending = list(range(total))
+    failed: List[int] = []
+    passed = 0
+    while pending:
+        if min_pass is not None and passed + len(pending) < min_pass:
+            break
+        i = min(pending, key=_rank)
+        pending.remove(i)
+        reason, _fields, check = _CRITERIA[i]
+        ok = bool(check(ind, dir_long, th))
+        _note(reason, ok)
+        if ok:
+            passed += 1
+        else:
+            failed.append(i)
+
+    get = ind.peek if lazy else ind.get
+    echo = {k: get(k) for k in ("ema50", "ema200", "atr_entry", "atr_pct", "rsi", "adx", "bbw", "rel_vol",
+                                 "vwap", "vwap_dist", "ema50_slope", "price_rel_ema50", "price_rel_ema200")}
+    trend_ok = _trend_ok(echo, dir_long, th)
     return {
         "score": int(passed),
         "total": int(total),
-        "reasons": reasons if passed < total else [],
-        "indicators": {
-            "trend_ok": bool(trend_ok) if trend_ok is not None else None,
-            "ema50": ema50, "ema200": ema200,
-            "atr_entry": ind.get("atr_entry"),
-            "atr_pct": atr_pct,
-            "rsi": rsi, "adx": adx, "bbw": bbw,
-            "rel_vol": rel_vol,
-            "vwap": ind.get("vwap"), "vwap_dist": vwap_dist,
-            "ema50_slope": ema50_slope,
-            "price_rel_ema50": pr_ema50, "price_rel_ema200": pr_ema200,
-        },
+        "reasons": [_CRITERIA[i][0] for i in sorted(failed)],
+        "evaluated": total - len(pending),
+        "indicators": {"trend_ok": bool(trend_ok) if trend_ok is not None else None, **echo},
     }
 
 
@@ -4,7 +4,7 @@ import os
 import json
 import logging
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional, Set, Tuple
+from typing import Any, Dict, List, Optional
 
 import asyncio
 import math
@@ -17,18 +17,32 @@ from utils.settings import get_setting
 from utils.db import get_conn
 from core_config import CFG  # ✨ для wall_near_pct
 from utils.user_settings import get_user_settings
+from services.pipeline import Stage, run_pipeline, summary as pipeline_summary
+from telegram_bot.outbox import PRIO_SIGNAL, get_outbox
 
 # 🔹 Мінімальний OB-API для «стін» (фолбеково)
 try:
-    # зроби свій імпорт під свій модуль, якщо відрізняється
-    from market_data.orderbook import get_orderbook  # get_orderbook(symbol, limit=1000)->{"bids":[[p,q],...],"asks":[[p,q],...]}
+    # та сама локальна книга, що й для get_orderbook_metrics — без окремого depth-запиту
+    from market_data.orderbook import aget_book_kernel  # -> BookKernel (numpy-зліпок книги) | None
+    from market_data.book_kernel import BookKernel
 except Exception:
-    get_orderbook = None  # type: ignore[misc]
+    aget_book_kernel = None  # type: ignore[misc]
+    BookKernel = None  # type: ignore[misc,assignment]
 
 try:
-    from services.analyzer_core import compute_indicators, evaluate_gate, compute_rr_metrics  # type: ignore
+    # інкрементальний стан індикаторів (O(1) на бар), коли серію живить WebSocket-стрім
+    from services.indicator_state import closed_indicators, live_indicators
+    from market_data.candles import is_live
+except Exception:
+    closed_indicators = None  # type: ignore[assignment]
+    live_indicators = None  # type: ignore[assignment]
+    is_live = None  # type: ignore[assignment]
+
+try:
+    from services.analyzer_core import compute_indicators, lazy_indicators, evaluate_gate, compute_rr_metrics  # type: ignore
 except Exception:
     compute_indicators = None
+    lazy_indicators = None
     evaluate_gate = None
 
     def compute_rr_metrics(entry: float, sl: float, tp: Optional[float]):
@@ -631,9 +645,21 @@ def _gate_ok(candidate: Dict[str, Any], rr_target: Optional[float]) -> tuple[boo
     }
     direction = candidate.get("direction", "LONG")
     try:
-        indicators = compute_indicators(df, cfg)  # type: ignore[misc]
-        g = evaluate_gate(indicators, direction, cfg)  # type: ignore[misc]
         min_pass = int(get_setting("indicator_min_pass", "8") or 8)
+        sym, tf = candidate.get("symbol"), candidate.get("timeframe")
+        closed_at = candidate.get("closed_at")
+        indicators = None
+        if live_indicators is not None and sym and tf and is_live(sym, tf):
+            # ті самі формули, що й compute_indicators, але без перерахунку всього вікна;
+            # скан за закриттям бару — лише закриті бари (формований щойно відкрився, rel_vol≈0)
+            if closed_at is not None:
+                indicators = closed_indicators(sym, tf, bars=len(df), closed_at=closed_at)
+            else:
+                indicators = live_indicators(sym, tf, bars=len(df))
+        if indicators is None:
+            # ліниво: гейт рахує лише індикатори критеріїв, які встиг оцінити до відсіву
+            indicators = lazy_indicators(df, cfg)  # type: ignore[misc]
+        g = evaluate_gate(indicators, direction, cfg, min_pass=min_pass)  # type: ignore[misc]
         if g.get("score", 0) < min_pass:
             return (False, "low_score")
     except Exception as e:
@@ -644,31 +670,17 @@ def _gate_ok(candidate: Dict[str, Any], rr_target: Optional[float]) -> tuple[boo
 
 # 🔹 Мінімальний помічник для «стін»
 def _best_walls(ob, last_price: float, win_pct: float = 1.0, min_quote_usd: float = 50000):
-    """Повертає найближчу суттєву bid/ask стіну у ±win_pct% від ціни."""
-    if not ob or not ob.get("bids") or not ob.get("asks") or not last_price:
+    """Повертає найближчу суттєву bid/ask стіну у ±win_pct% від ціни (ob — BookKernel або depth-dict)."""
+    if not ob or not last_price or BookKernel is None:
         return None, None
-    lo, hi = last_price * (1 - win_pct / 100), last_price * (1 + win_pct / 100)
-
-    def pick(side: str):
-        cand = []
-        for p, q in ob.get(side) or []:
-            try:
-                p, q = float(p), float(q)
-            except Exception:
-                continue
-            if not (lo <= p <= hi):
-                continue
-            quote = p * q
-            if quote >= min_quote_usd:
-                dist = abs(p - last_price)
-                cand.append((dist, p, q, quote))
-        if not cand:
-            return None
-        cand.sort(key=lambda x: x[0])
-        _d, p, q, quote = cand[0]
-        return {"price": p, "qty": q, "quote": quote}
-
-    return pick("bids"), pick("asks")
+    if isinstance(ob, dict):
+        if not ob.get("bids") or not ob.get("asks"):
+            return None, None
+        ob = BookKernel.from_depth(ob)
+    return (
+        ob.closest_level("bids", last_price, win_pct, min_quote_usd),
+        ob.closest_level("asks", last_price, win_pct, min_quote_usd),
+    )
 
 
 # ───── Форматер повідомлення (панель + Walls/Imbalance) ─────
@@ -784,313 +796,412 @@ def _parse_rr_from_reasons(reasons) -> Optional[float]:
     return None
 
 
-# ───── Основний цикл автопосту ─────
-async def run_autopost_once(application=None) -> List[Dict[str, Any]]:
-    """
-    Якщо application передано (telegram.ext.Application), функція САМА відправить повідомлення у чат
-    з клавіатурою, включно з кнопкою «📘 Гайд до цього сигналу».
-    Якщо application=None — просто поверне список prepared повідомлень для зовнішньої відправки.
-    """
-    try:
-        from services.autopost_sources import collect_autopost_candidates  # type: ignore
-        candidates = collect_autopost_candidates()
-    except Exception:
-        log.info("[autopost] no autopost_sources.collect_autopost_candidates(), nothing to send")
-        return []
-    if not candidates:
-        return []
+# ───── Основний цикл автопосту: конвеєр стадій (services.pipeline) ─────
+# collect → filter (RR/гейт, дешево) → dedup (БД) → enrich (панель/quality + стакан) → reserve (+текст)
+#         → [select: quality top-k] → persist → dispatch
+# Кожна стадія — свої воркери; між стадіями обмежені черги, тож дорогий стакан тягнемо лише для
+# кандидатів, що пройшли дешеві фільтри, і для кількох одночасно.
+_STAGE_WORKERS = {"filter": 4, "dedup": 2, "enrich": 8, "reserve": 1, "persist": 1, "dispatch": 1}
+_LAST_STATS: Dict[str, Dict[str, Any]] = {}
 
-    default_chat = "-1002587329237"
-    user_id = "-1002587329237"
-    dedup_sec = int(get_setting("dedup_window_sec", "90") or 90)
 
-    # перемикач панелі
+def _run_cfg() -> Dict[str, Any]:
+    """Налаштування одного проходу (читаються один раз, у потоці — get_setting ходить у SQLite)."""
     preset = (get_setting("indicator_preset", os.getenv("INDICATOR_PRESET", "")) or "").lower()
-    want_panel = (preset == "preset3") or (str(get_setting("autopost_panel_verbose", "false")).lower() == "true")
+    verbose = str(get_setting("autopost_panel_verbose", "false")).lower() == "true"
+    run = {
+        "default_chat": "-1002587329237",
+        "user_id": "-1002587329237",
+        "dedup_sec": int(get_setting("dedup_window_sec", "90") or 90),
+        # перемикач панелі
+        "want_panel": (preset == "preset3") or verbose,
+        # quality налаштування
+        "quality_on": str(get_setting("quality_select_enabled", "false")).lower() == "true",
+        "quality_min": float(get_setting("quality_min", "50") or 50.0),
+        "quality_topk": int(get_setting("quality_top_k", "3") or 3),
+        "ob_on": is_ob_enabled(),
+        "queue_size": int(get_setting("autopost_queue_size", "16") or 16),
+        "workers": {k: int(get_setting(f"autopost_workers_{k}", str(v)) or v) for k, v in _STAGE_WORKERS.items()},
+        # in-run dedup (клон-кандидати в одному проході)
+        "seen": set(),
+        "deliveries": [],
+    }
+    log.debug("[autopost] want_panel=%s preset=%s verbose=%s", run["want_panel"], preset, verbose)
+    return run
+
+
+def _cheap_filters(item: Dict[str, Any], run: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """RR + гейт + персональний поріг RR (CPU/SQLite, без мережі)."""
+    c = item["c"]
+    symbol, timeframe, direction = item["symbol"], item["timeframe"], item["direction"]
+    entry, sl, tp = item["entry"], item["sl"], item["tp"]
+
+    # RR + gate (внутрішній мінімум для валідної ідеї)
+    rr_m = compute_rr_metrics(entry, sl, tp)
+    rr_t = rr_m.get("rr_target")
+    ok, reason = _gate_ok(c, rr_t)
+    if not ok:
+        log.info("[autopost] SKIP %s/%s: %s", symbol, timeframe, reason)
+        return None
 
-    log.debug("[autopost] want_panel=%s preset=%s verbose=%s", want_panel, preset, str(get_setting("autopost_panel_verbose", "false")))
+    # >>> SAFE RR: персональний поріг автопосту (автономний від gate)
+    rr_num = _compute_rr_num(
+        direction,
+        _safe_float(entry) if _safe_float(entry) is not None else math.nan,
+        _safe_float(sl) if _safe_float(sl) is not None else math.nan,
+        _safe_float(tp) if _safe_float(tp) is not None else math.nan,
+    )
 
-    # quality налаштування
-    quality_on = str(get_setting("quality_select_enabled", "false")).lower() == "true"
-    quality_min = float(get_setting("quality_min", "50") or 50.0)
-    quality_topk = int(get_setting("quality_top_k", "3") or 3)
+    user_id = run["user_id"]
+    us = get_user_settings(user_id) if user_id else {}
+    rr_min = float(
+        (us.get("autopost_rr") if isinstance(us, dict) else None)
+        or (us.get("rr_threshold") if isinstance(us, dict) else None)
+        or CFG.get("rr_threshold", 1.5)
+    )
+
+    if (rr_num is None) or (rr_num < rr_min):
+        log.info("[autopost] SKIP %s/%s: rr_num=%s < rr_min=%.2f",
+                 symbol, timeframe, ("None" if rr_num is None else f"{rr_num:.2f}"), rr_min)
+        return None
+    item["rr_t"] = rr_t
+    return item
+
+
+async def _st_filter(c: Dict[str, Any], run: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    symbol = str(c["symbol"]).upper()
+    timeframe = str(c.get("timeframe", "1h")).lower()
+    tp = c.get("tp")
+    item = {
+        "c": c,
+        "symbol": symbol,
+        "direction": str(c.get("direction", "LONG")).upper(),
+        "timeframe": timeframe,
+        "entry": float(c["entry"]),
+        "sl": float(c["sl"]),
+        "tp": float(tp) if tp is not None else None,
+        "chat_id": c.get("chat_id") or run["default_chat"],
+    }
+    if not item["chat_id"]:
+        log.warning("[autopost] skip %s/%s: chat_id is empty", symbol, timeframe)
+        return None
 
-    prepared: List[Dict[str, Any]] = []
+    # in-run ключ (на event loop — перевірка і додавання атомарні між воркерами)
+    key = (symbol, timeframe)
+    if key in run["seen"]:
+        log.info("[autopost] in-run dedup %s/%s — skip", symbol, timeframe)
+        return None
+    run["seen"].add(key)
+    return await asyncio.to_thread(_cheap_filters, item, run)
 
-    # in-run dedup (клон-кандидати в одному проході)
-    seen_keys: Set[Tuple[str, str]] = set()
 
+def _recent(item: Dict[str, Any], run: Dict[str, Any]) -> bool:
     with get_conn() as conn:
-        for c in candidates:
+        return _seen_recently(conn, run["user_id"], item["symbol"], item["timeframe"], window_sec=run["dedup_sec"])
+
+
+async def _st_dedup(item: Dict[str, Any], run: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    # дедуп по БД (вікно)
+    if await asyncio.to_thread(_recent, item, run):
+        log.info("[autopost] dedup_recent %s/%s — skip", item["symbol"], item["timeframe"])
+        return None
+    return item
+
+
+def _local_enrich(item: Dict[str, Any], run: Dict[str, Any]) -> Dict[str, Any]:
+    """Панель preset3 і quality — з уже завантажених свічок (CPU)."""
+    c = item["c"]
+    symbol, timeframe, direction, entry = item["symbol"], item["timeframe"], item["direction"], item["entry"]
+
+    # індикатори (мінімум для компактного блоку)
+    item["ind_src"] = c.get("ind")
+    ind_sum = item["ind_sum"] = _ind_summary(direction, entry, item["ind_src"])
+
+    # панель preset3
+    panel_text = None
+    df = c.get("df")
+    if run["want_panel"]:
+        try:
+            if df is None or (hasattr(df, "__len__") and len(df) < 30):
+                log.debug("[autopost] no/short df for %s/%s: df=%s", symbol, timeframe, (type(df).__name__ if df is not None else None))
+            panel_text = _build_preset3_panel(df)
+            if not panel_text:
+                panel_text = _build_panel_lite(entry, ind_sum)  # фолбек
+        except Exception as e:
+            log.debug("[autopost] panel build failed for %s/%s: %s", symbol, timeframe, e)
+            panel_text = _build_panel_lite(entry, ind_sum)
+    item["panel"] = panel_text
+
+    # quality (basic)
+    item["qscore"], item["qtags"] = None, None
+    rr_est = _parse_rr_from_reasons(c.get("reasons")) or item["rr_t"]
+    if run["quality_on"]:
+        item["qscore"], item["qtags"] = _qscore_basic(direction, rr_est, df)
+    return item
+
+
+async def _ob_metrics(symbol: str) -> Optional[Dict[str, Any]]:
+    try:
+        return await get_orderbook_metrics(symbol)  # {imbalance, support_wall, resistance_wall}
+    except Exception:
+        return None
+
+
+async def _ob_walls(item: Dict[str, Any]) -> Optional[List[str]]:
+    """🔹 Мінімальний OrderBook: bid/ask «стіни»."""
+    if aget_book_kernel is None:
+        return None
+    try:
+        raw_ob = await aget_book_kernel(item["symbol"])
+        last_px = item["entry"]
+        df = item["c"].get("df")
+        if (not last_px) and df is not None:
             try:
-                symbol = str(c["symbol"]).upper()
-                direction = str(c.get("direction", "LONG")).upper()
-                timeframe = str(c.get("timeframe", "1h")).lower()
-                entry = float(c["entry"])
-                sl = float(c["sl"])
-                tp = c.get("tp")
-                tp = float(tp) if tp is not None else None
-                chat_id = c.get("chat_id") or default_chat
-                if not chat_id:
-                    log.warning("[autopost] skip %s/%s: chat_id is empty", symbol, timeframe)
-                    continue
-
-                # in-run ключ
-                key = (symbol, timeframe)
-                if key in seen_keys:
-                    log.info("[autopost] in-run dedup %s/%s — skip", symbol, timeframe)
-                    continue
-                seen_keys.add(key)
-
-                # дедуп по БД (вікно)
-                if _seen_recently(conn, user_id, symbol, timeframe, window_sec=dedup_sec):
-                    log.info("[autopost] dedup_recent %s/%s — skip", symbol, timeframe)
-                    continue
-
-                # RR + gate (внутрішній мінімум для валідної ідеї)
-                rr_m = compute_rr_metrics(entry, sl, tp)
-                rr_t = rr_m.get("rr_target")
-                ok, reason = _gate_ok(c, rr_t)
-                if not ok:
-                    log.info("[autopost] SKIP %s/%s: %s", symbol, timeframe, reason)
-                    continue
-
-                # >>> SAFE RR: персональний поріг автопосту (автономний від gate)
-                rr_num = _compute_rr_num(
-                    direction,
-                    _safe_float(entry) if _safe_float(entry) is not None else math.nan,
-                    _safe_float(sl) if _safe_float(sl) is not None else math.nan,
-                    _safe_float(tp) if _safe_float(tp) is not None else math.nan,
-                )
+                last_px = float(df["close"].iloc[-1])
+            except Exception:
+                pass
+        bid_wall, ask_wall = _best_walls(
+            raw_ob,
+            last_price=last_px,
+            win_pct=float(CFG.get("orderbook_window_pct", 1.0)),
+            min_quote_usd=float(CFG.get("orderbook_min_quote_usd", 50000)),
+        )
+        lines = []
+        if bid_wall:
+            lines.append(f"🧱 Bid wall: {bid_wall['price']:.2f} ({bid_wall['quote']:.0f} USDT)")
+        if ask_wall:
+            lines.append(f"🧱 Ask wall: {ask_wall['price']:.2f} ({ask_wall['quote']:.0f} USDT)")
+        return lines or None
+    except Exception as e:
+        log.warning("orderbook walls failed: %s", e)
+        return None
 
-                us = get_user_settings(user_id) if user_id else {}
-                rr_min = float(
-                    (us.get("autopost_rr") if isinstance(us, dict) else None)
-                    or (us.get("rr_threshold") if isinstance(us, dict) else None)
-                    or CFG.get("rr_threshold", 1.5)
-                )
 
-                if (rr_num is None) or (rr_num < rr_min):
-                    log.info("[autopost] SKIP %s/%s: rr_num=%s < rr_min=%.2f",
-                             symbol, timeframe, ("None" if rr_num is None else f"{rr_num:.2f}"), rr_min)
-                    continue
-
-                # індикатори (мінімум для компактного блоку)
-                ind_src: Optional[Dict[str, Any]] = c.get("ind")
-                ind_sum = _ind_summary(direction, entry, ind_src)
-
-                # панель preset3
-                panel_text = None
-                df = c.get("df")
-                if want_panel:
-                    try:
-                        if df is None or (hasattr(df, "__len__") and len(df) < 30):
-                            log.debug("[autopost] no/short df for %s/%s: df=%s", symbol, timeframe, (type(df).__name__ if df is not None else None))
-                        panel_text = _build_preset3_panel(df)
-                        if not panel_text:
-                            panel_text = _build_panel_lite(entry, ind_sum)  # фолбек
-                    except Exception as e:
-                        log.debug("[autopost] panel build failed for %s/%s: %s", symbol, timeframe, e)
-                        panel_text = _build_panel_lite(entry, ind_sum)
-
-                # quality (basic)
-                qscore: Optional[int] = None
-                qtags: Optional[List[str]] = None
-                rr_est = _parse_rr_from_reasons(c.get("reasons")) or rr_t
-                if quality_on:
-                    qs, tags = _qscore_basic(direction, rr_est, df)
-                    qscore, qtags = qs, tags
-
-                # >>> ДОДАНО: логіка стакану ПІСЛЯ розрахунку індикаторів/rr/quality
-                ob = None
-                if is_ob_enabled():
-                    try:
-                        ob = await get_orderbook_metrics(symbol)  # {imbalance, support_wall, resistance_wall}
-                        if ob:
-                            if qscore is not None:
-                                if direction == "LONG" and ob.get("support_wall"):
-                                    qscore += 8
-                                if direction == "SHORT" and ob.get("resistance_wall"):
-                                    qscore += 8
-                            near_res = ob.get("resistance_wall")
-                            near_sup = ob.get("support_wall")
-                            wall_near_pct = float(CFG.get("wall_near_pct", 1.0) or 1.0)
-                            if direction == "LONG" and near_res and tp:
-                                try:
-                                    if abs((float(near_res["price"]) - float(entry)) / float(entry)) * 100 <= wall_near_pct:
-                                        if qscore is not None:
-                                            qscore -= 6
-                                        if rr_t:
-                                            rr_t = float(rr_t) * 0.95
-                                except Exception:
-                                    pass
-                            if direction == "SHORT" and near_sup and tp:
-                                try:
-                                    if abs((float(near_sup["price"]) - float(entry)) / float(entry)) * 100 <= wall_near_pct:
-                                        if qscore is not None:
-                                            qscore -= 6
-                                        if rr_t:
-                                            rr_t = float(rr_t) * 0.95
-                                except Exception:
-                                    pass
-                    except Exception:
-                        pass
-
-                # 🔹 Мінімальний OrderBook: bid/ask «стіни»
-                ob_extra_lines: Optional[List[str]] = None
-                try:
-                    if get_orderbook is not None:
-                        raw_ob = get_orderbook(symbol, limit=int(CFG.get("orderbook_depth_limit", 1000)))
-                        last_px = entry
-                        if (not last_px) and df is not None:
-                            try:
-                                last_px = float(df["close"].iloc[-1])
-                            except Exception:
-                                pass
-                        bid_wall, ask_wall = _best_walls(
-                            raw_ob,
-                            last_price=last_px,
-                            win_pct=float(CFG.get("orderbook_window_pct", 1.0)),
-                            min_quote_usd=float(CFG.get("orderbook_min_quote_usd", 50000)),
-                        )
-                        lines = []
-                        if bid_wall:
-                            lines.append(f"🧱 Bid wall: {bid_wall['price']:.2f} ({bid_wall['quote']:.0f} USDT)")
-                        if ask_wall:
-                            lines.append(f"🧱 Ask wall: {ask_wall['price']:.2f} ({ask_wall['quote']:.0f} USDT)")
-                        if lines:
-                            ob_extra_lines = lines
-                except Exception as e:
-                    log.warning("orderbook walls failed: %s", e)
-
-                # 🔐 Конкурентно-безпечний резерв у БД перед додаванням у prepared/відправкою
-                if not _reserve_autopost_send(
-                    user_id=user_id,
-                    symbol=symbol,
-                    timeframe=timeframe,
-                    rr=rr_t,
-                    window_sec=dedup_sec,
-                ):
-                    log.info("[autopost] race-dedup %s/%s — already reserved, skip", symbol, timeframe)
-                    continue
-
-                # текст
-                text = _format_message_text(
-                    symbol,
-                    direction,
-                    timeframe,
-                    entry,
-                    sl,
-                    tp,
-                    rr_t,
-                    ind_sum,
-                    gate_score=c.get("gate_score"),
-                    gate_total=c.get("gate_total"),
-                    panel=panel_text,
-                    reasons=c.get("reasons"),
-                    qscore=(qscore if quality_on else None),
-                    qtags=(qtags if quality_on else None),
-                    ob=ob,  # ✨ розширені метрики (optional)
-                    ob_extra_lines=ob_extra_lines,  # 🔹 мінімальні «стіни»
-                )
+def _apply_ob(item: Dict[str, Any], ob: Dict[str, Any]) -> None:
+    """Стакан коригує quality і RR: стіна в бік угоди — плюс, стіна поруч проти угоди — мінус."""
+    direction, entry, tp = item["direction"], item["entry"], item["tp"]
+    qscore, rr_t = item["qscore"], item["rr_t"]
+    if qscore is not None:
+        if direction == "LONG" and ob.get("support_wall"):
+            qscore += 8
+        if direction == "SHORT" and ob.get("resistance_wall"):
+            qscore += 8
+    near = ob.get("resistance_wall") if direction == "LONG" else ob.get("support_wall")
+    wall_near_pct = float(CFG.get("wall_near_pct", 1.0) or 1.0)
+    if near and tp:
+        try:
+            if abs((float(near["price"]) - float(entry)) / float(entry)) * 100 <= wall_near_pct:
+                if qscore is not None:
+                    qscore -= 6
+                if rr_t:
+                    rr_t = float(rr_t) * 0.95
+        except Exception:
+            pass
+    item["qscore"], item["rr_t"] = qscore, rr_t
+
+
+async def _st_enrich(item: Dict[str, Any], run: Dict[str, Any]) -> Dict[str, Any]:
+    item = await asyncio.to_thread(_local_enrich, item, run)
+    item["ob"], item["ob_extra_lines"] = None, None
+    if run["ob_on"]:
+        # метрики і «стіни» — з однієї локальної книги; обидва запити паралельно
+        ob, walls = await asyncio.gather(_ob_metrics(item["symbol"]), _ob_walls(item))
+        if ob:
+            _apply_ob(item, ob)
+        item["ob"], item["ob_extra_lines"] = ob, walls
+    return item
+
+
+def _build_message(item: Dict[str, Any], run: Dict[str, Any]) -> Dict[str, Any]:
+    c = item["c"]
+    symbol, direction, timeframe = item["symbol"], item["direction"], item["timeframe"]
+    quality_on = run["quality_on"]
+    # текст
+    text = _format_message_text(
+        symbol,
+        direction,
+        timeframe,
+        item["entry"],
+        item["sl"],
+        item["tp"],
+        item["rr_t"],
+        item["ind_sum"],
+        gate_score=c.get("gate_score"),
+        gate_total=c.get("gate_total"),
+        panel=item["panel"],
+        reasons=c.get("reasons"),
+        qscore=(item["qscore"] if quality_on else None),
+        qtags=(item["qtags"] if quality_on else None),
+        ob=item["ob"],  # ✨ розширені метрики (optional)
+        ob_extra_lines=item["ob_extra_lines"],  # 🔹 мінімальні «стіни»
+    )
+
+    # готуємо payload
+    msg: Dict[str, Any] = {
+        "chat_id": item["chat_id"],
+        "text": text,
+        "parse_mode": None,
+        "disable_web_page_preview": True,
+        "symbol": symbol,
+        "direction": direction,
+        "timeframe": timeframe,
+        "entry": item["entry"],
+        "sl": item["sl"],
+        "tp": item["tp"],
+        "rr": item["rr_t"],
+        "buttons": [
+            [
+                {"type": "url", "text": "📊 Графік (TV)", "url": f"https://www.tradingview.com/chart/?symbol=BINANCE:{symbol}"},
+            ],
+            [
+                {"type": "cb", "text": "✅ Відкрити як трейд", "data": f"panel:open_trade:{symbol}:{timeframe}:{direction}"},
+                {"type": "cb", "text": "🚫 Ігнор", "data": "panel:ignore"},
+            ],
+            [
+                {"type": "cb", "text": "📘 Гайд до цього сигналу", "data": "guide:signal"},
+            ],
+        ],
+        "ind": item["ind_src"],
+        "gate_score": c.get("gate_score"),
+        "gate_total": c.get("gate_total"),
+        "reasons": c.get("reasons"),
+        "qscore": (item["qscore"] if quality_on else None),
+        "qtags": (item["qtags"] if quality_on else None),
+        "ob": item["ob"],  # ✨ лог OB
+    }
+    if "df" in c:
+        msg["df"] = c["df"]
+    return msg
+
+
+async def _st_reserve(item: Dict[str, Any], run: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    # 🔐 Конкурентно-безпечний резерв у БД перед додаванням у prepared/відправкою
+    reserved = await asyncio.to_thread(
+        _reserve_autopost_send,
+        user_id=run["user_id"],
+        symbol=item["symbol"],
+        timeframe=item["timeframe"],
+        rr=item["rr_t"],
+        window_sec=run["dedup_sec"],
+    )
+    if not reserved:
+        log.info("[autopost] race-dedup %s/%s — already reserved, skip", item["symbol"], item["timeframe"])
+        return None
+    return _build_message(item, run)
 
-                # готуємо payload
-                msg: Dict[str, Any] = {
-                    "chat_id": chat_id,
-                    "text": text,
-                    "parse_mode": None,
-                    "disable_web_page_preview": True,
-                    "symbol": symbol,
-                    "direction": direction,
-                    "timeframe": timeframe,
-                    "entry": entry,
-                    "sl": sl,
-                    "tp": tp,
-                    "rr": rr_t,
-                    "buttons": [
-                        [
-                            {"type": "url", "text": "📊 Графік (TV)", "url": f"https://www.tradingview.com/chart/?symbol=BINANCE:{symbol}"},
-                        ],
-                        [
-                            {"type": "cb", "text": "✅ Відкрити як трейд", "data": f"panel:open_trade:{symbol}:{timeframe}:{direction}"},
-                            {"type": "cb", "text": "🚫 Ігнор", "data": "panel:ignore"},
-                        ],
-                        [
-                            {"type": "cb", "text": "📘 Гайд до цього сигналу", "data": "guide:signal"},
-                        ],
-                    ],
-                    "ind": ind_src,
-                    "gate_score": c.get("gate_score"),
-                    "gate_total": c.get("gate_total"),
-                    "reasons": c.get("reasons"),
-                    "qscore": (qscore if quality_on else None),
-                    "qtags": (qtags if quality_on else None),
-                    "ob": ob,  # ✨ лог OB
-                }
-                if "df" in c:
-                    msg["df"] = c["df"]
-
-                prepared.append(msg)
-
-            except Exception as e:
-                log.warning("[autopost] bad candidate skipped: %s", e)
 
+async def _st_select(prepared: List[Dict[str, Any]], run: Dict[str, Any]) -> List[Dict[str, Any]]:
     # quality фільтрація (після збирання)
-    if quality_on and prepared:
-        keep = [m for m in prepared if (m.get("qscore") or 0) >= quality_min]
-        keep.sort(key=lambda m: (m.get("qscore") or 0), reverse=True)
-        prepared = keep[:quality_topk]
-
-    # автозбереження сигналів для KPI
-    if prepared:
-        with get_conn() as conn:
-            cur = conn.cursor()
-            for m in prepared:
-                try:
-                    _persist_signal(cur, m)
-                except Exception as e:
-                    log.warning("[autopost] persist_signal fail: %s", e)
-            conn.commit()
+    keep = [m for m in prepared if (m.get("qscore") or 0) >= run["quality_min"]]
+    keep.sort(key=lambda m: (m.get("qscore") or 0), reverse=True)
+    return keep[:run["quality_topk"]]
 
-    log.info("[autopost] prepared %d message(s)", len(prepared))
 
-    # >>> Якщо application передано — відправляємо прямо тут з кнопкою «Гайд»
-    if application is not None and hasattr(application, "bot") and prepared:
-        bot = application.bot
-        for m in prepared:
-            try:
-                # будуємо клавіатуру з опису buttons
-                rows: List[List[InlineKeyboardButton]] = []
-                for row in m.get("buttons", []):
-                    btn_row: List[InlineKeyboardButton] = []
-                    for btn in row:
-                        if btn.get("type") == "url":
-                            btn_row.append(InlineKeyboardButton(btn.get("text", "Open"), url=btn.get("url")))
-                        elif btn.get("type") == "cb":
-                            btn_row.append(InlineKeyboardButton(btn.get("text", "…"), callback_data=btn.get("data")))
-                    if btn_row:
-                        rows.append(btn_row)
-
-                # гарантуємо «📘 Гайд» (на випадок модифікацій зверху)
-                has_guide = any(any((isinstance(b, InlineKeyboardButton) and b.callback_data == "guide:signal") for b in r) for r in rows)
-                if not has_guide:
-                    rows.append([InlineKeyboardButton("📘 Гайд до цього сигналу", callback_data="guide:signal")])
-
-                kb = InlineKeyboardMarkup(rows)
-                await bot.send_message(chat_id=m["chat_id"], text=m["text"], reply_markup=kb, disable_web_page_preview=True)
-
-                # після успішної відправки — завершуємо резерв (ставимо ts_sent)
-                try:
-                    _complete_autopost_send(
-                        user_id=(get_setting("autopost_user_id", "default") or "default"),
-                        symbol=m["symbol"],
-                        timeframe=m["timeframe"],
-                        rr=(m.get("rr") or 0.0),
-                    )
-                except Exception:
-                    pass
+def _persist_one(msg: Dict[str, Any]) -> None:
+    with get_conn() as conn:
+        _persist_signal(conn.cursor(), msg)
+        conn.commit()
+
 
-            except Exception as e:
-                log.warning("[autopost] send fail: %s", e)
+async def _st_persist(msg: Dict[str, Any], run: Dict[str, Any]) -> Dict[str, Any]:
+    # автозбереження сигналів для KPI (помилка збереження не блокує відправку)
+    try:
+        await asyncio.to_thread(_persist_one, msg)
+    except Exception as e:
+        log.warning("[autopost] persist_signal fail: %s", e)
+    return msg
+
+
+def _keyboard(m: Dict[str, Any]) -> InlineKeyboardMarkup:
+    # будуємо клавіатуру з опису buttons
+    rows: List[List[InlineKeyboardButton]] = []
+    for row in m.get("buttons", []):
+        btn_row: List[InlineKeyboardButton] = []
+        for btn in row:
+            if btn.get("type") == "url":
+                btn_row.append(InlineKeyboardButton(btn.get("text", "Open"), url=btn.get("url")))
+            elif btn.get("type") == "cb":
+                btn_row.append(InlineKeyboardButton(btn.get("text", "…"), callback_data=btn.get("data")))
+        if btn_row:
+            rows.append(btn_row)
+
+    # гарантуємо «📘 Гайд» (на випадок модифікацій зверху)
+    has_guide = any(any((isinstance(b, InlineKeyboardButton) and b.callback_data == "guide:signal") for b in r) for r in rows)
+    if not has_guide:
+        rows.append([InlineKeyboardButton("📘 Гайд до цього сигналу", callback_data="guide:signal")])
+    return InlineKeyboardMarkup(rows)
+
+
+def _on_delivered(m: Dict[str, Any]):
+    async def _ack(d) -> None:
+        if not d.ok:
+            log.warning("[autopost] send fail %s %s: %s", m.get("symbol"), m.get("timeframe"), d.error)
+            return
+        # підтвердження доставки — завершуємо резерв (ставимо ts_sent)
+        try:
+            await asyncio.to_thread(
+                _complete_autopost_send,
+                user_id=(get_setting("autopost_user_id", "default") or "default"),
+                symbol=m["symbol"],
+                timeframe=m["timeframe"],
+                rr=(m.get("rr") or 0.0),
+            )
+        except Exception:
+            pass
+    return _ack
+
+
+async def _st_dispatch(m: Dict[str, Any], outbox, run: Dict[str, Any]) -> Dict[str, Any]:
+    # не чекаємо доставки: Outbox шле конкурентно в межах лімітів TG, ts_sent ставить on_ack
+    run["deliveries"].append(outbox.send(
+        m["chat_id"], m["text"], priority=PRIO_SIGNAL, on_ack=_on_delivered(m),
+        reply_markup=_keyboard(m), disable_web_page_preview=True,
+    ))
+    return m
 
+
+def last_run_stats() -> Dict[str, Dict[str, Any]]:
+    """Статистика стадій останнього проходу (скільки зайшло/пройшло, avg/max мс) — для /status і логів."""
+    return dict(_LAST_STATS)
+
+
+async def run_autopost_once(application=None, series: Optional[Dict[str, List[str]]] = None,
+                            closed_at: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Якщо application передано (telegram.ext.Application), функція САМА відправить повідомлення у чат
+    з клавіатурою, включно з кнопкою «📘 Гайд до цього сигналу».
+    Якщо application=None — просто поверне список prepared повідомлень для зовнішньої відправки.
+    series/closed_at — скан лише серій, чий бар щойно закрився (scheduler.bar_close).
+    """
+    try:
+        from services.autopost_sources import iter_autopost_candidates  # type: ignore
+    except Exception:
+        log.info("[autopost] no autopost_sources.iter_autopost_candidates(), nothing to send")
+        return []
+
+    run = await asyncio.to_thread(_run_cfg)
+    w = run["workers"]
+    stages = [
+        Stage("filter", lambda c: _st_filter(c, run), w["filter"]),
+        Stage("dedup", lambda it: _st_dedup(it, run), w["dedup"]),
+        Stage("enrich", lambda it: _st_enrich(it, run), w["enrich"]),
+        Stage("reserve", lambda it: _st_reserve(it, run), w["reserve"]),
+    ]
+    if run["quality_on"]:
+        stages.append(Stage("select", lambda ms: _st_select(ms, run), barrier=True))
+    stages.append(Stage("persist", lambda m: _st_persist(m, run), w["persist"]))
+    # >>> Якщо application передано — відправляємо прямо тут з кнопкою «Гайд»
+    if application is not None and hasattr(application, "bot"):
+        outbox = get_outbox(application.bot)
+        stages.append(Stage("dispatch", lambda m: _st_dispatch(m, outbox, run), w["dispatch"]))
+
+    # символи качаються конкурентно, кандидати йдуть у конвеєр у міру готовності
+    prepared, stats = await run_pipeline(iter_autopost_candidates(series=series, closed_at=closed_at), stages, maxsize=run["queue_size"], name="autopost")
+    if run["deliveries"]:
+        done = await asyncio.gather(*run["deliveries"])
+        log.info("[autopost] delivered %d/%d (max latency %.0fms)", sum(d.ok for d in done), len(done),
+                 max(d.latency_ms for d in done))
+    _LAST_STATS.clear()
+    _LAST_STATS.update({n: s.as_dict() for n, s in stats.items()})
+    log.info("[autopost] prepared %d message(s) | %s", len(prepared), pipeline_summary(stats))
     return prepared
@@ -1,15 +1,21 @@
 # services/autopost_sources.py
 from __future__ import annotations
-import json
+import asyncio
+import logging
 import os
-from typing import Any, Dict, List
-from urllib.request import urlopen
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 import math
+import numpy as np
 import pandas as pd
 from utils.settings import get_setting
+from services.indicator_batch import Panel, build_panel, fetch_columns, from_columns
+from services.indicator_engine import from_frame
+from services import scan_priority
 
-BINANCE_URL = "https://api.binance.com/api/v3/klines"
+log = logging.getLogger("autopost_sources")
 
 # ── helpers: settings/env ─────────────────────────────────────────────────────
 def _gs(key: str, default: str = "") -> str:
@@ -31,68 +37,10 @@ def _gs_int(key: str, default: int) -> int:
     except Exception:
         return default
 
-# ── data ──────────────────────────────────────────────────────────────────────
-def _fetch_klines(symbol: str, interval: str, limit: int = 200) -> pd.DataFrame:
-    url = f"{BINANCE_URL}?symbol={symbol}&interval={interval}&limit={limit}"
-    with urlopen(url) as resp:
-        data = json.loads(resp.read().decode("utf-8"))
-    df = pd.DataFrame(
-        data,
-        columns=[
-            "open_time","open","high","low","close","volume",
-            "close_time","qav","num_trades","taker_base_vol","taker_quote_vol","ignore"
-        ],
-    )
-    df = df[["open_time","open","high","low","close","volume"]].copy()
-    df["ts"] = (df["open_time"] // 1000).astype(int)
-    for col in ["open","high","low","close","volume"]:
-        df[col] = df[col].astype(float)
-    return df[["ts","open","high","low","close","volume"]]
-
-# ── indicators (без сторонніх залежностей) ───────────────────────────────────
-def _ema(series: pd.Series, span: int) -> float:
-    return float(series.ewm(span=span, adjust=False).mean().iloc[-1])
-
-def _rsi14(close: pd.Series) -> float:
-    delta = close.diff()
-    up = delta.clip(lower=0.0)
-    down = (-delta).clip(lower=0.0)
-    gain = up.ewm(alpha=1/14, adjust=False).mean()
-    loss = down.ewm(alpha=1/14, adjust=False).mean()
-    rs = gain / (loss + 1e-12)
-    rsi = 100 - (100 / (1 + rs))
-    return float(rsi.iloc[-1])
-
-def _atr14(high: pd.Series, low: pd.Series, close: pd.Series) -> float:
-    prev_close = close.shift(1)
-    tr = pd.concat([(high - low), (high - prev_close).abs(), (low - prev_close).abs()], axis=1).max(axis=1)
-    atr = tr.ewm(alpha=1/14, adjust=False).mean()
-    return float(atr.iloc[-1])
-
-def _vwap20(high: pd.Series, low: pd.Series, close: pd.Series, vol: pd.Series) -> float:
-    tp = (high + low + close) / 3.0
-    vp = (tp * vol).rolling(20).sum()
-    vv = vol.rolling(20).sum()
-    vwap = vp / vv.replace(0.0, pd.NA)
-    return float(vwap.iloc[-1])
-
-def _bollinger(close: pd.Series, window: int = 20, k: float = 2.0) -> tuple[float, float, float]:
-    sma = close.rolling(window).mean()
-    std = close.rolling(window).std(ddof=0)
-    upper = sma + k * std
-    lower = sma - k * std
-    return float(lower.iloc[-1]), float(sma.iloc[-1]), float(upper.iloc[-1])
-
-def _pivots_prev_candle(high: pd.Series, low: pd.Series, close: pd.Series):
-    """Classic pivots з ПОПЕРЕДНЬОЇ свічки ([-2])"""
-    if len(high) < 2:
-        return None
-    H = float(high.iloc[-2]); L = float(low.iloc[-2]); C = float(close.iloc[-2])
-    P = (H + L + C) / 3.0
-    R1 = 2*P - L; S1 = 2*P - H
-    R2 = P + (H - L); S2 = P - (H - L)
-    R3 = H + 2*(P - L); S3 = L - 2*(H - P)
-    return dict(P=P, R1=R1, R2=R2, R3=R3, S1=S1, S2=S2, S3=S3)
+# ── indicators (канонічний рушій services.indicator_engine / батч indicator_batch) ─
+def _pivots_prev_candle(pivots: Dict[str, Any], i: int):
+    """Classic pivots з ПОПЕРЕДНЬОЇ свічки ([-2]) для рядка i панелі"""
+    return {("P" if k == "pivot" else k.upper()): float(v[i, -1]) for k, v in pivots.items()}
 
 def _swing(high: pd.Series, low: pd.Series, lookback: int = 20) -> tuple[float, float]:
     """Максимум/мінімум за lookback (включно з поточною)."""
@@ -166,39 +114,70 @@ def _pick_tp(entry: float, sl: float, direction: str,
     return tp, min_rr, "fallback:min_rr"
 
 # ── main ─────────────────────────────────────────────────────────────────────
-def collect_autopost_candidates() -> List[Dict[str, Any]]:
+def _params() -> Dict[str, Any]:
+    """Налаштування скану (читаються один раз на прохід)."""
     symbols_raw = _gs("monitored_symbols", "BTCUSDT,ETHUSDT,BNBUSDT,SOLUSDT,XRPUSDT,LTCUSDT,XLMUSDT,ADAUSDT")
-    timeframe   = _gs("analyze_timeframe", "1h")
-    bars        = _gs_int("analyze_bars", 200)
-
-    # ризик/TP параметри
-    min_rr      = _gs_float("autopost_min_rr", _gs_float("min_entry_rr", 1.5))
-    rr_max      = _gs_float("autopost_rr_max", 4.0)
-    stop_mult   = _gs_float("stop_atr_mult", 1.5)
-
-    # гейт-пороги (у відсотках до ціни)
-    atr_min_pct   = _gs_float("autopost_min_atr_pct", 0.0)
-    vwap_min_pct  = _gs_float("vwap_dist_min", 0.0)
-    rsi_long_min  = _gs_float("rsi_long_min", 50.0)
-    rsi_short_max = _gs_float("rsi_short_max", 50.0)
-    swing_lb      = _gs_int("swing_lookback", 20)
-
+    # analyze_timeframe може бути списком через кому ("15m,1h") — кожен TF сканується окремо
+    timeframes = [tf.strip() for tf in _gs("analyze_timeframe", "1h").split(",") if tf.strip()] or ["1h"]
+    return {
+        "symbols":       [s.strip().upper() for s in symbols_raw.split(",") if s.strip()],
+        "timeframes":    timeframes,
+        "timeframe":     timeframes[0],
+        "bars":          _gs_int("analyze_bars", 200),
+        # скільки символів качаємо одночасно (async-скан); ≤ BINANCE_POOL_MAX, щоб не чекати на з'єднання
+        "concurrency":   max(1, _gs_int("autopost_fetch_concurrency", 16)),
+        # адаптивний скан (services.scan_priority): сплячі символи — раз на max_skip проходів
+        "adaptive":      _gs("autopost_adaptive_scan", "false").lower() == "true",
+        "max_skip":      max(1, _gs_int("autopost_scan_max_skip", 8)),
+        "scan_budget":   max(0, _gs_int("autopost_scan_budget", 0)),
+        # ризик/TP параметри
+        "min_rr":        _gs_float("autopost_min_rr", _gs_float("min_entry_rr", 1.5)),
+        "rr_max":        _gs_float("autopost_rr_max", 4.0),
+        "stop_mult":     _gs_float("stop_atr_mult", 1.5),
+        # гейт-пороги (у відсотках до ціни)
+        "atr_min_pct":   _gs_float("autopost_min_atr_pct", 0.0),
+        "vwap_min_pct":  _gs_float("vwap_dist_min", 0.0),
+        "rsi_long_min":  _gs_float("rsi_long_min", 50.0),
+        "rsi_short_max": _gs_float("rsi_short_max", 50.0),
+        "swing_lb":      _gs_int("swing_lookback", 20),
+    }
+
+def _candidates(p: Panel, prm: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Кандидати для всіх символів панелі: індикатори — одним векторним проходом (CPU, без I/O)."""
     out: List[Dict[str, Any]] = []
-    symbols = [s.strip().upper() for s in symbols_raw.split(",") if s.strip()]
-    for sym in symbols:
+    if not len(p):
+        return out
+    timeframe = prm["timeframe"]
+    min_rr, rr_max, stop_mult = prm["min_rr"], prm["rr_max"], prm["stop_mult"]
+    atr_min_pct, vwap_min_pct = prm["atr_min_pct"], prm["vwap_min_pct"]
+    rsi_long_min, rsi_short_max = prm["rsi_long_min"], prm["rsi_short_max"]
+    swing_lb = prm["swing_lb"]
+
+    ema50_v  = p.last("ema", period=50)
+    ema200_v = p.last("ema", period=200)
+    atr_v    = p.last("atr", period=14)
+    rsi_v    = p.last("rsi", period=14)
+    vwap_v   = p.last("vwap", period=20)
+    bands    = p.get("bb", period=20, mult=2.0, ddof=0)
+    pivots   = p.get("pivots", kind="classic")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        atr_pct_v = atr_v / p.bars["close"][:, -1] * 100.0
+    scan_priority.observe_panel(p.symbols, timeframe, atr_pct_v, p.last("rel_volume", period=20))
+    for i, sym in enumerate(p.symbols):
         try:
-            df = _fetch_klines(sym, timeframe, limit=bars)
-            if len(df) < 60:
-                continue
-
-            c = df["close"]; h = df["high"]; l = df["low"]; v = df["volume"]
-            last = float(c.iloc[-1])
-
-            ema50  = _ema(c, 50)
-            ema200 = _ema(c, 200) if len(c) >= 200 else _ema(c, max(50, len(c)//2))
-            atr    = _atr14(h, l, c)
-            rsi    = _rsi14(c)
-            vwap   = _vwap20(h, l, c, v)
+            df = p.to_frame(sym)
+            h = df["high"]; l = df["low"]
+            n = int(p.count[i])
+            last = float(p.bars["close"][i, -1])
+
+            ema50  = float(ema50_v[i])
+            # коротка історія — EMA з меншим періодом (як і раніше), поза батчем
+            ema200 = float(ema200_v[i]) if n >= 200 else from_frame(df).last("ema", period=max(50, n // 2))
+            atr    = float(atr_v[i])
+            rsi    = float(rsi_v[i])
+            vwap   = float(vwap_v[i])
+            if math.isnan(vwap):
+                continue  # 20 барів без обсягу — VWAP невизначений
 
             direction = "LONG" if ema50 >= ema200 else "SHORT"
 
@@ -209,8 +188,8 @@ def collect_autopost_candidates() -> List[Dict[str, Any]]:
             sl = (last - dist) if direction == "LONG" else (last + dist)
 
             # Кандидати таргетів
-            piv = _pivots_prev_candle(h, l, c)
-            bb  = _bollinger(c, 20, 2.0) if len(c) >= 20 else None
+            piv = _pivots_prev_candle(pivots, i)
+            bb  = (float(bands["lower"][i, -1]), float(bands["mid"][i, -1]), float(bands["upper"][i, -1]))
             swing_hi, swing_lo = _swing(h, l, swing_lb)
 
             tp, rr_dyn, src = _pick_tp(
@@ -240,6 +219,9 @@ def collect_autopost_candidates() -> List[Dict[str, Any]]:
             else:
                 reasons.append(("+RSI14" if rsi_ok else "-RSI14") + f" {rsi:.1f}<={int(rsi_short_max)}")
             if rsi_ok: passed += 1
+            # єдине джерело близькості до гейту: повний підрахунок passed/total по всіх критеріях
+            # (лінивий індикаторний гейт у autopost зупиняється на першому провалі — його рахунок неповний)
+            scan_priority.observe_gate(sym, timeframe, passed, total)
 
             out.append({
                 "symbol": sym,
@@ -265,3 +247,101 @@ def collect_autopost_candidates() -> List[Dict[str, Any]]:
             continue
 
     return out
+
+def collect_autopost_candidates() -> List[Dict[str, Any]]:
+    """Синхронний скан (послідовне завантаження) — для потоків / скриптів."""
+    prm = _params()
+    out: List[Dict[str, Any]] = []
+    for tf in prm["timeframes"]:
+        out += _candidates(build_panel(prm["symbols"], tf, prm["bars"], min_bars=60), dict(prm, timeframe=tf))
+    return out
+
+# ── async-скан: конкурентне завантаження, кандидати — в міру готовності ───────
+_POOL: Optional[ThreadPoolExecutor] = None
+_POOL_SIZE = 0
+_POOL_LOCK = threading.Lock()
+
+def _fetch_pool(size: int) -> ThreadPoolExecutor:
+    """Окремий пул під завантаження свічок: розмір = ліміт конкурентності (дефолтний пул asyncio менший)."""
+    global _POOL, _POOL_SIZE
+    with _POOL_LOCK:
+        if _POOL is None or _POOL_SIZE != size:
+            if _POOL is not None:
+                _POOL.shutdown(wait=False)
+            _POOL, _POOL_SIZE = ThreadPoolExecutor(max_workers=size, thread_name_prefix="autopost-fetch"), size
+        return _POOL
+
+def _closed_columns(symbol: str, tf: str, bars: int, min_bars: int, closed_at: int) -> Optional[Dict[str, np.ndarray]]:
+    """
+    Колонки лише ЗАКРИТИХ барів на межі closed_at (ts відкриття < closed_at), не більше bars.
+    Якщо нового (формованого) бару ще не видно — кеш/сховище відстали від закриття: примусовий resync.
+    """
+    col = fetch_columns(symbol, tf, bars + 1, min_bars)
+    if col is not None and int(col["ts"][-1]) < closed_at:
+        try:
+            from market_data.candles import resync
+            resync(symbol, tf, bars + 1)
+        except Exception as e:
+            log.debug("[autopost] resync %s %s failed: %s", symbol, tf, e)
+        col = fetch_columns(symbol, tf, bars + 1, min_bars)
+    if col is None:
+        return None
+    n = int(np.searchsorted(col["ts"], closed_at))
+    if n < max(1, min_bars):
+        return None
+    return {f: a[max(0, n - bars):n] for f, a in col.items()}
+
+async def iter_autopost_candidates(prm: Optional[Dict[str, Any]] = None,
+                                   series: Optional[Dict[str, List[str]]] = None,
+                                   closed_at: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Async-скан: усі символи качаються одночасно (не більше autopost_fetch_concurrency),
+    кожна пачка готових символів одразу йде в панель і в розрахунок (у потоці, поза event loop),
+    кандидати віддаються в порядку готовності. Час скану ≈ найповільніше завантаження, а не сума.
+    series — {tf: [symbols]} замість monitored_symbols × analyze_timeframe (скан за закриттям бару);
+    closed_at — межа щойно закритого бару: рахуємо лише по закритих барах, без формованого.
+    """
+    if prm is None:
+        prm = await asyncio.to_thread(_params)
+    if series is None:
+        series = {tf: prm["symbols"] for tf in prm["timeframes"]}
+    if prm["adaptive"]:
+        series = await asyncio.to_thread(scan_priority.select, series, prm["max_skip"], prm["scan_budget"])
+    bars = prm["bars"]
+    loop = asyncio.get_running_loop()
+    pool = _fetch_pool(prm["concurrency"])
+
+    def _fetch(sym: str, tf: str) -> asyncio.Future:
+        if closed_at is None:
+            return loop.run_in_executor(pool, fetch_columns, sym, tf, bars, 60)
+        return loop.run_in_executor(pool, _closed_columns, sym, tf, bars, 60, int(closed_at))
+
+    pending = {_fetch(sym, tf): (sym, tf) for tf, syms in series.items() for sym in syms}
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            ready: Dict[str, Tuple[List[str], List[Dict[str, np.ndarray]]]] = {}
+            for fut in done:
+                sym, tf = pending.pop(fut)
+                col = fut.result()
+                if col is not None:
+                    syms, cols = ready.setdefault(tf, ([], []))
+                    syms.append(sym)
+                    cols.append(col)
+            for tf, (syms, cols) in ready.items():
+                p = from_columns(syms, cols, tf, width=bars)
+                tf_prm = prm if tf == prm["timeframe"] else dict(prm, timeframe=tf)
+                for cand in await asyncio.to_thread(_candidates, p, tf_prm):
+                    if closed_at is not None:
+                        cand["closed_at"] = int(closed_at)  # гейт рахує по закритому бару
+                    yield cand
+    finally:
+        for fut in pending:
+            fut.cancel()
+
+async def acollect_autopost_candidates() -> List[Dict[str, Any]]:
+    """Те саме, що collect_autopost_candidates, але конкурентно; порядок — як у monitored_symbols."""
+    prm = await asyncio.to_thread(_params)
+    out = [c async for c in iter_autopost_candidates(prm)]
+    rank = {s: i for i, s in enumerate(prm["symbols"])}
+    return sorted(out, key=lambda c: rank.get(c["symbol"], len(rank)))
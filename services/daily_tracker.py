@@ -1,6 +1,7 @@
 # services/daily_tracker.py
 from __future__ import annotations
 
+import asyncio
 import os
 import sqlite3
 import logging
@@ -9,6 +10,8 @@ from datetime import datetime, time, timedelta
 from zoneinfo import ZoneInfo
 from typing import List, Optional, Tuple
 
+from telegram_bot.outbox import PRIO_REPORT, get_outbox
+
 log = logging.getLogger("daily_tracker")
 
 DB_PATH = os.getenv("DB_PATH") or os.getenv("SQLITE_PATH") or os.getenv("DATABASE_PATH") or "storage/bot.db"
@@ -254,8 +257,10 @@ async def daily_tracker_job(bot) -> None:
         log.warning("daily_tracker: fetch users failed: %s", e)
         user_ids = []
 
-    for uid in user_ids:
-        try:
-            await bot.send_message(chat_id=uid, text=text, disable_web_page_preview=True)
-        except Exception as e:
-            log.warning("daily_tracker: send to %s failed: %s", uid, e)
+    outbox = get_outbox(bot)
+    done = await asyncio.gather(*(
+        outbox.send(uid, text, priority=PRIO_REPORT, disable_web_page_preview=True) for uid in user_ids
+    ))
+    for uid, d in zip(user_ids, done):
+        if not d.ok:
+            log.warning("daily_tracker: send to %s failed: %s", uid, d.error)
@@ -0,0 +1,118 @@
+# services/indicator_batch.py
+from __future__ import annotations
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from services.indicator_engine import IndicatorFrame
+
+log = logging.getLogger("indicator_batch")
+
+_FIELDS = ("open", "high", "low", "close", "volume")
+
+
+class Panel(IndicatorFrame):
+    """
+    Матриця (symbols × bars) однієї TF: рядок — символ, історії вирівняні по ОСТАННЬОМУ бару,
+    короткі доповнені зліва NaN. get(name, **params) рахує індикатор для всіх символів
+    одним векторним проходом тими самими ядрами, що й indicator_engine (ряди паддінгу — NaN).
+    """
+
+    __slots__ = ("symbols", "count", "_row")
+
+    def __init__(self, symbols: Sequence[str], bars: Dict[str, np.ndarray], ts: np.ndarray,
+                 count: np.ndarray, tf: Optional[str] = None) -> None:
+        super().__init__(("panel", tf, tuple(symbols)), bars, ts, None, tf)
+        self.symbols = list(symbols)
+        self.count = count
+        self._row = {s: i for i, s in enumerate(self.symbols)}
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    @property
+    def width(self) -> int:
+        return self.bars["close"].shape[-1]
+
+    def row(self, symbol: str) -> int:
+        return self._row[symbol.upper()]
+
+    def last(self, name: str, field: Optional[str] = None, **params) -> np.ndarray:
+        """Значення на останньому барі кожного символу — вектор (symbols,)."""
+        res = self.get(name, **params)
+        arr = res[field] if field is not None else res
+        if not arr.shape[-1]:
+            return np.full(len(self), np.nan)
+        return arr[:, -1]
+
+    def ready(self, min_bars: int) -> np.ndarray:
+        """Маска символів з історією >= min_bars."""
+        return self.count >= int(min_bars)
+
+    def to_frame(self, symbol: str):
+        """DataFrame валідного хвоста рядка (ts, open..volume) з attrs symbol/tf — як get_series().to_frame()."""
+        import pandas as pd
+        i = self.row(symbol)
+        lo = self.width - int(self.count[i])
+        df = pd.DataFrame({"ts": self.ts[i, lo:].copy(), **{f: self.bars[f][i, lo:].copy() for f in _FIELDS}})
+        df.attrs.update(symbol=self.symbols[i], tf=self.tf)
+        return df
+
+
+def from_columns(symbols: Sequence[str], columns: Sequence[Dict[str, np.ndarray]],
+                 tf: Optional[str] = None, width: Optional[int] = None) -> Panel:
+    """
+    Панель з колонок по символах (dict ts/open/high/low/close/volume однакової довжини на символ).
+    width — кількість барів у матриці (за замовчуванням найдовша історія); довші історії обрізаються зліва.
+    """
+    width = int(width or max((len(c["close"]) for c in columns), default=0))
+    s = len(symbols)
+    bars = {f: np.full((s, width), np.nan) for f in _FIELDS}
+    ts = np.zeros((s, width), dtype=np.int64)
+    count = np.zeros(s, dtype=np.int64)
+    for i, col in enumerate(columns):
+        n = min(width, len(col["close"]))
+        if not n:
+            continue
+        count[i] = n
+        ts[i, width - n:] = np.asarray(col["ts"][-n:], dtype=np.int64)
+        for f in _FIELDS:
+            bars[f][i, width - n:] = col[f][-n:]
+    for a in bars.values():
+        a.setflags(write=False)
+    return Panel([x.upper() for x in symbols], bars, ts, count, tf)
+
+
+def fetch_columns(symbol: str, tf: str, bars: int = 200, min_bars: int = 1) -> Optional[Dict[str, np.ndarray]]:
+    """
+    Колонки одного символу зі спільного кешу свічок (market_data.candles.get_series) для from_columns.
+    None — немає даних / історія < min_bars / помилка завантаження. Блокує (REST) — викликати з потоку.
+    """
+    from market_data.candles import get_series
+    try:
+        series = get_series(symbol, tf, bars)
+    except Exception as e:
+        log.debug("[batch] %s %s skipped: %s", symbol, tf, e)
+        return None
+    if len(series) < max(1, min_bars):
+        return None
+    return series.arrays()
+
+
+def build_panel(symbols: Iterable[str], tf: str, bars: int = 200, min_bars: int = 1) -> Panel:
+    """
+    Панель зі спільного кешу свічок для списку символів (послідовно).
+    Символи без даних / з історією < min_bars / з помилкою завантаження — пропускаються.
+    """
+    syms: List[str] = []
+    cols: List[Dict[str, np.ndarray]] = []
+    for sym in symbols:
+        col = fetch_columns(sym, tf, bars, min_bars)
+        if col is not None:
+            syms.append(sym.upper())
+            cols.append(col)
+    return from_columns(syms, cols, tf, width=bars)
+
+
+__all__ = ["Panel", "build_panel", "fetch_columns", "from_columns"]
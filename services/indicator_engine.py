@@ -0,0 +1,456 @@
+# services/indicator_engine.py
+from __future__ import annotations
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, Union
+
+import numpy as np
+
+from services.ta_kernels import ema_alpha, ewm_rows, rolling
+
+log = logging.getLogger("indicator_engine")
+
+# Скільки знімків (symbol, tf, вікно) тримаємо в пам'яті; кожен — ~6 колонок + пораховані ряди
+CACHE_SIZE = int(os.getenv("INDICATOR_CACHE_SIZE", "512") or 512)
+
+Result = Union[np.ndarray, Dict[str, np.ndarray]]
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Єдині реалізації індикаторів (numpy, без pandas); усі рахують уздовж останньої осі —
+# один ряд (n,) або батч рядків (symbols, n) з провідним NaN-падінгом коротких історій.
+# Там, де модулі історично рахували по-різному, варіант — явний параметр:
+#   smoothing="wilder" — RMA з min_periods (ta_calc / ta_formatter / autopost_sources),
+#   smoothing="ema"    — EMA 2/(N+1) без прогріву (analyzer_core → калібрування гейта),
+#   smoothing="sma"    — ковзне середнє (services.indicators / utils.indicators).
+# ───────────────────────────────────────────────────────────────────────────────
+
+def _nan(shape) -> np.ndarray:
+    return np.full(shape, np.nan)
+
+
+def _div(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """a / b; там, де b == 0 (або NaN) — NaN."""
+    out = _nan(np.broadcast(a, b).shape)
+    np.divide(a, b, out=out, where=(b != 0) & ~np.isnan(b))
+    return out
+
+
+def _shift(x: np.ndarray, k: int = 1) -> np.ndarray:
+    out = _nan(x.shape)
+    if k < x.shape[-1]:
+        out[..., k:] = x[..., :x.shape[-1] - k]
+    return out
+
+
+def _first(x: np.ndarray, at: Optional[np.ndarray] = None) -> np.ndarray:
+    """Значення x на першому валідному барі рядка at (за замовчуванням — самого x), форма (..., 1)."""
+    if not x.shape[-1]:
+        return _nan(x.shape[:-1] + (1,))
+    ref = x if at is None else at
+    return np.take_along_axis(x, np.argmax(~np.isnan(ref), axis=-1)[..., None], axis=-1)
+
+
+def rolling_mean(x: np.ndarray, n: int) -> np.ndarray:
+    return rolling(x, n, "mean")
+
+
+def rolling_sum(x: np.ndarray, n: int) -> np.ndarray:
+    return rolling(x, n, "sum")
+
+
+def rolling_std(x: np.ndarray, n: int, ddof: int = 1) -> np.ndarray:
+    if n <= ddof:
+        return _nan(x.shape)
+    return rolling(x, n, "std", ddof)
+
+
+def _ema(x: np.ndarray, period: int) -> np.ndarray:
+    """EMA 2/(N+1): out[start] = x[start] (як analyzer_core._ema), провідні NaN пропускаються."""
+    if period <= 1:
+        return np.array(x, dtype=np.float64)
+    return ewm_rows(x, ema_alpha(period))
+
+
+def rma(x: np.ndarray, period: int, min_periods: bool = True) -> np.ndarray:
+    """
+    Згладжування Вайлдера (ewm(alpha=1/N, adjust=False)): провідні NaN пропускаються,
+    з min_periods перші N-1 валідних значень — NaN (як у pandas).
+    """
+    out = ewm_rows(x, 1.0 / period)
+    if min_periods:
+        out[np.cumsum(~np.isnan(x), axis=-1) < period] = np.nan
+    return out
+
+
+def _smooth(x: np.ndarray, period: int, smoothing: str) -> np.ndarray:
+    if smoothing == "wilder":
+        return rma(x, period)
+    if smoothing == "ema":
+        return _ema(x, period)
+    if smoothing == "sma":
+        return rolling_mean(x, period)
+    raise ValueError(f"unknown smoothing: {smoothing}")
+
+
+def _prev_close(c: np.ndarray) -> np.ndarray:
+    """Попереднє закриття; на першому барі — воно ж (TR першого бару = high-low)."""
+    p = _shift(c)
+    return np.where(np.isnan(p), c, p)
+
+
+def true_range(h: np.ndarray, l: np.ndarray, c: np.ndarray) -> np.ndarray:
+    pc = _prev_close(c)
+    return np.maximum.reduce([h - l, np.abs(h - pc), np.abs(l - pc)])
+
+
+def _dm(h: np.ndarray, l: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """+DM/-DM; на першому барі 0."""
+    up = h - _shift(h)
+    down = _shift(l) - l
+    pad = np.isnan(h)
+    plus_dm = np.where(pad, np.nan, np.where((up > down) & (up > 0), up, 0.0))
+    minus_dm = np.where(pad, np.nan, np.where((down > up) & (down > 0), down, 0.0))
+    return plus_dm, minus_dm
+
+
+def _short(x: np.ndarray, n: int) -> np.ndarray:
+    """Маска рядків, у яких валідних барів менше за n (форма (..., 1))."""
+    return (np.sum(~np.isnan(x), axis=-1) < n)[..., None]
+
+
+# ── індикатори (bars — dict колонок open/high/low/close/volume, (n,) або (rows, n)) ──
+def _ind_sma(b, period: int, src: str = "close") -> np.ndarray:
+    return rolling_mean(b[src], period)
+
+
+def _ind_ema(b, period: int, src: str = "close") -> np.ndarray:
+    return _ema(b[src], period)
+
+
+def _ind_ema_slope(b, period: int = 50, lag: int = 10) -> np.ndarray:
+    """Нормований нахил EMA: (x[t]-x[t-lag])/(lag*|x[t]|); перші lag барів — відносно x[start]."""
+    x = _ema(b["close"], period)
+    prev = _shift(x, lag)
+    prev = np.where(np.isnan(prev), _first(x), prev)
+    out = (x - prev) / (lag * np.maximum(np.abs(x), 1e-12))
+    return np.where(_short(x, lag + 1), np.nan, out)
+
+
+def _ind_tr(b) -> np.ndarray:
+    return true_range(b["high"], b["low"], b["close"])
+
+
+def _ind_atr(b, period: int = 14, smoothing: str = "wilder") -> np.ndarray:
+    return _smooth(true_range(b["high"], b["low"], b["close"]), period, smoothing)
+
+
+def _ind_rsi(b, period: int = 14, smoothing: str = "wilder") -> np.ndarray:
+    c = b["close"]
+    if smoothing == "ema":
+        # analyzer_core: дельта 0 на першому барі, без прогріву; avg_loss == 0 → RSI 0
+        delta = c - _prev_close(c)
+        g = _ema(np.where(delta > 0, delta, np.where(np.isnan(delta), np.nan, 0.0)), period)
+        ls = _ema(np.where(delta < 0, -delta, np.where(np.isnan(delta), np.nan, 0.0)), period)
+        rs = np.divide(g, ls, out=np.where(np.isnan(ls), np.nan, 0.0), where=ls > 0)
+        return np.where(_short(c, period + 1), np.nan, 100.0 - 100.0 / (1.0 + rs))
+    delta = c - _shift(c)
+    g = _smooth(np.where(np.isnan(delta), np.nan, np.maximum(delta, 0.0)), period, smoothing)
+    ls = _smooth(np.where(np.isnan(delta), np.nan, np.maximum(-delta, 0.0)), period, smoothing)
+    out = 100.0 - 100.0 / (1.0 + _div(g, ls))
+    # лише прирости (avg_loss == 0) — межа формули, 100; повний флет лишається NaN
+    out[(ls == 0) & (g > 0)] = 100.0
+    return out
+
+
+def _ind_macd(b, fast: int = 12, slow: int = 26, signal: int = 9) -> Dict[str, np.ndarray]:
+    c = b["close"]
+    macd = _ema(c, fast) - _ema(c, slow)
+    sig = _ema(macd, signal)
+    return {"macd": macd, "signal": sig, "hist": macd - sig}
+
+
+def _ind_stochrsi(b, period: int = 14, stoch: int = 14, k: int = 3, d: int = 3,
+                  smoothing: str = "wilder") -> Dict[str, np.ndarray]:
+    """%K/%D у частках 0..1 (масштаб ×100 — справа відображення)."""
+    r = _ind_rsi(b, period, smoothing)
+    lo = rolling(r, stoch, "min")
+    hi = rolling(r, stoch, "max")
+    kk = rolling_mean(_div(r - lo, hi - lo), k)
+    return {"k": kk, "d": rolling_mean(kk, d)}
+
+
+def _ind_adx(b, period: int = 14, smoothing: str = "wilder") -> np.ndarray:
+    h, l, c = b["high"], b["low"], b["close"]
+    plus_dm, minus_dm = _dm(h, l)
+    tr = true_range(h, l, c)
+    if smoothing == "ema":
+        atr = _ema(tr, period)
+        p = 100.0 * _ema(plus_dm, period) / np.where(atr == 0, np.nan, atr)
+        m = 100.0 * _ema(minus_dm, period) / np.where(atr == 0, np.nan, atr)
+        dx = 100.0 * np.abs(p - m) / np.where((p + m) == 0, np.nan, p + m)
+        adx = _ema(dx, period)
+        # analyzer_core: DM на першому барі 0 → dx[start] = NaN і він «заражає» EMA (ADX = None);
+        # лишаємо як є — на цьому відкалібровано indicator_min_pass гейта
+        poisoned = np.isnan(_first(dx, at=c))
+        return np.where(poisoned | _short(c, period + 2), np.nan, adx)
+    if smoothing == "sma":
+        atr = rolling_sum(tr, period)
+        p = 100.0 * _div(rolling_sum(plus_dm, period), atr)
+        m = 100.0 * _div(rolling_sum(minus_dm, period), atr)
+        return rolling_mean(100.0 * _div(np.abs(p - m), p + m), period)
+    atr = rma(tr, period)
+    p = 100.0 * _div(rma(plus_dm, period), atr)
+    m = 100.0 * _div(rma(minus_dm, period), atr)
+    return rma(100.0 * _div(np.abs(p - m), p + m), period)
+
+
+def _ind_cci(b, period: int = 20) -> np.ndarray:
+    tp = (b["high"] + b["low"] + b["close"]) / 3.0
+    sma_tp = rolling_mean(tp, period)
+    md = rolling_mean(np.abs(tp - sma_tp), period)
+    return _div(tp - sma_tp, 0.015 * md)
+
+
+def _ind_bb(b, period: int = 20, mult: float = 2.0, ddof: int = 1) -> Dict[str, np.ndarray]:
+    c = b["close"]
+    mid = rolling_mean(c, period)
+    sd = rolling_std(c, period, ddof)
+    upper = mid + mult * sd
+    lower = mid - mult * sd
+    return {"mid": mid, "upper": upper, "lower": lower,
+            "pct_b": _div(c - lower, upper - lower), "width": _div(upper - lower, mid)}
+
+
+def _ind_obv(b) -> np.ndarray:
+    c = b["close"]
+    sign = np.sign(c - _prev_close(c))
+    return np.nancumsum(b["volume"] * sign, axis=-1)
+
+
+def _ind_mfi(b, period: int = 14) -> np.ndarray:
+    tp = (b["high"] + b["low"] + b["close"]) / 3.0
+    mf = tp * b["volume"]
+    prev = _shift(tp)
+    pad = np.isnan(tp)
+    pos = rolling_sum(np.where(pad, np.nan, np.where(tp > prev, mf, 0.0)), period)
+    neg = rolling_sum(np.where(pad, np.nan, np.where(tp < prev, mf, 0.0)), period)
+    return 100.0 - 100.0 / (1.0 + _div(pos, neg))
+
+
+def _ind_vwap(b, period: int = 0) -> np.ndarray:
+    """period=0 — накопичувальний VWAP від початку вікна; N — ковзний за N барів."""
+    tp = (b["high"] + b["low"] + b["close"]) / 3.0
+    v = b["volume"]
+    if period:
+        return _div(rolling_sum(tp * v, period), rolling_sum(v, period))
+    return _div(np.nancumsum(tp * v, axis=-1), np.nancumsum(v, axis=-1))
+
+
+def _ind_rel_volume(b, period: int = 20) -> np.ndarray:
+    v = b["volume"]
+    return _div(v, rolling_mean(v, period))
+
+
+def _ind_pivots(b, kind: str = "classic") -> Dict[str, np.ndarray]:
+    """Pivot-рівні кожного бару з ПОПЕРЕДНЬОГО бару (на першому — NaN)."""
+    ph, pl, pc = _shift(b["high"]), _shift(b["low"]), _shift(b["close"])
+    p = (ph + pl + pc) / 3.0
+    if kind == "fib":
+        r = np.abs(ph - pl)
+        return {"pivot": p, "r1": p + 0.382 * r, "s1": p - 0.382 * r, "r2": p + 0.618 * r,
+                "s2": p - 0.618 * r, "r3": p + r, "s3": p - r}
+    if kind != "classic":
+        raise ValueError(f"unknown pivots kind: {kind}")
+    return {"pivot": p, "r1": 2 * p - pl, "s1": 2 * p - ph, "r2": p + (ph - pl), "s2": p - (ph - pl),
+            "r3": ph + 2 * (p - pl), "s3": pl - 2 * (ph - p)}
+
+
+INDICATORS: Dict[str, Callable[..., Result]] = {
+    "sma": _ind_sma,
+    "ema": _ind_ema,
+    "ema_slope": _ind_ema_slope,
+    "tr": _ind_tr,
+    "atr": _ind_atr,
+    "rsi": _ind_rsi,
+    "macd": _ind_macd,
+    "stochrsi": _ind_stochrsi,
+    "adx": _ind_adx,
+    "cci": _ind_cci,
+    "bb": _ind_bb,
+    "obv": _ind_obv,
+    "mfi": _ind_mfi,
+    "vwap": _ind_vwap,
+    "rel_volume": _ind_rel_volume,
+    "pivots": _ind_pivots,
+}
+
+
+def compute(name: str, bars: Dict[str, np.ndarray], **params: Any) -> Result:
+    """Разовий розрахунок без кешу (для рядів, що не прив'язані до символу)."""
+    try:
+        fn = INDICATORS[name]
+    except KeyError:
+        raise KeyError(f"unknown indicator: {name}") from None
+    res = fn(bars, **params)
+    pad = np.isnan(bars["close"])
+    if pad.any():
+        # провідний NaN-падінг коротких історій (батч рядків) — без значень і на виході
+        for a in (res.values() if isinstance(res, dict) else (res,)):
+            a[pad] = np.nan
+    return res
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Знімок серії + кеш «порахувати раз»
+# ───────────────────────────────────────────────────────────────────────────────
+
+def _freeze(res: Result) -> Result:
+    # спільний результат для всіх читачів — захищаємо від випадкового запису
+    for a in (res.values() if isinstance(res, dict) else (res,)):
+        a.setflags(write=False)
+    return res
+
+
+class IndicatorFrame:
+    """
+    Незмінний знімок OHLCV (symbol, tf, вікно) і пораховані на ньому індикатори.
+    get(name, **params) рахує індикатор один раз на знімок — наступні читачі (звіт, скрінер,
+    автопост, гейт) отримують той самий масив.
+    """
+
+    __slots__ = ("key", "symbol", "tf", "ts", "bars", "_memo")
+
+    def __init__(self, key: Hashable, bars: Dict[str, np.ndarray], ts: Optional[np.ndarray] = None,
+                 symbol: Optional[str] = None, tf: Optional[str] = None) -> None:
+        self.key = key
+        self.symbol = symbol
+        self.tf = tf
+        self.ts = ts
+        self.bars = bars
+        self._memo: Dict[Hashable, Any] = {}
+
+    def __len__(self) -> int:
+        return self.bars["close"].size
+
+    def get(self, name: str, **params: Any) -> Result:
+        k = (name, tuple(sorted(params.items())))
+        hit = self._memo.get(k)
+        if hit is None:
+            # гонка двох потоків дасть два однакові розрахунки — зберігаємо перший
+            hit = self._memo.setdefault(k, _freeze(compute(name, self.bars, **params)))
+        return hit
+
+    def last(self, name: str, field: Optional[str] = None, **params: Any) -> float:
+        """Значення на останньому барі (NaN, якщо ряд порожній)."""
+        res = self.get(name, **params)
+        arr = res[field] if field is not None else res
+        return float(arr[-1]) if arr.size else float("nan")
+
+    def memo(self, key: Hashable, fn: Callable[["IndicatorFrame"], Any]) -> Any:
+        """Похідний результат над знімком (напр. готовий TA-звіт) — теж один раз на знімок."""
+        k = ("memo", key)
+        if k not in self._memo:
+            self._memo.setdefault(k, fn(self))
+        return self._memo[k]
+
+
+_FRAMES: "OrderedDict[Hashable, IndicatorFrame]" = OrderedDict()
+_LOCK = threading.Lock()
+_STATS = {"hits": 0, "misses": 0}
+
+
+def _snapshot_key(symbol: Optional[str], tf: Optional[str], ts: Optional[np.ndarray],
+                  cols: Dict[str, np.ndarray]) -> Hashable:
+    """
+    (symbol, tf, n, хеш вмісту колонок): однакові дані — один знімок, будь-яка відмінність
+    (зокрема в середині вікна чи у df без ts/attrs) — інший. blake2b по ~8 КБ — мікросекунди.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for name in ("open", "high", "low", "close", "volume"):
+        h.update(cols[name].tobytes())
+    if ts is not None:
+        h.update(ts.tobytes())
+    return (symbol, tf, int(cols["close"].size), h.digest())
+
+
+def from_arrays(high, low, close, volume, open_=None, ts=None,
+                symbol: Optional[str] = None, tf: Optional[str] = None) -> IndicatorFrame:
+    """Знімок із колонок (копіюються: view кешу свічок змінюється на формованому барі)."""
+    cols = {
+        "high": np.array(high, dtype=np.float64),
+        "low": np.array(low, dtype=np.float64),
+        "close": np.array(close, dtype=np.float64),
+        "volume": np.array(volume, dtype=np.float64),
+    }
+    cols["open"] = np.array(open_, dtype=np.float64) if open_ is not None else cols["close"]
+    for a in cols.values():
+        a.setflags(write=False)
+    ts_arr = np.array(ts, dtype=np.int64) if ts is not None else None
+    symbol = symbol.upper() if symbol else None
+    key = _snapshot_key(symbol, tf, ts_arr, cols)
+    with _LOCK:
+        fr = _FRAMES.get(key)
+        if fr is not None:
+            _FRAMES.move_to_end(key)
+            _STATS["hits"] += 1
+            return fr
+        _STATS["misses"] += 1
+        fr = _FRAMES[key] = IndicatorFrame(key, cols, ts_arr, symbol, tf)
+        while len(_FRAMES) > CACHE_SIZE:
+            _FRAMES.popitem(last=False)
+    return fr
+
+
+def from_series(series, symbol: Optional[str] = None, tf: Optional[str] = None) -> IndicatorFrame:
+    """Знімок з market_data.series.CandleSeries."""
+    a = series.arrays()
+    return from_arrays(a["high"], a["low"], a["close"], a["volume"], a["open"], a["ts"], symbol, tf)
+
+
+def from_frame(df, symbol: Optional[str] = None, tf: Optional[str] = None) -> IndicatorFrame:
+    """
+    Знімок з DataFrame (назви колонок без урахування регістру).
+    symbol/tf — з аргументів або df.attrs (їх ставлять місця, що будують df з get_series).
+    """
+    cols = {str(c).lower(): c for c in df.columns}
+    n = len(df)
+
+    def col(name: str):
+        c = cols.get(name)
+        return df[c].to_numpy(dtype=np.float64) if c is not None else np.full(n, np.nan)
+
+    ts = None
+    if "ts" in cols:
+        ts = df[cols["ts"]].to_numpy(dtype=np.int64)
+    elif "timestamp" in cols:
+        raw = df[cols["timestamp"]]
+        ts = (raw.astype("int64") // 10 ** 9).to_numpy() if str(raw.dtype).startswith("datetime") \
+            else raw.to_numpy(dtype=np.int64)
+    attrs = getattr(df, "attrs", None) or {}
+    return from_arrays(col("high"), col("low"), col("close"), col("volume"), col("open"), ts,
+                       symbol or attrs.get("symbol"), tf or attrs.get("tf"))
+
+
+def snapshot(symbol: str, tf: str, limit: int = 200) -> IndicatorFrame:
+    """Знімок останніх limit барів зі спільного кешу свічок (market_data.candles)."""
+    from market_data.candles import get_series
+    return from_series(get_series(symbol, tf, limit), symbol, tf)
+
+
+def stats() -> Dict[str, int]:
+    with _LOCK:
+        return {"frames": len(_FRAMES), **_STATS}
+
+
+def clear() -> None:
+    with _LOCK:
+        _FRAMES.clear()
+
+
+__all__ = [
+    "CACHE_SIZE", "INDICATORS", "IndicatorFrame", "clear", "compute", "from_arrays", "from_frame",
+    "from_series", "rma", "rolling_mean", "rolling_std", "rolling_sum", "snapshot", "stats", "true_range",
+]
@@ -0,0 +1,366 @@
+# services/indicator_state.py
+from __future__ import annotations
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from services.ta_kernels import ema as _ema
+
+log = logging.getLogger("indicator_state")
+
+# Скільки барів тримаємо у стані за замовчуванням (вікно VWAP = стільки ж, як у батчевому аналізі)
+STATE_BARS = 200
+_SLOPE_PERIOD = 10
+_TAIL = 20            # останні EMA50 для evaluate_gate (_series["ema50"]) і нахилу
+
+
+class _Ewm:
+    """Рекурсивний акумулятор y = a*x + (1-a)*y; перше значення — seed (як out[0]=a[0] у циклі)."""
+
+    __slots__ = ("alpha", "value")
+
+    def __init__(self, period: int, value: float) -> None:
+        self.alpha = 2.0 / (period + 1.0)
+        self.value = float(value)
+
+    def peek(self, x: float) -> float:
+        return self.alpha * x + (1.0 - self.alpha) * self.value
+
+
+class _Rolling:
+    """
+    Ковзне вікно N з середнім і M2 (Welford для вікна: додаємо новий, викидаємо найстаріший) —
+    std без втрати точності на великих цінах (BTC ~1e5 з малою дисперсією).
+    """
+
+    __slots__ = ("n", "buf", "mean", "m2")
+
+    def __init__(self, n: int, values) -> None:
+        self.n = int(n)
+        self.buf: deque = deque((float(x) for x in values[-self.n:]), maxlen=self.n)
+        arr = np.fromiter(self.buf, dtype=np.float64, count=len(self.buf))
+        self.mean = float(arr.mean()) if arr.size else 0.0
+        self.m2 = float(((arr - self.mean) ** 2).sum()) if arr.size else 0.0
+
+    def peek(self, x: float) -> Tuple[float, float]:
+        """(mean, m2) після додавання x — без зміни стану."""
+        k = len(self.buf)
+        if k < self.n:
+            mean = self.mean + (x - self.mean) / (k + 1)
+            return mean, self.m2 + (x - self.mean) * (x - mean)
+        y = self.buf[0]
+        mean = self.mean + (x - y) / self.n
+        return mean, max(0.0, self.m2 + (x - y) * (x - mean + y - self.mean))
+
+    def push(self, x: float) -> None:
+        self.mean, self.m2 = self.peek(x)
+        self.buf.append(x)
+
+
+class _WindowSum:
+    """Сума останніх N значень (deque + running sum) — вікно VWAP; раз на N кроків — точний перерахунок."""
+
+    __slots__ = ("n", "buf", "total", "_since")
+
+    def __init__(self, n: int, values) -> None:
+        self.n = int(n)
+        self.buf: deque = deque((float(x) for x in values[-self.n:]), maxlen=self.n)
+        self.total = math.fsum(self.buf)
+        self._since = 0
+
+    def peek(self, x: float) -> float:
+        return self.total + x - (self.buf[0] if len(self.buf) == self.n else 0.0)
+
+    def push(self, x: float) -> None:
+        self.total = self.peek(x)
+        self.buf.append(x)
+        self._since += 1
+        if self._since >= self.n:   # похибка +x -y не накопичується довше за одне вікно
+            self.total, self._since = math.fsum(self.buf), 0
+
+
+def _nan_none(x: float) -> Optional[float]:
+    return None if x is None or math.isnan(x) else float(x)
+
+
+class IndicatorState:
+    """
+    Інкрементальні індикатори однієї серії з тими ж формулами, що й analyzer_core.compute_indicators:
+    EMA50/EMA200, ATR/RSI/ADX (EMA-згладжування), BBW(20), rel-vol(20), VWAP по вікну, нахил EMA50.
+    update(bar) на закритті бару — O(1); provisional(bar) — значення для формованого бару без зміни стану.
+    """
+
+    def __init__(self, window: int = STATE_BARS) -> None:
+        self.window = int(window)
+        self.n = 0
+        self.last_ts: Optional[int] = None
+        self.forming: Optional[Dict[str, float]] = None
+
+    # ── bootstrap (векторно) ─────────────────────────────────────────────────
+    @classmethod
+    def from_arrays(cls, ts, h, l, c, v, window: int = STATE_BARS) -> "IndicatorState":
+        """Стан після закритих барів (масиви однакової довжини >= 1)."""
+        st = cls(window)
+        h, l, c, v = (np.asarray(a, dtype=np.float64) for a in (h, l, c, v))
+        n = c.size
+        if n == 0:
+            raise ValueError("empty series")
+        prev_c = np.concatenate(([c[0]], c[:-1]))
+        tr = np.maximum.reduce([h - l, np.abs(h - prev_c), np.abs(l - prev_c)])
+        delta = np.diff(c, prepend=c[0])
+        up = h[1:] - h[:-1]
+        down = l[:-1] - l[1:]
+        pdm = np.concatenate(([0.0], np.where((up > down) & (up > 0), up, 0.0)))
+        mdm = np.concatenate(([0.0], np.where((down > up) & (down > 0), down, 0.0)))
+
+        ema50 = _ema(c, 50)
+        atr = _ema(tr, 14)
+        e_pdm, e_mdm = _ema(pdm, 14), _ema(mdm, 14)
+        atr_nz = np.where(atr == 0, np.nan, atr)
+        pdi, mdi = 100.0 * e_pdm / atr_nz, 100.0 * e_mdm / atr_nz
+        s = pdi + mdi
+        dx = 100.0 * np.abs(pdi - mdi) / np.where(s == 0, np.nan, s)
+
+        st.ema50 = _Ewm(50, ema50[-1])
+        st.ema200 = _Ewm(200, _ema(c, 200)[-1])
+        st.atr = _Ewm(14, atr[-1])
+        st.gain = _Ewm(14, _ema(np.where(delta > 0, delta, 0.0), 14)[-1])
+        st.loss = _Ewm(14, _ema(np.where(delta < 0, -delta, 0.0), 14)[-1])
+        st.pdm, st.mdm = _Ewm(14, e_pdm[-1]), _Ewm(14, e_mdm[-1])
+        st.adx = _Ewm(14, _ema(dx, 14)[-1])
+        st.bb = _Rolling(20, c)
+        st.vol = _Rolling(20, v)
+        tp = (h + l + c) / 3.0
+        st.pv = _WindowSum(st.window, tp * v)
+        st.vv = _WindowSum(st.window, v)
+        st.ema50_tail = deque(ema50[-(_SLOPE_PERIOD + 1):].tolist(), maxlen=_SLOPE_PERIOD + 1)
+        st.ema50_hist = deque(ema50[-_TAIL:].tolist(), maxlen=_TAIL)
+        st.prev_h, st.prev_l, st.prev_c = float(h[-1]), float(l[-1]), float(c[-1])
+        st.n = n
+        st.last_ts = int(ts[-1]) if len(ts) else None
+        return st
+
+    # ── крок ─────────────────────────────────────────────────────────────────
+    def _step(self, bar: Dict[str, float]) -> Dict[str, Any]:
+        """Нові значення акумуляторів після bar (без запису в стан)."""
+        h, l, c, v = float(bar["high"]), float(bar["low"]), float(bar["close"]), float(bar["volume"])
+        pc = self.prev_c
+        tr = max(h - l, abs(h - pc), abs(l - pc))
+        delta = c - pc
+        up, down = h - self.prev_h, self.prev_l - l
+        pdm = up if (up > down and up > 0) else 0.0
+        mdm = down if (down > up and down > 0) else 0.0
+        atr = self.atr.peek(tr)
+        e_pdm, e_mdm = self.pdm.peek(pdm), self.mdm.peek(mdm)
+        if atr == 0:
+            pdi = mdi = float("nan")
+        else:
+            pdi, mdi = 100.0 * e_pdm / atr, 100.0 * e_mdm / atr
+        s = pdi + mdi
+        dx = float("nan") if (s == 0 or math.isnan(s)) else 100.0 * abs(pdi - mdi) / s
+        return {
+            "h": h, "l": l, "c": c, "v": v,
+            "ema50": self.ema50.peek(c), "ema200": self.ema200.peek(c), "atr": atr,
+            "gain": self.gain.peek(delta if delta > 0 else 0.0),
+            "loss": self.loss.peek(-delta if delta < 0 else 0.0),
+            "pdm": e_pdm, "mdm": e_mdm, "adx": self.adx.peek(dx),
+            "bb": self.bb.peek(c), "vol": self.vol.peek(v),
+            "pv": self.pv.peek((h + l + c) / 3.0 * v), "vv": self.vv.peek(v),
+        }
+
+    def update(self, bar: Dict[str, float]) -> None:
+        """Закритий бар → O(1) оновлення всіх акумуляторів."""
+        nx = self._step(bar)
+        self.ema50.value, self.ema200.value, self.atr.value = nx["ema50"], nx["ema200"], nx["atr"]
+        self.gain.value, self.loss.value = nx["gain"], nx["loss"]
+        self.pdm.value, self.mdm.value, self.adx.value = nx["pdm"], nx["mdm"], nx["adx"]
+        self.bb.push(nx["c"])
+        self.vol.push(nx["v"])
+        self.pv.push((nx["h"] + nx["l"] + nx["c"]) / 3.0 * nx["v"])
+        self.vv.push(nx["v"])
+        self.ema50_tail.append(nx["ema50"])
+        self.ema50_hist.append(nx["ema50"])
+        self.prev_h, self.prev_l, self.prev_c = nx["h"], nx["l"], nx["c"]
+        self.n += 1
+        self.last_ts = int(bar.get("ts", self.last_ts or 0))
+        self.forming = None
+
+    # ── читання ──────────────────────────────────────────────────────────────
+    def _values(self, nx: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Вихід у форматі compute_indicators (nx=None — на останньому закритому барі)."""
+        n = self.n + (1 if nx is not None else 0)
+        if nx is None:
+            c, v = self.prev_c, self.vol.buf[-1]
+            ema50, ema200, atr = self.ema50.value, self.ema200.value, self.atr.value
+            gain, loss, adx = self.gain.value, self.loss.value, self.adx.value
+            bb_mean, bb_m2 = self.bb.mean, self.bb.m2
+            vol_mean = self.vol.mean
+            pv, vv = self.pv.total, self.vv.total
+            tail = list(self.ema50_tail)
+            hist = list(self.ema50_hist)
+        else:
+            c, v = nx["c"], nx["v"]
+            ema50, ema200, atr = nx["ema50"], nx["ema200"], nx["atr"]
+            gain, loss, adx = nx["gain"], nx["loss"], nx["adx"]
+            bb_mean, bb_m2 = nx["bb"]
+            vol_mean = nx["vol"][0]
+            pv, vv = nx["pv"], nx["vv"]
+            tail = (list(self.ema50_tail) + [ema50])[-(_SLOPE_PERIOD + 1):]
+            hist = (list(self.ema50_hist) + [ema50])[-_TAIL:]
+
+        rsi = float("nan")
+        if n >= 15:
+            rs = gain / loss if loss > 0 else 0.0
+            rsi = 100.0 - 100.0 / (1.0 + rs)
+        adx_v = adx if n >= 16 else float("nan")
+        bbw = rel_vol = float("nan")
+        if n >= 20:
+            std = math.sqrt(bb_m2 / 19.0)
+            bbw = (4.0 * std) / bb_mean if bb_mean != 0 else float("nan")
+            rel_vol = v / vol_mean if vol_mean != 0 else float("nan")
+        vwap = pv / vv if vv != 0 else float("nan")
+        slope = float("nan")
+        if n > _SLOPE_PERIOD:
+            slope = (ema50 - tail[0]) / (_SLOPE_PERIOD * max(abs(ema50), 1e-12))
+        vwap_dist = abs(c - vwap) / max(abs(c), 1e-12)
+        return {
+            "ok": True,
+            "ema50": _nan_none(ema50),
+            "ema200": _nan_none(ema200),
+            "atr_entry": _nan_none(atr),
+            "atr_pct": float(atr / c) if c != 0 and not math.isnan(atr) else None,
+            "rsi": _nan_none(rsi),
+            "adx": _nan_none(adx_v),
+            "bbw": _nan_none(bbw),
+            "rel_vol": _nan_none(rel_vol),
+            "vwap": _nan_none(vwap),
+            "vwap_dist": _nan_none(vwap_dist),
+            "ema50_slope": _nan_none(slope),
+            "price_rel_ema50": _nan_none(c - ema50),
+            "price_rel_ema200": _nan_none(c - ema200),
+            # evaluate_gate дивиться лише на хвіст EMA50
+            "_series": {"ema50": np.asarray(hist, dtype=np.float64)},
+        }
+
+    def values(self) -> Dict[str, Any]:
+        """Значення на останньому закритому барі."""
+        return self._values(None)
+
+    def provisional(self, bar: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+        """Попередні значення з урахуванням формованого бару (bar або останній із set_forming) — O(1)."""
+        bar = bar or self.forming
+        return self._values(self._step(bar)) if bar else self._values(None)
+
+    def set_forming(self, bar: Dict[str, float]) -> None:
+        self.forming = dict(bar)
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Реєстр станів (symbol, tf), який живиться барами зі стріму (market_data.candles)
+# ───────────────────────────────────────────────────────────────────────────────
+
+_STATES: Dict[Tuple[str, str], IndicatorState] = {}
+_LOCK = threading.Lock()
+
+
+def _tf_sec(timeframe: str) -> int:
+    from market_data.binance import INTERVAL_SEC
+    return INTERVAL_SEC.get(timeframe, 60)
+
+
+def _build(symbol: str, timeframe: str, bars: int) -> IndicatorState:
+    from market_data.candles import get_series
+    s = get_series(symbol, timeframe, bars + 1)
+    if not len(s):
+        raise ValueError(f"no candles for {symbol} {timeframe}")
+    ts = s.ts
+    # останній бар REST-вікна зазвичай ще формується — він іде в provisional, не в стан
+    closed = len(s) - 1 if int(ts[-1]) + _tf_sec(timeframe) > time.time() else len(s)
+    if closed == 0:
+        raise ValueError(f"no closed candles for {symbol} {timeframe}")
+    st = IndicatorState.from_arrays(ts[:closed], s.high[:closed], s.low[:closed], s.close[:closed],
+                                    s.volume[:closed], window=bars)
+    if closed < len(s):
+        st.set_forming(s.to_bars(1)[-1])
+    return st
+
+
+def get_state(symbol: str, timeframe: str, bars: int = STATE_BARS) -> IndicatorState:
+    """Стан серії; створюється з кешу свічок при першому зверненні (або після розриву)."""
+    key = (symbol.upper(), timeframe)
+    with _LOCK:
+        st = _STATES.get(key)
+    if st is not None and st.window == int(bars):
+        return st
+    st = _build(key[0], timeframe, int(bars))
+    with _LOCK:
+        _STATES[key] = st
+    return st
+
+
+def on_bar(symbol: str, timeframe: str, bar: Dict[str, float], closed: bool) -> None:
+    """Слухач барів candles: закритий бар — update(), формований — лише запам'ятовуємо."""
+    key = (symbol.upper(), timeframe)
+    with _LOCK:
+        st = _STATES.get(key)
+        if st is None:
+            return
+        ts = int(bar["ts"])
+        if st.last_ts is not None and ts <= st.last_ts:
+            return  # дубль уже врахованого бару
+        if st.last_ts is not None and ts != st.last_ts + _tf_sec(timeframe):
+            # пропущені бари — стан більше не відповідає серії, перебудуємо при наступному читанні
+            log.info("[indicator_state] gap in %s %s (ts=%s, last=%s) — rebuild", key[0], timeframe, ts, st.last_ts)
+            _STATES.pop(key, None)
+            return
+        if closed:
+            st.update(bar)
+        else:
+            st.set_forming(bar)
+
+
+def live_indicators(symbol: str, timeframe: str, bars: int = STATE_BARS) -> Dict[str, Any]:
+    """Індикатори з урахуванням формованого бару (формат compute_indicators)."""
+    st = get_state(symbol, timeframe, bars)
+    with _LOCK:  # on_bar оновлює акумулятори під тим самим локом — читаємо узгоджений знімок
+        return st.provisional()
+
+
+def closed_indicators(symbol: str, timeframe: str, bars: int = STATE_BARS,
+                      closed_at: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """
+    Індикатори на останньому ЗАКРИТОМУ барі (без формованого). closed_at — межа, на якій
+    має закінчуватись стан; None, якщо стрім ще не доніс цей бар (тоді рахуйте з колонок).
+    """
+    st = get_state(symbol, timeframe, bars)
+    with _LOCK:
+        if closed_at is not None and (st.last_ts is None or st.last_ts + _tf_sec(timeframe) != int(closed_at)):
+            return None
+        return st.values()
+
+
+def drop(symbol: Optional[str] = None, timeframe: Optional[str] = None) -> None:
+    with _LOCK:
+        if symbol is None:
+            _STATES.clear()
+        else:
+            _STATES.pop((symbol.upper(), timeframe), None)
+
+
+def _register() -> None:
+    try:
+        from market_data.candles import add_bar_listener
+        add_bar_listener(on_bar)
+    except Exception as e:  # pragma: no cover
+        log.warning("[indicator_state] cannot subscribe to candles: %s", e)
+
+
+_register()
+
+
+__all__ = ["IndicatorState", "STATE_BARS", "drop", "closed_indicators", "get_state", "live_indicators", "on_bar"]
@@ -0,0 +1,137 @@
+# services/pipeline.py
+from __future__ import annotations
+import asyncio
+import logging
+import time
+from typing import Any, AsyncIterable, Awaitable, Callable, Dict, List, Sequence, Tuple
+
+log = logging.getLogger("pipeline")
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Потоковий конвеєр: джерело → стадії (кожна зі своєю кількістю воркерів) → результат.
+# Стадії з'єднані обмеженими asyncio.Queue: повільна стадія гальмує попередні (backpressure),
+# а не накопичує необмежену чергу. Стадія повертає None — елемент відсіяно.
+# ───────────────────────────────────────────────────────────────────────────────
+
+_DONE = object()
+
+
+class Stage:
+    """
+    fn(item) -> item | None — звичайна стадія, workers паралельних воркерів.
+    barrier=True — fn(items) -> items: чекає весь потік (напр. top-k за якістю), один виклик.
+    """
+
+    __slots__ = ("name", "fn", "workers", "barrier")
+
+    def __init__(self, name: str, fn: Callable[[Any], Awaitable[Any]], workers: int = 1, barrier: bool = False) -> None:
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, int(workers))
+        self.barrier = barrier
+
+
+class StageStats:
+    """Лічильники і час стадії за прохід (busy — сумарний час у fn, без очікування в черзі)."""
+
+    __slots__ = ("name", "seen", "passed", "dropped", "errors", "busy", "max_sec")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.seen = self.passed = self.dropped = self.errors = 0
+        self.busy = self.max_sec = 0.0
+
+    def note(self, dt: float) -> None:
+        self.busy += dt
+        self.max_sec = max(self.max_sec, dt)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "seen": self.seen, "passed": self.passed, "dropped": self.dropped, "errors": self.errors,
+            "avg_ms": (self.busy / self.seen * 1000.0) if self.seen else 0.0, "max_ms": self.max_sec * 1000.0,
+        }
+
+    def __str__(self) -> str:
+        d = self.as_dict()
+        return (f"{self.name} {self.seen}→{self.passed}" + (f" err={self.errors}" if self.errors else "")
+                + f" avg={d['avg_ms']:.0f}ms max={d['max_ms']:.0f}ms")
+
+
+async def run_pipeline(source: AsyncIterable[Any], stages: Sequence[Stage], maxsize: int = 16,
+                       name: str = "pipeline") -> Tuple[List[Any], Dict[str, StageStats]]:
+    """Проганяє потік через стадії; повертає (елементи, що дійшли до кінця, статистику по стадіях)."""
+    queues: List[asyncio.Queue] = [asyncio.Queue(maxsize=max(1, int(maxsize))) for _ in range(len(stages) + 1)]
+    stats = {s.name: StageStats(s.name) for s in stages}
+    out: List[Any] = []
+
+    async def _feed() -> None:
+        try:
+            async for item in source:
+                await queues[0].put(item)
+        except Exception as e:
+            log.warning("[%s] source failed: %s", name, e)
+        finally:
+            await queues[0].put(_DONE)
+
+    async def _apply(stage: Stage, st: StageStats, item: Any, outq: asyncio.Queue) -> None:
+        st.seen += 1
+        t0 = time.perf_counter()
+        try:
+            res = await stage.fn(item)
+        except Exception as e:
+            st.errors += 1
+            log.warning("[%s] %s: item dropped: %s", name, stage.name, e)
+            res = None
+        st.note(time.perf_counter() - t0)
+        if res is None:
+            st.dropped += 1
+            return
+        st.passed += 1
+        await outq.put(res)
+
+    async def _worker(stage: Stage, inq: asyncio.Queue, outq: asyncio.Queue) -> None:
+        while True:
+            item = await inq.get()
+            if item is _DONE:
+                await inq.put(_DONE)  # сигнал кінця — і сусіднім воркерам стадії
+                return
+            await _apply(stage, stats[stage.name], item, outq)
+
+    async def _run_stage(i: int, stage: Stage) -> None:
+        inq, outq = queues[i], queues[i + 1]
+        try:
+            if stage.barrier:
+                st = stats[stage.name]
+                items: List[Any] = []
+                while (item := await inq.get()) is not _DONE:
+                    items.append(item)
+                st.seen = len(items)
+                t0 = time.perf_counter()
+                try:
+                    res = list(await stage.fn(items) or [])
+                except Exception as e:
+                    st.errors += 1
+                    log.warning("[%s] %s failed: %s", name, stage.name, e)
+                    res = []
+                st.note(time.perf_counter() - t0)
+                st.passed, st.dropped = len(res), max(0, len(items) - len(res))
+                for item in res:
+                    await outq.put(item)
+            else:
+                await asyncio.gather(*(_worker(stage, inq, outq) for _ in range(stage.workers)))
+        finally:
+            await outq.put(_DONE)
+
+    async def _sink() -> None:
+        while (item := await queues[-1].get()) is not _DONE:
+            out.append(item)
+
+    await asyncio.gather(_feed(), *(_run_stage(i, s) for i, s in enumerate(stages)), _sink())
+    return out, stats
+
+
+def summary(stats: Dict[str, StageStats]) -> str:
+    return " | ".join(str(s) for s in stats.values())
+
+
+__all__ = ["Stage", "StageStats", "run_pipeline", "summary"]
@@ -7,6 +7,7 @@ from datetime import datetime, timezone
 from utils.db import get_conn
 from utils.settings import get_setting
 from services.pnl import calc_pnl_usd  # ← Додаємо імпорт
+from market_data.price_snapshot import get_price
 
 __all__ = ["manage_open_positions"]
 
@@ -22,20 +23,8 @@ def _get_setting_float(key: str, default: float) -> float:
 
 
 def _get_price(sym: str) -> Optional[float]:
-    for path in (
-            "services.market",
-            "services.price_provider",
-            "services.binance_price",
-            "services.binance",
-            "services.prices",
-    ):
-        try:
-            mod = __import__(path, fromlist=["get_price"])
-            if hasattr(mod, "get_price"):
-                return float(mod.get_price(sym))  # type: ignore[attr-defined]
-        except Exception:
-            continue
-    return None
+    # стрім → один знімок усіх цін /ticker/price на TTL (замість запиту на кожен трейд)
+    return get_price(sym)
 
 
 def _rr_eps() -> float:
@@ -0,0 +1,164 @@
+# services/scan_priority.py
+from __future__ import annotations
+import logging
+import math
+import threading
+from typing import Dict, List, Optional, Tuple
+
+log = logging.getLogger("scan_priority")
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Адаптивний пріоритет скану: кожна серія (symbol, tf) має оцінку «гарячості» 0..1 з того, що
+# скан і так рахує — ATR% (відносно медіани TF), відносний обсяг, близькість до гейту
+# (частка пройдених критеріїв) і відкриті позиції. Гарячі серії скануються кожен прохід,
+# сплячі — раз на max_skip проходів; понад бюджет (символів за прохід) — у порядку терміновості.
+# ───────────────────────────────────────────────────────────────────────────────
+
+W_VOL, W_RVOL, W_GATE = 0.4, 0.2, 0.4
+DECAY = 0.7        # остигання: оцінка падає не швидше ніж ×0.7 за прохід (росте — одразу)
+AGING = 0.1        # + до терміновості за кожен прохід понад свій інтервал (бюджет не морить голодом)
+HOT = 0.7
+
+
+class _State:
+    __slots__ = ("atr_pct", "rel_vol", "gate", "score", "waited")
+
+    def __init__(self) -> None:
+        self.atr_pct: Optional[float] = None
+        self.rel_vol: Optional[float] = None
+        self.gate: Optional[float] = None
+        self.score: Optional[float] = None   # None — ще не скановано: скануємо без черги
+        self.waited = 0                      # проходів з останнього скану
+
+
+_STATES: Dict[Tuple[str, str], _State] = {}
+_LAST: Dict[str, Dict[str, int]] = {}
+_LOCK = threading.Lock()
+
+
+def _finite(x) -> Optional[float]:
+    try:
+        x = float(x)
+    except (TypeError, ValueError):
+        return None
+    return x if math.isfinite(x) else None
+
+
+def _state(symbol: str, tf: str) -> _State:
+    key = (symbol.upper(), tf)
+    st = _STATES.get(key)
+    if st is None:
+        st = _STATES[key] = _State()
+    return st
+
+
+def observe_panel(symbols: List[str], tf: str, atr_pct, rel_vol) -> None:
+    """Волатильність і обсяг з панелі скану (вектори в порядку symbols)."""
+    with _LOCK:
+        for i, sym in enumerate(symbols):
+            st = _state(sym, tf)
+            st.atr_pct = _finite(atr_pct[i])
+            st.rel_vol = _finite(rel_vol[i])
+
+
+def observe_gate(symbol: str, tf: str, passed, needed) -> None:
+    """Близькість до гейту: частка пройдених критеріїв від усіх (повний підрахунок кандидата)."""
+    p, n = _finite(passed), _finite(needed)
+    if p is None or not n:
+        return
+    with _LOCK:
+        _state(symbol, tf).gate = min(1.0, max(0.0, p / n))
+
+
+def _median(xs: List[float]) -> Optional[float]:
+    if not xs:
+        return None
+    s = sorted(xs)
+    m = len(s) // 2
+    return s[m] if len(s) % 2 else 0.5 * (s[m - 1] + s[m])
+
+
+def _score(st: _State, atr_ref: Optional[float]) -> float:
+    vol = min(1.0, st.atr_pct / atr_ref / 2.0) if st.atr_pct is not None and atr_ref else 0.5
+    rvol = min(1.0, max(0.0, st.rel_vol / 2.0)) if st.rel_vol is not None else 0.5
+    gate = st.gate if st.gate is not None else 0.5
+    return W_VOL * vol + W_RVOL * rvol + W_GATE * gate
+
+
+def _exposure() -> Dict[str, int]:
+    """Відкриті угоди по символах — їх сканують завжди (супровід позиції)."""
+    try:
+        from utils.db import get_conn
+        with get_conn() as conn:
+            rows = conn.execute("SELECT symbol, COUNT(*) FROM trades WHERE status='OPEN' GROUP BY symbol").fetchall()
+        return {str(r[0]).upper(): int(r[1]) for r in rows}
+    except Exception as e:
+        log.debug("[scan_priority] exposure unavailable: %s", e)
+        return {}
+
+
+def interval(score: float, max_skip: int) -> int:
+    """Раз на скільки проходів сканувати: 1 для score >= HOT, max_skip для score=0 (геометрично)."""
+    cold = min(1.0, max(0.0, (HOT - score) / HOT))
+    return max(1, int(round(max(1, max_skip) ** cold)))
+
+
+def select(series: Dict[str, List[str]], max_skip: int = 8, budget: int = 0) -> Dict[str, List[str]]:
+    """
+    Які серії сканувати в цьому проході: «належні» за своїм інтервалом + з відкритими позиціями,
+    не більше budget символів (0 — без ліміту) у порядку терміновості. Порядок у межах TF — вихідний.
+    """
+    exposure = _exposure()
+    out: Dict[str, List[str]] = {}
+    due: List[Tuple[float, str, str]] = []
+    with _LOCK:
+        for tf, syms in series.items():
+            atr_ref = _median([s.atr_pct for k, s in _STATES.items() if k[1] == tf and s.atr_pct])
+            for sym in syms:
+                st = _state(sym, tf)
+                if exposure.get(sym.upper()):
+                    due.append((math.inf, tf, sym))
+                    continue
+                if st.score is None:
+                    due.append((10.0, tf, sym))
+                    continue
+                st.score = max(_score(st, atr_ref), DECAY * st.score)
+                over = st.waited + 1 - interval(st.score, max_skip)
+                if over >= 0:
+                    due.append((st.score + AGING * over, tf, sym))
+        due.sort(key=lambda d: -d[0])
+        picked = due[:budget] if budget > 0 else due
+        chosen = {(tf, sym) for _, tf, sym in picked}
+        for tf, syms in series.items():
+            for sym in syms:
+                st = _state(sym, tf)
+                if (tf, sym) in chosen:
+                    st.waited = 0
+                    if st.score is None:
+                        st.score = 1.0  # перше спостереження ще попереду — поки гаряча
+                else:
+                    st.waited += 1
+            out[tf] = [s for s in syms if (tf, s) in chosen]
+            total = len(syms)
+            hot = sum(1 for s in syms if (_STATES[(s.upper(), tf)].score or 0) >= HOT)
+            _LAST[tf] = {"total": total, "scan": len(out[tf]), "hot": hot,
+                         "deferred": sum(1 for _, t, _s in due[len(picked):] if t == tf)}
+    for tf, st in _LAST.items():
+        if tf in series:
+            log.info("[scan_priority] %s: scan %d/%d (hot %d, over budget %d)",
+                     tf, st["scan"], st["total"], st["hot"], st["deferred"])
+    return out
+
+
+def stats() -> Dict[str, Dict[str, int]]:
+    """Підсумок останнього вибору по TF: total / scan / hot / deferred — для /status і логів."""
+    with _LOCK:
+        return {tf: dict(s) for tf, s in _LAST.items()}
+
+
+def scores(tf: str) -> Dict[str, float]:
+    with _LOCK:
+        return {k[0]: s.score for k, s in _STATES.items() if k[1] == tf and s.score is not None}
+
+
+__all__ = ["interval", "observe_gate", "observe_panel", "scores", "select", "stats"]
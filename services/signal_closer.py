@@ -6,6 +6,7 @@ from typing import Optional
 from utils.db import get_conn
 from utils.settings import get_setting
 from services.pnl import calc_pnl_usd  # ← Додаємо імпорт
+from market_data.price_snapshot import get_price
 
 log = logging.getLogger("signal_closer")
 
@@ -123,20 +124,8 @@ def _has_neutral_signal(conn, trade_id: int) -> bool:
 
 
 def _get_price(sym: str) -> Optional[float]:
-    for path in (
-            "services.market",
-            "services.price_provider",
-            "services.binance_price",
-            "services.binance",
-            "services.prices",
-    ):
-        try:
-            mod = __import__(path, fromlist=["get_price"])
-            if hasattr(mod, "get_price"):
-                return float(mod.get_price(sym))  # type: ignore
-        except Exception:
-            continue
-    return None
+    # стрім → один знімок усіх цін /ticker/price на TTL (замість запиту на кожен трейд)
+    return get_price(sym)
 
 
 def _get_trade_size_usd(conn, trade_id: int) -> float:
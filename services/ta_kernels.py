@@ -0,0 +1,226 @@
+# services/ta_kernels.py
+from __future__ import annotations
+import logging
+import math
+import os
+from functools import lru_cache
+from typing import Any, Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+log = logging.getLogger("ta_kernels")
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Низькорівневі numpy-ядра для індикаторів (без pandas і зовнішніх пакетів)
+# ───────────────────────────────────────────────────────────────────────────────
+
+# Бекенд ядер: auto — numba (services.ta_kernels_numba), якщо встановлена, інакше numpy;
+# numpy — завжди numpy; numba — як auto, але з попередженням, якщо numba недоступна
+TA_BACKEND = (os.getenv("TA_BACKEND", "auto") or "auto").strip().lower()
+
+_UNSET: Any = object()
+_nb: Any = _UNSET
+
+
+def _numba() -> Optional[Any]:
+    """Модуль numba-ядер або None; резолвимо ліниво (імпорт numba ~0.5с — лише коли справді рахуємо)."""
+    global _nb
+    if _nb is _UNSET:
+        _nb = None
+        if TA_BACKEND in ("auto", "numba"):
+            try:
+                from services import ta_kernels_numba
+                _nb = ta_kernels_numba
+            except Exception as e:   # numba не встановлена / несумісна з numpy
+                (log.warning if TA_BACKEND == "numba" else log.debug)("[ta] numba backend unavailable: %s", e)
+    return _nb
+
+
+def _jit(name: str, *args: Any) -> Optional[np.ndarray]:
+    """Виклик numba-ядра; будь-яка помилка (компіляція тощо) — назавжди переходимо на numpy."""
+    global _nb
+    nb = _numba()
+    if nb is None:
+        return None
+    try:
+        return getattr(nb, name)(*args)
+    except Exception as e:
+        log.warning("[ta] numba kernel %s failed (%s) — falling back to numpy", name, e)
+        _nb = None
+        return None
+
+
+def use_backend(name: str) -> str:
+    """Перемикання бекенду в рантаймі (бенчмарк/паритет): auto | numpy | numba. Повертає активний."""
+    global TA_BACKEND, _nb
+    TA_BACKEND = name.strip().lower()
+    _nb = _UNSET
+    return backend()
+
+
+def backend() -> str:
+    return "numba" if _numba() is not None else "numpy"
+
+
+def warmup() -> str:
+    """JIT-компіляція ядер заздалегідь (на старті бота), щоб перший скан не платив за неї."""
+    nb = _numba()
+    if nb is not None:
+        _jit("warmup")
+    return backend()
+
+
+# Межа росту ваг d^-j у чанку: e^300 ≈ 1e130 — добуток з ціною/обсягом до 1e170 ще в межах float64
+_LOG_SCALE = 300.0
+_MAX_CHUNK = 1 << 16   # для дуже повільних EMA (N~1000+) — кілька чанків замість мегабайтних ваг
+
+
+@lru_cache(maxsize=64)
+def _weights(alpha: float) -> np.ndarray:
+    """d^-j для j < k (k — довжина чанку); кешуємо по alpha — періоди в боті одні й ті самі."""
+    d = 1.0 - alpha
+    k = max(1, min(_MAX_CHUNK, int(_LOG_SCALE / -math.log(d))))
+    p = d ** -np.arange(k, dtype=np.float64)
+    p.setflags(write=False)
+    return p
+
+
+def _ewm_finite(x: np.ndarray, alpha: float, seed, out: np.ndarray) -> None:
+    """
+    y[t] = alpha*x[t] + (1-alpha)*y[t-1], y[-1] = seed — замкнена форма по чанках:
+    y[s+t] = d^t * (d*y[s-1] + alpha * Σ_{j<=t} x[s+j] * d^-j).
+    Довжина чанку обмежена так, щоб d^-j не переповнювався (масштаб «скидається» на кожному чанку).
+    Працює вздовж останньої осі: x (n,) зі скалярним seed або (rows, n) з seed (rows, 1).
+    """
+    d = 1.0 - alpha
+    n = x.shape[-1]
+    p = _weights(alpha)        # 1, d^-1, d^-2, ...
+    k = p.size
+    state = seed
+    for s in range(0, n, k):
+        m = min(k, n - s)
+        seg = np.cumsum(x[..., s:s + m] * p[:m], axis=-1)
+        seg *= alpha
+        seg += d * state
+        seg /= p[:m]
+        out[..., s:s + m] = seg
+        state = seg[..., -1:]
+
+
+def ewm(a, alpha: float) -> np.ndarray:
+    """
+    Експоненційне згладжування з семантикою класичного циклу:
+    out[0] = a[0]; out[i] = alpha*a[i] + (1-alpha)*out[i-1].
+    NaN «заражає» все після себе (як і цикл); ±inf — рідкість, хвіст рахуємо циклом.
+    """
+    x = np.asarray(a, dtype=np.float64)
+    n = x.size
+    if n and not np.isnan(x[0]) and _numba() is not None:
+        res = _jit("ewm_rows", np.ascontiguousarray(x.reshape(1, n)), float(alpha))
+        if res is not None:
+            return res[0]
+    out = np.empty(n, dtype=np.float64)
+    if n == 0:
+        return out
+    if alpha >= 1.0:
+        out[:] = x
+        return out
+    bad = np.flatnonzero(~np.isfinite(x))
+    stop = int(bad[0]) if bad.size else n
+    if stop > 0:
+        out[0] = x[0]
+        if stop > 1:
+            _ewm_finite(x[1:stop], alpha, x[0], out[1:stop])
+    if stop < n:
+        if np.isnan(x[stop]):
+            out[stop:] = np.nan
+        else:
+            d = 1.0 - alpha
+            prev = out[stop - 1] if stop > 0 else x[stop]
+            out[stop] = x[stop] if stop == 0 else alpha * x[stop] + d * prev
+            for i in range(stop + 1, n):
+                out[i] = alpha * x[i] + d * out[i - 1]
+    return out
+
+
+def ewm_rows(a, alpha: float) -> np.ndarray:
+    """
+    ewm уздовж останньої осі для (n,) або (rows, n), рядки незалежні.
+    Провідні NaN рядка — «ще немає даних» (вирівнювання коротких історій): вихід там NaN,
+    out[start] = a[start], далі та сама рекурсія й семантика NaN/inf, що в ewm.
+    """
+    x = np.asarray(a, dtype=np.float64)
+    if x.size and _numba() is not None:
+        res = _jit("ewm_rows", np.ascontiguousarray(x.reshape(-1, x.shape[-1])), float(alpha))
+        if res is not None:
+            return res.reshape(x.shape)
+    if x.ndim == 1:
+        ok = np.flatnonzero(~np.isnan(x))
+        out = np.full(x.size, np.nan)
+        if ok.size:
+            out[ok[0]:] = ewm(x[ok[0]:], alpha)
+        return out
+    rows, n = x.shape
+    out = np.full((rows, n), np.nan)
+    if not x.size:
+        return out
+    if alpha >= 1.0:
+        out[:] = x
+        return out
+    valid = ~np.isnan(x)
+    has = valid.any(axis=1)
+    start = np.argmax(valid, axis=1)
+    r = np.flatnonzero(has)
+    # прийом зі seed: до start нулі, у start — x/alpha, тоді y[start] = alpha*(x/alpha) + d*0 = x[start]
+    z = np.where(np.arange(n) < start[:, None], 0.0, x)
+    z[r, start[r]] /= alpha
+    inf = np.isinf(z).any(axis=1)
+    fin = np.flatnonzero(has & ~inf)
+    if fin.size:
+        zf = z[fin]
+        buf = np.empty_like(zf)
+        _ewm_finite(zf, alpha, np.zeros((fin.size, 1)), buf)
+        out[fin] = buf
+    for i in np.flatnonzero(has & inf):   # рідкість: ±inf у рядку — рахуємо рядок циклом ewm
+        out[i, start[i]:] = ewm(x[i, start[i]:], alpha)
+    out[np.arange(n) < start[:, None]] = np.nan
+    return out
+
+
+_ROLL_OPS = {"sum": 0, "mean": 1, "std": 2, "min": 3, "max": 4}
+
+
+def rolling(a, w: int, op: str = "mean", ddof: int = 1) -> np.ndarray:
+    """
+    Ковзне вікно w уздовж останньої осі, як pandas rolling(w, min_periods=w):
+    перші w-1 значень NaN, NaN у вікні → NaN. op: sum | mean | std | min | max.
+    """
+    x = np.asarray(a, dtype=np.float64)
+    code = _ROLL_OPS[op]
+    out = np.full(x.shape, np.nan)
+    if not (0 < w <= x.shape[-1]):
+        return out
+    if _numba() is not None:
+        res = _jit("rolling", np.ascontiguousarray(x.reshape(-1, x.shape[-1])), int(w), code, int(ddof))
+        if res is not None:
+            return res.reshape(x.shape)
+    kw = {"ddof": ddof} if op == "std" else {}
+    out[..., w - 1:] = getattr(np, op)(sliding_window_view(x, w, axis=-1), axis=-1, **kw)
+    return out
+
+
+def ema_alpha(period: int, wilder: bool = False) -> float:
+    """2/(N+1) — класична EMA; 1/N — згладжування Вайлдера (RMA) для ATR/RSI/ADX."""
+    return 1.0 / period if wilder else 2.0 / (period + 1.0)
+
+
+def ema(a, period: int, wilder: bool = False) -> np.ndarray:
+    """EMA/RMA ряду; period <= 1 — ряд без змін (як у analyzer_core._ema)."""
+    x = np.asarray(a, dtype=np.float64)
+    if period <= 1 or x.size == 0:
+        return x.astype(float)
+    return ewm(x, ema_alpha(period, wilder))
+
+
+__all__ = ["TA_BACKEND", "backend", "ema", "ema_alpha", "ewm", "ewm_rows", "rolling", "use_backend", "warmup"]
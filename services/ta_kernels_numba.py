@@ -0,0 +1,87 @@
+# services/ta_kernels_numba.py
+from __future__ import annotations
+import numpy as np
+from numba import njit
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Numba-бекенд для services.ta_kernels (імпортується лише якщо numba встановлена).
+# Ті самі контракти, що й numpy-версії: рядки незалежні, провідні NaN — «ще немає даних»,
+# NaN усередині «заражає» хвіст (EWM) / вікно (rolling). cache=True — без перекомпіляції між запусками.
+# ───────────────────────────────────────────────────────────────────────────────
+
+OP_SUM, OP_MEAN, OP_STD, OP_MIN, OP_MAX = 0, 1, 2, 3, 4
+
+
+@njit(cache=True, nogil=True)
+def ewm_rows(x, alpha):
+    """y[start] = x[start]; y[i] = alpha*x[i] + (1-alpha)*y[i-1] — рекурсія як у класичному циклі."""
+    rows, n = x.shape
+    out = np.full((rows, n), np.nan)
+    d = 1.0 - alpha
+    for r in range(rows):
+        s = 0
+        while s < n and np.isnan(x[r, s]):
+            s += 1
+        if s == n:
+            continue
+        if alpha >= 1.0:
+            for i in range(s, n):
+                out[r, i] = x[r, i]
+            continue
+        y = x[r, s]
+        out[r, s] = y
+        for i in range(s + 1, n):
+            y = alpha * x[r, i] + d * y
+            out[r, i] = y
+    return out
+
+
+@njit(cache=True, nogil=True)
+def rolling(x, w, op, ddof):
+    """Ковзне вікно w (min_periods=w): NaN у вікні → NaN. std — двопрохідна, як np.std."""
+    rows, n = x.shape
+    out = np.full((rows, n), np.nan)
+    for r in range(rows):
+        for i in range(w - 1, n):
+            lo = i - w + 1
+            bad = False
+            if op == OP_MIN or op == OP_MAX:
+                acc = x[r, lo]
+                for j in range(lo, i + 1):
+                    v = x[r, j]
+                    if np.isnan(v):
+                        bad = True
+                        break
+                    if (op == OP_MIN and v < acc) or (op == OP_MAX and v > acc):
+                        acc = v
+                if not bad:
+                    out[r, i] = acc
+                continue
+            acc = 0.0
+            for j in range(lo, i + 1):
+                v = x[r, j]
+                if np.isnan(v):
+                    bad = True
+                    break
+                acc += v
+            if bad:
+                continue
+            if op == OP_SUM:
+                out[r, i] = acc
+            elif op == OP_MEAN:
+                out[r, i] = acc / w
+            else:
+                mean = acc / w
+                ss = 0.0
+                for j in range(lo, i + 1):
+                    dv = x[r, j] - mean
+                    ss += dv * dv
+                out[r, i] = np.sqrt(ss / (w - ddof))
+    return out
+
+
+def warmup() -> None:
+    """Компіляція (або підвантаження з кешу) обох ядер — щоб перший скан не платив за JIT."""
+    x = np.ones((1, 4))
+    ewm_rows(x, 0.5)
+    rolling(x, 2, OP_STD, 1)
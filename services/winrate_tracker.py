@@ -1,9 +1,10 @@
 # services/winrate_tracker.py
 from __future__ import annotations
-import os, sqlite3, time
+import asyncio, os, sqlite3, time
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 from telegram import Bot
+from telegram_bot.outbox import PRIO_REPORT, get_outbox
 
 DB_PATH = os.getenv("DB_PATH", "storage/app.db")
 TZ = ZoneInfo(os.getenv("TZ_NAME", "Europe/Kyiv"))
@@ -31,11 +32,8 @@ async def winrate_job(bot: Bot, days: int = 7) -> None:
     wins, losses, wr = _winrate(rows)
     txt = f"📈 Winrate {days}d: {wr:.1f}% (WIN {wins} / LOSS {losses})"
     uids = [r[1] for r in rows]
-    for uid in sorted(set(uids)):
-        try:
-            await bot.send_message(chat_id=uid, text=txt)
-        except Exception:
-            pass
+    outbox = get_outbox(bot)
+    await asyncio.gather(*(outbox.send(uid, txt, priority=PRIO_REPORT) for uid in sorted(set(uids))))
 
 async def winrate_now(bot: Bot, chat_id: int, days: int = 7) -> None:
     since = int((datetime.now(TZ) - timedelta(days=days)).timestamp())
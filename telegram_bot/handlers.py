@@ -17,8 +17,8 @@ from core_config import CFG
 from router.analyzer_router import pick_route
 from utils.openrouter import chat_completion
 from utils.ta_formatter import format_ta_report
-from market_data.candles import get_ohlcv
-from market_data.binance_rank import get_all_usdt_24h, get_top_by_quote_volume_usdt
+from market_data.candles import get_series
+from market_data.binance_rank import get_top_by_quote_volume_usdt, get_top_gainers_usdt
 from utils.news_fetcher import get_latest_news
 from telegram_bot.panel import panel_keyboard, apply_panel_action
 from utils.user_settings import ensure_user_row, get_user_settings
@@ -457,7 +457,19 @@ async def guide(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await _send(update, context, text, parse_mode="Markdown")
 
 async def ping(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await _send(update, context, f"🏓 pong all ok | AI model: {_current_ai_model()}")
+    weight = ""
+    try:
+        from market_data.rate_limiter import get_limiter
+        u = get_limiter().usage()
+        used = u["server_used_1m"] if u["server_used_1m"] is not None else "?"
+        weight = f" | Binance weight: {used}/{u['budget_1m']} (throttled {u['throttled']})"
+        from market_data.circuit import circuits
+        down = [name.split("/api/v3", 1)[-1] for name, c in circuits().items() if c["state"] != "closed"]
+        if down:
+            weight += f" | circuit open: {', '.join(down)}"
+    except Exception:
+        pass
+    await _send(update, context, f"🏓 pong all ok | AI model: {_current_ai_model()}{weight}")
 
 # ──────────────────────────────────────────────────────────────────────────────
 # /req — залежність BTC/ETH → <SYMBOL> [TF]
@@ -510,15 +522,17 @@ def _fmt(x, d=3, dash="-"):
 
 async def _dependency_report(symbol: str, timeframe: str, limit: int = 300) -> str:
     """Рахує ρ/β до BTC/ETH та Δ ratio; повертає Markdown блок."""
-    t_data = get_ohlcv(symbol, timeframe, limit)
-    b_data = get_ohlcv("BTCUSDT", timeframe, limit)
-    e_data = get_ohlcv("ETHUSDT", timeframe, limit)
-    if not t_data or not b_data or not e_data:
+    t_data, b_data, e_data = await asyncio.gather(
+        asyncio.to_thread(get_series, symbol, timeframe, limit),
+        asyncio.to_thread(get_series, "BTCUSDT", timeframe, limit),
+        asyncio.to_thread(get_series, "ETHUSDT", timeframe, limit),
+    )
+    if not len(t_data) or not len(b_data) or not len(e_data):
         return "_No data to compute dependency_"
 
-    t_close = [x["close"] for x in t_data]
-    b_close = [x["close"] for x in b_data]
-    e_close = [x["close"] for x in e_data]
+    t_close = t_data.close.tolist()
+    b_close = b_data.close.tolist()
+    e_close = e_data.close.tolist()
 
     t_ret = _pct(t_close); b_ret = _pct(b_close); e_ret = _pct(e_close)
 
@@ -708,10 +722,9 @@ def _chunk_strings(lst: List[str], n: int) -> List[List[str]]:
     return [lst[i:i+n] for i in range(0, len(lst), n)]
 
 async def _send_top(update: Update, context: ContextTypes.DEFAULT_TYPE, mode: str):
+    # universe тримає готові сортування в пам'яті; to_thread — лише на випадок першого завантаження
     if mode == TOP_MODE_GAINERS:
-        all_rows = await asyncio.to_thread(get_all_usdt_24h)
-        all_rows.sort(key=lambda x: x["priceChangePercent"], reverse=True)
-        rows = all_rows[:20]
+        rows = await asyncio.to_thread(get_top_gainers_usdt, 20)
         header = "🏆 *Топ-20 USDT пар — Gainers (24h %)*\n"
     else:
         rows = await asyncio.to_thread(get_top_by_quote_volume_usdt, 20)
@@ -791,8 +804,8 @@ async def on_cb_analyze_all(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 if not symbol:
                     continue
 
-                data = get_ohlcv(symbol, user_tf, CFG["analyze_limit"])
-                last_close = data[-1]["close"] if data else float("nan")
+                data = await asyncio.to_thread(get_series, symbol, user_tf, CFG["analyze_limit"])
+                last_close = float(data.close[-1]) if len(data) else float("nan")
 
                 block = [
                     f"SYMBOL: {symbol}",
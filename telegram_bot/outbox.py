@@ -0,0 +1,418 @@
+# telegram_bot/outbox.py
+from __future__ import annotations
+import asyncio
+import heapq
+import inspect
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple, Union
+
+try:
+    from telegram.error import BadRequest, NetworkError, RetryAfter, TimedOut
+except Exception:  # pragma: no cover — без PTB модуль не використовується
+    BadRequest = NetworkError = RetryAfter = TimedOut = None  # type: ignore
+
+log = logging.getLogger("outbox")
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Центральний вихідний диспетчер Telegram: усі розсилки (автопост, winrate, daily, top-5)
+# йдуть через одну чергу з пріоритетами і token bucket-ами — глобальним і на кожен чат.
+# Різні чати шлються конкурентно (до TG_SEND_CONCURRENCY), в одному чаті — строго по черзі.
+# RetryAfter (429) ставить на паузу весь вихід і повертає повідомлення на його місце в черзі;
+# кілька edit одного повідомлення, що ще чекають, зливаються в один (перемагає останній текст).
+# Глобальні ліміти для всіх шляхів (і прямих send_message/reply_text хендлерів) тримає
+# AIORateLimiter(max_retries=0) у main.build_app; outbox поверх нього відповідає за пріоритет,
+# порядок у чаті й RetryAfter розсилок. Власні bucket-и outbox мають ті самі ліміти, тож
+# розсилки не гальмуються вдвічі — лише не займають весь глобальний ліміт залпом.
+# ───────────────────────────────────────────────────────────────────────────────
+
+PRIO_HIGH = 0      # інтерактив / edit
+PRIO_SIGNAL = 10   # автопост-сигнали
+PRIO_REPORT = 20   # звіти (daily / winrate / top-5)
+
+GLOBAL_RATE = float(os.getenv("TG_GLOBAL_RATE", "30"))                  # msg/s на бота
+PRIVATE_RATE = float(os.getenv("TG_CHAT_RATE", "1"))                    # msg/s в приватний чат
+GROUP_RATE_PER_MIN = float(os.getenv("TG_GROUP_RATE_PER_MIN", "20"))    # msg/min у групу/канал
+CONCURRENCY = max(1, int(os.getenv("TG_SEND_CONCURRENCY", "8")))
+MAX_RETRIES = max(0, int(os.getenv("TG_SEND_MAX_RETRIES", "3")))
+_LATENCY_WINDOW = 512
+
+
+class _Bucket:
+    """Token bucket: rate токенів/с, не більше burst. wait() — скільки чекати до наступного токена."""
+
+    __slots__ = ("rate", "burst", "tokens", "ts")
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = max(1e-6, float(rate))
+        self.burst = max(1.0, float(burst))
+        self.tokens = self.burst
+        self.ts = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.ts) * self.rate)
+        self.ts = now
+
+    def wait(self, now: float) -> float:
+        self._refill(now)
+        return 0.0 if self.tokens >= 1.0 else (1.0 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1.0
+
+
+class Delivery:
+    """Підтвердження доставки: ok, message (telegram.Message | True для edit), error, спроби і затримки."""
+
+    __slots__ = ("ok", "message", "error", "attempts", "queued_ms", "latency_ms")
+
+    def __init__(self, ok: bool, message: Any = None, error: Optional[BaseException] = None,
+                 attempts: int = 0, queued_ms: float = 0.0, latency_ms: float = 0.0) -> None:
+        self.ok = ok
+        self.message = message
+        self.error = error
+        self.attempts = attempts
+        self.queued_ms = queued_ms
+        self.latency_ms = latency_ms
+
+    @property
+    def message_id(self) -> Optional[int]:
+        return getattr(self.message, "message_id", None)
+
+    def __repr__(self) -> str:
+        state = "ok" if self.ok else f"fail({self.error})"
+        return f"Delivery({state}, attempts={self.attempts}, latency={self.latency_ms:.0f}ms)"
+
+
+AckFn = Callable[[Delivery], Union[None, Awaitable[None]]]
+
+
+class _Job:
+    __slots__ = ("prio", "seq", "method", "chat_id", "kwargs", "acks", "futures", "t_in", "t_out", "attempts", "key",
+                 "not_before")
+
+    def __init__(self, prio: int, seq: int, method: str, chat_id: Union[int, str], kwargs: Dict[str, Any],
+                 key: Optional[Tuple[Any, Any]] = None) -> None:
+        self.prio, self.seq = prio, seq
+        self.method, self.chat_id, self.kwargs = method, chat_id, kwargs
+        self.acks: List[AckFn] = []
+        self.futures: List[asyncio.Future] = []
+        self.t_in = time.monotonic()
+        self.t_out = 0.0
+        self.attempts = 0
+        self.key = key
+        self.not_before = 0.0  # monotonic: повтор після мережевої помилки — не раніше
+
+    def __lt__(self, other: "_Job") -> bool:
+        return (self.prio, self.seq) < (other.prio, other.seq)
+
+
+def _is_group(chat_id: Union[int, str]) -> bool:
+    # групи/канали мають від'ємний id або @username
+    s = str(chat_id)
+    return s.startswith("-") or s.startswith("@")
+
+
+def _retry_after_sec(e: BaseException) -> float:
+    ra = getattr(e, "retry_after", 1)
+    return float(ra.total_seconds() if hasattr(ra, "total_seconds") else ra)
+
+
+class Outbox:
+    """
+    Черга вихідних повідомлень одного бота. send()/edit() не блокують: повертають Future[Delivery]
+    і (опційно) викликають on_ack(delivery) після доставки або остаточної помилки.
+    """
+
+    def __init__(self, bot, *, global_rate: float = GLOBAL_RATE, private_rate: float = PRIVATE_RATE,
+                 group_rate_per_min: float = GROUP_RATE_PER_MIN, concurrency: int = CONCURRENCY,
+                 max_retries: int = MAX_RETRIES) -> None:
+        self.bot = bot
+        self.private_rate = private_rate
+        self.group_rate = group_rate_per_min / 60.0
+        self.group_burst = max(1.0, group_rate_per_min)  # як AIORateLimiter: хвилинний ліміт можна вибрати залпом
+        self.max_retries = max_retries
+        self._global = _Bucket(global_rate, global_rate)
+        self._chats: Dict[str, _Bucket] = {}
+        self._heap: List[_Job] = []
+        self._edits: Dict[Tuple[Any, Any], _Job] = {}
+        self._busy: set = set()                # чати з повідомленням у дорозі
+        self._paused_until = 0.0
+        self._slots = asyncio.Semaphore(max(1, int(concurrency)))
+        self._wake = asyncio.Event()
+        self._seq = itertools.count()
+        self._inflight: Dict[int, _Job] = {}
+        self._tasks: set = set()
+        self._runner: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._latency: Deque[float] = deque(maxlen=_LATENCY_WINDOW)
+        self._queued: Deque[float] = deque(maxlen=_LATENCY_WINDOW)
+        self._counts = {"sent": 0, "failed": 0, "retried": 0, "coalesced": 0, "retry_after": 0}
+
+    # ── публічне API ────────────────────────────────────────────────────────────
+    def send(self, chat_id: Union[int, str], text: str, *, priority: int = PRIO_SIGNAL,
+             on_ack: Optional[AckFn] = None, **kwargs) -> "asyncio.Future[Delivery]":
+        """bot.send_message(chat_id, text, **kwargs) через чергу."""
+        return self._submit(_Job(priority, next(self._seq), "send_message", chat_id,
+                                 {"chat_id": chat_id, "text": text, **kwargs}), on_ack)
+
+    def edit(self, chat_id: Union[int, str], message_id: int, text: str, *, priority: int = PRIO_HIGH,
+             on_ack: Optional[AckFn] = None, **kwargs) -> "asyncio.Future[Delivery]":
+        """bot.edit_message_text; ще не відправлений edit того ж повідомлення замінюється новим."""
+        key = (str(chat_id), int(message_id))
+        kw = {"chat_id": chat_id, "message_id": message_id, "text": text, **kwargs}
+        job = self._edits.get(key)
+        if job is not None:
+            # місце в черзі — найраніше, текст — останній
+            job.kwargs = kw
+            job.prio = min(job.prio, priority)
+            heapq.heapify(self._heap)
+            self._counts["coalesced"] += 1
+            return self._attach(job, on_ack)
+        job = _Job(priority, next(self._seq), "edit_message_text", chat_id, kw, key)
+        self._edits[key] = job
+        return self._submit(job, on_ack)
+
+    async def flush(self, timeout: Optional[float] = None) -> bool:
+        """Чекає, доки черга і всі відправки в дорозі завершаться. False — вийшов timeout."""
+        futs = [f for j in (*self._heap, *self._inflight.values()) for f in j.futures if not f.done()]
+        if not futs:
+            return True
+        _, pending = await asyncio.wait(futs, timeout=timeout)
+        return not pending
+
+    async def close(self, timeout: float = 10.0) -> None:
+        """Дочекатися черги (до timeout) і зупинити диспетчер; недоставлене — ack з помилкою."""
+        if not await self.flush(timeout):
+            log.warning("[outbox] close: %d message(s) undelivered", len(self._heap) + len(self._inflight))
+        if self._runner is not None:
+            self._runner.cancel()
+        for t in list(self._tasks):
+            t.cancel()
+        for job in [*self._heap, *self._inflight.values()]:
+            await self._finish(job, Delivery(False, error=asyncio.CancelledError()))
+        self._heap.clear()
+        self._inflight.clear()
+        self._edits.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Лічильники + затримки доставки (queued — очікування в черзі, latency — від submit до ack)."""
+        def pct(xs: Deque[float], q: float) -> float:
+            if not xs:
+                return 0.0
+            s = sorted(xs)
+            return s[min(len(s) - 1, int(q * len(s)))]
+        return {
+            **self._counts, "pending": len(self._heap), "in_flight": len(self._inflight),
+            "queued_p50_ms": pct(self._queued, 0.5), "queued_p95_ms": pct(self._queued, 0.95),
+            "latency_p50_ms": pct(self._latency, 0.5), "latency_p95_ms": pct(self._latency, 0.95),
+            "latency_max_ms": max(self._latency, default=0.0),
+        }
+
+    # ── внутрішнє ───────────────────────────────────────────────────────────────
+    def _attach(self, job: _Job, on_ack: Optional[AckFn]) -> "asyncio.Future[Delivery]":
+        fut = asyncio.get_running_loop().create_future()
+        job.futures.append(fut)
+        if on_ack is not None:
+            job.acks.append(on_ack)
+        return fut
+
+    def _submit(self, job: _Job, on_ack: Optional[AckFn]) -> "asyncio.Future[Delivery]":
+        fut = self._attach(job, on_ack)
+        heapq.heappush(self._heap, job)
+        self._ensure_runner()
+        self._wake.set()
+        return fut
+
+    def _ensure_runner(self) -> None:
+        if self._runner is None or self._runner.done():
+            self._loop = asyncio.get_running_loop()
+            self._runner = self._loop.create_task(self._run(), name="tg-outbox")
+
+    def _bucket(self, chat_id: Union[int, str]) -> _Bucket:
+        key = str(chat_id)
+        b = self._chats.get(key)
+        if b is None:
+            b = (_Bucket(self.group_rate, self.group_burst) if _is_group(chat_id)
+                 else _Bucket(self.private_rate, 1.0))
+            self._chats[key] = b
+        return b
+
+    def _pick(self, now: float) -> Tuple[Optional[_Job], float]:
+        """Найпріоритетніше повідомлення, чий чат вільний і має токен; інакше — скільки чекати."""
+        skipped: List[_Job] = []
+        picked: Optional[_Job] = None
+        wait = float("inf")
+        seen: set = set()
+        while self._heap:
+            job = heapq.heappop(self._heap)
+            ck = str(job.chat_id)
+            if ck in self._busy or ck in seen:
+                # у чаті вже щось летить/стоїть попереду — порядок у чаті зберігаємо
+                seen.add(ck)
+                skipped.append(job)
+                continue
+            seen.add(ck)
+            if job.not_before > now:
+                # відкладений повтор тримає свій чат (порядок), інші чати йдуть далі
+                wait = min(wait, job.not_before - now)
+                skipped.append(job)
+                continue
+            w = self._bucket(job.chat_id).wait(now)
+            if w > 0:
+                wait = min(wait, w)
+                skipped.append(job)
+                continue
+            picked = job
+            break
+        for j in skipped:
+            heapq.heappush(self._heap, j)
+        return picked, wait
+
+    async def _sleep_or_wake(self, sec: float) -> None:
+        self._wake.clear()
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout=None if sec == float("inf") else max(0.0, sec))
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self) -> None:
+        while True:
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            gw = self._global.wait(now)
+            if gw > 0:
+                await asyncio.sleep(gw)
+                continue
+            job, wait = self._pick(now)
+            if job is None:
+                await self._sleep_or_wake(wait)
+                continue
+            await self._slots.acquire()
+            now = time.monotonic()
+            self._global.take(now)
+            self._bucket(job.chat_id).take(now)
+            if job.key is not None:
+                self._edits.pop(job.key, None)  # з цього моменту новий edit — окрема відправка
+            self._busy.add(str(job.chat_id))
+            self._inflight[job.seq] = job
+            t = asyncio.get_running_loop().create_task(self._deliver(job))
+            self._tasks.add(t)
+            t.add_done_callback(self._tasks.discard)
+
+    async def _deliver(self, job: _Job) -> None:
+        d: Optional[Delivery] = None
+        try:
+            job.attempts += 1
+            if job.attempts == 1:
+                job.t_out = time.monotonic()
+                self._queued.append((job.t_out - job.t_in) * 1000.0)
+            try:
+                d = Delivery(True, await getattr(self.bot, job.method)(**job.kwargs), attempts=job.attempts)
+            except Exception as e:
+                d = await self._on_error(job, e)
+        finally:
+            # слот і чат звільняємо до on_ack — підтвердження не гальмує наступні відправки
+            self._busy.discard(str(job.chat_id))
+            self._slots.release()
+            self._wake.set()
+        try:
+            if d is not None:
+                await self._finish(job, d)
+        finally:
+            self._inflight.pop(job.seq, None)
+
+    async def _on_error(self, job: _Job, e: Exception) -> Optional[Delivery]:
+        """Delivery — остаточний результат; None — повідомлення повернуто в чергу."""
+        requeue = False
+        if RetryAfter is not None and isinstance(e, RetryAfter):
+            sec = _retry_after_sec(e)
+            self._counts["retry_after"] += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + sec)
+            log.warning("[outbox] 429 RetryAfter %.1fs (chat=%s) — pause", sec, job.chat_id)
+            requeue = job.attempts <= self.max_retries
+        elif BadRequest is not None and isinstance(e, BadRequest):
+            if "not modified" in str(e).lower():
+                return Delivery(True, True, attempts=job.attempts)  # edit без змін — не помилка
+        elif NetworkError is not None and isinstance(e, NetworkError):
+            # TimedOut: запит міг дійти — send_message не повторюємо (дубль у чаті), edit ідемпотентний
+            retryable = not (isinstance(e, TimedOut) and job.method == "send_message")
+            requeue = retryable and job.attempts <= self.max_retries
+            if requeue:
+                # бекоф — часом «не раніше», а не сном у воркері: решта чатів не чекає
+                job.not_before = time.monotonic() + min(2.0 ** job.attempts, 10.0)
+        if requeue:
+            self._counts["retried"] += 1
+            self._requeue(job)
+            return None
+        log.warning("[outbox] %s to %s failed: %s", job.method, job.chat_id, e)
+        return Delivery(False, error=e, attempts=job.attempts)
+
+    def _requeue(self, job: _Job) -> None:
+        newer = self._edits.get(job.key) if job.key is not None else None
+        if newer is not None:
+            # поки чекали — прийшов новіший edit того ж повідомлення: старий текст уже не потрібен
+            newer.futures.extend(job.futures)
+            newer.acks.extend(job.acks)
+            self._counts["coalesced"] += 1
+            return
+        if job.key is not None:
+            self._edits[job.key] = job
+        heapq.heappush(self._heap, job)  # той самий (prio, seq) — те саме місце в черзі
+
+    async def _finish(self, job: _Job, d: Delivery) -> None:
+        now = time.monotonic()
+        d.latency_ms = (now - job.t_in) * 1000.0
+        d.queued_ms = ((job.t_out or now) - job.t_in) * 1000.0
+        self._latency.append(d.latency_ms)
+        self._counts["sent" if d.ok else "failed"] += 1
+        # спершу on_ack (напр. ts_sent у БД), потім future — хто чекає доставку, бачить і її наслідки
+        for ack in job.acks:
+            try:
+                r = ack(d)
+                if inspect.isawaitable(r):
+                    await r
+            except Exception as e:
+                log.warning("[outbox] on_ack failed: %s", e)
+        for f in job.futures:
+            if not f.done():
+                f.set_result(d)
+
+
+# ── один Outbox на бота (в межах поточного event loop) ─────────────────────────
+_OUTBOXES: Dict[int, Outbox] = {}
+_LOCK = threading.Lock()
+
+
+def get_outbox(bot) -> Outbox:
+    """Outbox для бота; при зміні event loop (рестарт Application) створюється новий."""
+    loop = asyncio.get_running_loop()
+    with _LOCK:
+        ob = _OUTBOXES.get(id(bot))
+        if ob is None or ob.bot is not bot or (ob._loop is not None and ob._loop is not loop):
+            ob = Outbox(bot)
+            _OUTBOXES[id(bot)] = ob
+        return ob
+
+
+async def close_outboxes(*_args, timeout: float = 10.0) -> None:
+    """Для Application.post_shutdown: дослати чергу і зупинити диспетчери."""
+    with _LOCK:
+        boxes = list(_OUTBOXES.values())
+        _OUTBOXES.clear()
+    for ob in boxes:
+        try:
+            await ob.close(timeout)
+            log.info("[outbox] closed: %s", ob.stats())
+        except Exception as e:
+            log.warning("[outbox] close failed: %s", e)
+
+
+__all__ = ["Delivery", "Outbox", "PRIO_HIGH", "PRIO_REPORT", "PRIO_SIGNAL", "close_outboxes", "get_outbox"]
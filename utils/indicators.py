@@ -1,138 +1,90 @@
 import numpy as np
 import pandas as pd
 
+from services.indicator_engine import compute, from_frame
+
+# Обгортки pandas над services.indicator_engine: RSI/ATR/ADX тут — ковзні середні (smoothing="sma").
+
+
+def _bars(series: pd.Series) -> dict:
+    c = series.to_numpy(dtype=float)
+    return {"open": c, "high": c, "low": c, "close": c, "volume": np.ones(c.size)}
+
 
 def ema(series: pd.Series, period: int) -> pd.Series:
-    return series.ewm(span=period, adjust=False).mean()
+    return pd.Series(compute("ema", _bars(series), period=period), index=series.index)
 
 
 def rsi(series: pd.Series, period: int = 14) -> pd.Series:
-    delta = series.diff()
-    gain = np.where(delta > 0, delta, 0)
-    loss = np.where(delta < 0, -delta, 0)
-    avg_gain = pd.Series(gain).rolling(period).mean()
-    avg_loss = pd.Series(loss).rolling(period).mean()
-    rs = avg_gain / avg_loss
-    return 100 - (100 / (1 + rs))
+    return pd.Series(compute("rsi", _bars(series), period=period, smoothing="sma"), index=series.index)
 
 
 def stoch_rsi(series: pd.Series, period: int = 14, k: int = 14, d: int = 3) -> pd.DataFrame:
-    rsi_series = rsi(series, period)
-    min_rsi = rsi_series.rolling(k).min()
-    max_rsi = rsi_series.rolling(k).max()
-    stoch = (rsi_series - min_rsi) / (max_rsi - min_rsi) * 100
-    k_line = stoch.rolling(d).mean()
-    d_line = k_line.rolling(d).mean()
-    return pd.DataFrame({"STOCHRSI_K": k_line, "STOCHRSI_D": d_line})
+    st = compute("stochrsi", _bars(series), period=period, stoch=k, k=d, d=d, smoothing="sma")
+    return pd.DataFrame({"STOCHRSI_K": st["k"] * 100, "STOCHRSI_D": st["d"] * 100}, index=series.index)
 
 
 def macd(series: pd.Series, fast: int = 12, slow: int = 26, signal: int = 9) -> pd.DataFrame:
-    ema_fast = ema(series, fast)
-    ema_slow = ema(series, slow)
-    macd_line = ema_fast - ema_slow
-    signal_line = ema(macd_line, signal)
-    return pd.DataFrame({"MACD": macd_line, "MACD_SIGNAL": signal_line})
+    m = compute("macd", _bars(series), fast=fast, slow=slow, signal=signal)
+    return pd.DataFrame({"MACD": m["macd"], "MACD_SIGNAL": m["signal"]}, index=series.index)
 
 
 def atr(df: pd.DataFrame, period: int = 14) -> pd.Series:
-    high_low = df["high"] - df["low"]
-    high_close = (df["high"] - df["close"].shift()).abs()
-    low_close = (df["low"] - df["close"].shift()).abs()
-    tr = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
-    return tr.rolling(period).mean()
+    return pd.Series(from_frame(df).get("atr", period=period, smoothing="sma"), index=df.index)
 
 
 def bollinger_bands(series: pd.Series, period: int = 20, std_factor: float = 2.0) -> pd.DataFrame:
-    sma = series.rolling(period).mean()
-    std = series.rolling(period).std()
-    upper = sma + std_factor * std
-    lower = sma - std_factor * std
-    pct_b = (series - lower) / (upper - lower)
-    return pd.DataFrame({"BB_UPPER": upper, "BB_LOWER": lower, "PCTB": pct_b})
+    bb = compute("bb", _bars(series), period=period, mult=std_factor)
+    return pd.DataFrame({"BB_UPPER": bb["upper"], "BB_LOWER": bb["lower"], "PCTB": bb["pct_b"]}, index=series.index)
 
 
 def obv(df: pd.DataFrame) -> pd.Series:
-    direction = np.sign(df["close"].diff()).fillna(0)
-    return (direction * df["volume"]).cumsum()
+    return pd.Series(from_frame(df).get("obv"), index=df.index)
 
 
 def mfi(df: pd.DataFrame, period: int = 14) -> pd.Series:
-    tp = (df["high"] + df["low"] + df["close"]) / 3
-    mf = tp * df["volume"]
-    pos_mf = np.where(tp > tp.shift(1), mf, 0)
-    neg_mf = np.where(tp < tp.shift(1), mf, 0)
-    pos_mf_sum = pd.Series(pos_mf).rolling(period).sum()
-    neg_mf_sum = pd.Series(neg_mf).rolling(period).sum()
-    mfr = pos_mf_sum / neg_mf_sum
-    return 100 - (100 / (1 + mfr))
+    return pd.Series(from_frame(df).get("mfi", period=period), index=df.index)
 
 
 def adx(df: pd.DataFrame, period: int = 14) -> pd.Series:
-    plus_dm = df["high"].diff()
-    minus_dm = df["low"].diff().abs()
-    plus_dm = np.where((plus_dm > minus_dm) & (plus_dm > 0), plus_dm, 0.0)
-    minus_dm = np.where((minus_dm > plus_dm) & (df["low"].diff() < 0), minus_dm, 0.0)
-
-    tr = pd.concat([
-        (df["high"] - df["low"]),
-        (df["high"] - df["close"].shift()).abs(),
-        (df["low"] - df["close"].shift()).abs()
-    ], axis=1).max(axis=1)
-
-    atr_series = tr.rolling(period).mean()
-
-    plus_di = 100 * (pd.Series(plus_dm).rolling(period).sum() / atr_series)
-    minus_di = 100 * (pd.Series(minus_dm).rolling(period).sum() / atr_series)
-    dx = (abs(plus_di - minus_di) / (plus_di + minus_di)) * 100
-    return dx.rolling(period).mean()
+    return pd.Series(from_frame(df).get("adx", period=period, smoothing="sma"), index=df.index)
 
 
 def cci(df: pd.DataFrame, period: int = 20) -> pd.Series:
-    tp = (df["high"] + df["low"] + df["close"]) / 3
-    sma = tp.rolling(period).mean()
-    mad = (tp - sma).abs().rolling(period).mean()
-    return (tp - sma) / (0.015 * mad)
+    return pd.Series(from_frame(df).get("cci", period=period), index=df.index)
 
 
 def fibonacci_pivots(df: pd.DataFrame) -> pd.DataFrame:
-    last = df.iloc[-2]  # попередня свічка
-    high, low, close = last["high"], last["low"], last["close"]
-    pivot = (high + low + close) / 3
-    r1 = pivot + (high - low) * 0.382
-    r2 = pivot + (high - low) * 0.618
-    r3 = pivot + (high - low) * 1.0
-    s1 = pivot - (high - low) * 0.382
-    s2 = pivot - (high - low) * 0.618
-    s3 = pivot - (high - low) * 1.0
-    return pd.DataFrame([{
-        "FIB_PIVOT": pivot, "FIB_R1": r1, "FIB_R2": r2, "FIB_R3": r3,
-        "FIB_S1": s1, "FIB_S2": s2, "FIB_S3": s3
-    }], index=[df.index[-1]])
+    # рівні з попередньої свічки — значення останнього бару
+    piv = from_frame(df).get("pivots", kind="fib")
+    return pd.DataFrame([{("FIB_" + k.upper() if k != "pivot" else "FIB_PIVOT"): v[-1] for k, v in piv.items()}],
+                        index=[df.index[-1]])
 
 
 def compute_indicators(df: pd.DataFrame) -> pd.DataFrame:
-    df["EMA50"] = ema(df["close"], 50)
-    df["EMA200"] = ema(df["close"], 200)
-
-    macd_df = macd(df["close"])
-    df["MACD"] = macd_df["MACD"]
-    df["MACD_SIGNAL"] = macd_df["MACD_SIGNAL"]
-
-    df["RSI"] = rsi(df["close"])
-    stoch_df = stoch_rsi(df["close"])
-    df["STOCHRSI_K"] = stoch_df["STOCHRSI_K"]
-    df["STOCHRSI_D"] = stoch_df["STOCHRSI_D"]
-
-    df["ATR"] = atr(df)
-    bb_df = bollinger_bands(df["close"])
-    df["BB_UPPER"] = bb_df["BB_UPPER"]
-    df["BB_LOWER"] = bb_df["BB_LOWER"]
-    df["PCTB"] = bb_df["PCTB"]
-
-    df["OBV"] = obv(df)
-    df["MFI"] = mfi(df)
-    df["ADX"] = adx(df)
-    df["CCI"] = cci(df)
+    fr = from_frame(df)
+    df["EMA50"] = fr.get("ema", period=50)
+    df["EMA200"] = fr.get("ema", period=200)
+
+    m = fr.get("macd", fast=12, slow=26, signal=9)
+    df["MACD"] = m["macd"]
+    df["MACD_SIGNAL"] = m["signal"]
+
+    df["RSI"] = fr.get("rsi", period=14, smoothing="sma")
+    st = fr.get("stochrsi", period=14, stoch=14, k=3, d=3, smoothing="sma")
+    df["STOCHRSI_K"] = st["k"] * 100
+    df["STOCHRSI_D"] = st["d"] * 100
+
+    df["ATR"] = fr.get("atr", period=14, smoothing="sma")
+    bb = fr.get("bb", period=20, mult=2.0)
+    df["BB_UPPER"] = bb["upper"]
+    df["BB_LOWER"] = bb["lower"]
+    df["PCTB"] = bb["pct_b"]
+
+    df["OBV"] = fr.get("obv")
+    df["MFI"] = fr.get("mfi", period=14)
+    df["ADX"] = fr.get("adx", period=14, smoothing="sma")
+    df["CCI"] = fr.get("cci", period=20)
 
     pivots_df = fibonacci_pivots(df)
     for col in pivots_df.columns: